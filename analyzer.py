@@ -2,8 +2,14 @@
 Sentiment analysis module using HuggingFace models (opcional) and keyword-based rules.
 Si transformers/torch no están instalados (ej. en Vercel), solo se usan keywords + NEUTRAL.
 """
-from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 import logging
+import os
+import re
+import threading
 
 # Import opcional: en Vercel no instalamos transformers/torch para ahorrar memoria
 try:
@@ -15,10 +21,42 @@ except ImportError:
     pipeline = None
     torch = None
 
-from config import get_huggingface_model, get_keywords_positive, get_keywords_negative
+# Import opcional: ONNX Runtime vía optimum (pip install optimum[onnxruntime])
+try:
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTOptimizer
+    from optimum.onnxruntime.configuration import AutoOptimizationConfig
+    from transformers import AutoTokenizer
+    _ONNX_AVAILABLE = True
+except ImportError:
+    _ONNX_AVAILABLE = False
+
+# Import opcional: autómata Aho-Corasick para buscar todas las keywords en una sola pasada
+try:
+    import ahocorasick
+    _AHOCORASICK_AVAILABLE = True
+except ImportError:
+    _AHOCORASICK_AVAILABLE = False
+    ahocorasick = None
+
+from config import (
+    get_huggingface_model, get_keywords_positive, get_keywords_negative, get_sentiment_batch_size,
+    get_keywords_positive_set, get_keywords_negative_set,
+    get_sentiment_compile_model, get_int8_quantization, get_sentiment_onnx_runtime,
+    get_sentiment_min_text_length,
+)
 
 logger = logging.getLogger(__name__)
 
+# Modelos exportados a ONNX (se exportan una vez y se reutilizan en los siguientes arranques)
+ONNX_CACHE_DIR = Path(os.getenv("ONNX_CACHE_DIR", str(Path(__file__).resolve().parent / "onnx_cache")))
+
+# Al menos una letra (cualquier alfabeto): sin letras (emojis, signos, números) no hay nada que analizar
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+# Memo de resultados del modelo: entradas máximas y caracteres de la clave (el modelo trunca a 512 tokens)
+_MODEL_MEMO_SIZE = 10000
+_MODEL_MEMO_KEY_CHARS = 512
+
 
 class SentimentAnalyzer:
     """Sentiment analyzer: keywords siempre; modelo HuggingFace solo si está instalado."""
@@ -28,7 +66,22 @@ class SentimentAnalyzer:
         self.pipeline = None
         self.keywords_positive = []
         self.keywords_negative = []
+        self._positive_words = frozenset()
+        self._keyword_automaton = None
+        self._keyword_regex = None
+        self._keyword_source = None  # listas de config con las que se compiló el matcher
         self._model_loaded = False
+        self._autocast_dtype = None
+        # analyze_profiles llama al analizador desde varios hilos: el tokenizer rápido no es thread-safe
+        # con padding/truncation ("Already borrowed") y el modelo se carga una sola vez, así que la carga
+        # y la inferencia van bajo este lock (reentrante: analyze -> _analyze_model)
+        self._model_lock = threading.RLock()
+        self.min_text_length = get_sentiment_min_text_length()
+        self.trivial_skips = 0  # textos resueltos como NEUTRAL sin modelo (para ajustar min_text_length)
+        # Comentarios repetidos ("Nice!", "👍"...): resultado del modelo memoizado (LRU) por texto,
+        # compartido por analyze y analyze_batch y entre lotes/perfiles
+        self._model_memo: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
         self._load_keywords()
 
     def _ensure_model_loaded(self) -> None:
@@ -37,7 +90,8 @@ class SentimentAnalyzer:
             return
         if self._model_loaded and self.pipeline is not None:
             return
-        self._load_model()
+        with self._model_lock:
+            self._load_model()
 
     def _load_model(self) -> None:
         """Carga el modelo HuggingFace solo si transformers/torch están instalados."""
@@ -47,33 +101,58 @@ class SentimentAnalyzer:
         if self._model_loaded and self.pipeline is not None:
             return
 
-        device = -1  # CPU only
+        # GPU si hay CUDA (pesos en media precisión + autocast); si no, CPU
+        device = 0 if torch.cuda.is_available() else -1
+        self._autocast_dtype = None
 
         try:
             model_name = get_huggingface_model()
             if model_name != self.model_name:
-                logger.info(f"Loading sentiment model: {model_name} (CPU mode for memory efficiency)")
+                logger.info(f"Loading sentiment model: {model_name} ({'GPU' if device >= 0 else 'CPU'} mode)")
+
+                if _ONNX_AVAILABLE and get_sentiment_onnx_runtime():
+                    self.pipeline = self._load_onnx_pipeline(model_name, device)
+                    if self.pipeline is not None:
+                        self.model_name = model_name
+                        self._model_loaded = True
+                        logger.info("Model loaded successfully (ONNX Runtime)")
+                        return
 
                 model_kwargs = {
                     "device": device,
                     "return_all_scores": False,
                     "batch_size": 1,
                     "padding": False,
+                    "use_fast": True,  # tokenizer en Rust (tokenizers), mucho más rápido que el de Python
                 }
-                try:
-                    model_kwargs["torch_dtype"] = torch.float16
-                    logger.info("Using float16 precision for memory efficiency")
-                except Exception as e:
-                    logger.debug(f"Could not use float16: {e}")
+                quantize = device == -1 and get_int8_quantization()
+                if device >= 0:
+                    # En GPU el forward está limitado por ancho de banda: bf16 en Ampere+, si no fp16
+                    self._autocast_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+                    model_kwargs["torch_dtype"] = self._autocast_dtype
+                    logger.info(f"Using {self._autocast_dtype} weights and autocast on GPU")
+                elif not quantize:
+                    # int8 dinámico necesita pesos float32; float16 solo si no se cuantiza
+                    try:
+                        model_kwargs["torch_dtype"] = torch.float16
+                        logger.info("Using float16 precision for memory efficiency")
+                    except Exception as e:
+                        logger.debug(f"Could not use float16: {e}")
 
                 self.pipeline = pipeline(
                     "sentiment-analysis",
                     model=model_name,
                     **model_kwargs
                 )
+                # Truncado en el tokenizer (tokens, no caracteres) para poder pasar lotes con truncation=True
+                self.pipeline.tokenizer.model_max_length = 512
+                self.pipeline.model.eval()
+                if quantize:
+                    self._quantize_model()
+                self._compile_model()
                 self.model_name = model_name
                 self._model_loaded = True
-                logger.info("Model loaded successfully (CPU mode)")
+                logger.info(f"Model loaded successfully ({'GPU' if device >= 0 else 'CPU'} mode)")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             try:
@@ -82,8 +161,11 @@ class SentimentAnalyzer:
                     "sentiment-analysis",
                     model="distilbert-base-uncased-finetuned-sst-2-english",
                     device=device,
-                    batch_size=1
+                    batch_size=1,
+                    use_fast=True
                 )
+                self.pipeline.tokenizer.model_max_length = 512
+                self.pipeline.model.eval()
                 self.model_name = "distilbert-base-uncased-finetuned-sst-2-english"
                 self._model_loaded = True
                 logger.info("Fallback model loaded (lighter, CPU mode)")
@@ -92,31 +174,173 @@ class SentimentAnalyzer:
                 self.pipeline = None
                 self._model_loaded = False
 
+    def _autocast(self):
+        """torch.autocast en GPU con la precisión elegida al cargar; en CPU no hace nada."""
+        if self._autocast_dtype is None:
+            return nullcontext()
+        return torch.autocast("cuda", dtype=self._autocast_dtype)
+
+    def _load_onnx_pipeline(self, model_name: str, device: int):
+        """
+        Pipeline sobre ONNX Runtime con optimización de grafo O3.
+        La primera vez exporta y optimiza el modelo en ONNX_CACHE_DIR; después lo carga de ahí.
+        Devuelve None si falla (se usa el modelo PyTorch).
+        """
+        cache_dir = ONNX_CACHE_DIR / model_name.replace("/", "__")
+        provider = "CUDAExecutionProvider" if device >= 0 else "CPUExecutionProvider"
+        try:
+            if not (cache_dir / "model_optimized.onnx").exists():
+                logger.info(f"Exporting {model_name} to ONNX (one time) in {cache_dir}")
+                ort_model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+                ORTOptimizer.from_pretrained(ort_model).optimize(
+                    save_dir=cache_dir,
+                    optimization_config=AutoOptimizationConfig.O3(),
+                )
+                AutoTokenizer.from_pretrained(model_name).save_pretrained(cache_dir)
+            ort_model = ORTModelForSequenceClassification.from_pretrained(
+                cache_dir, file_name="model_optimized.onnx", provider=provider
+            )
+            onnx_pipeline = pipeline(
+                "sentiment-analysis",
+                model=ort_model,
+                tokenizer=AutoTokenizer.from_pretrained(cache_dir),
+                device=device,
+            )
+            onnx_pipeline.tokenizer.model_max_length = 512
+            return onnx_pipeline
+        except Exception as e:
+            logger.warning(f"Could not load ONNX Runtime model, using PyTorch: {e}")
+            return None
+
+    def _quantize_model(self) -> None:
+        """Cuantización dinámica int8 de las capas Linear (CPU). Si falla, se deja el modelo float32."""
+        try:
+            self.pipeline.model = torch.quantization.quantize_dynamic(
+                self.pipeline.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            self.pipeline.model.eval()
+            logger.info("Using dynamic int8 quantization (CPU)")
+        except Exception as e:
+            logger.warning(f"Could not quantize model to int8: {e}")
+
+    def _compile_model(self) -> None:
+        """
+        Compila el forward del modelo con torch.compile si está activado en la config.
+        Si falla (sin inductor/compilador), se queda en modo eager.
+        """
+        if not get_sentiment_compile_model() or self.pipeline is None or not hasattr(torch, "compile"):
+            return
+        eager_model = self.pipeline.model
+        try:
+            # dynamic=True: _run_model_sorted llama al modelo con un tamaño de lote y un relleno distintos
+            # en cada lote ordenado por longitud; con formas estáticas cada forma nueva recompilaría
+            self.pipeline.model = torch.compile(eager_model, dynamic=True, fullgraph=False)
+            # La compilación (trazado + fusión) es lenta: hacerla aquí, por el mismo camino que en runtime
+            # (_run_model_sorted, inference_mode), con lotes completos de varias longitudes y uno incompleto
+            batch_size = get_sentiment_batch_size()
+            warmup_texts = [" ".join(["warmup"] * words) for words in (2, 16, 64, 256) for _ in range(batch_size)]
+            self._run_model_sorted(warmup_texts + ["warmup text"], batch_size)
+            logger.info("Sentiment model compiled with torch.compile")
+        except Exception as e:
+            logger.warning(f"torch.compile failed, using eager model: {e}")
+            self.pipeline.model = eager_model
+
+    def warmup(self) -> None:
+        """
+        Carga el modelo y hace dos pasadas de prueba (la primera inferencia es la más lenta),
+        para que no las pague la primera petición real. No hace nada sin transformers.
+        """
+        self._ensure_model_loaded()
+        if self.pipeline is None:
+            return
+        try:
+            for _ in range(2):
+                self._run_model_sorted(["warmup text", "another warmup sentence"], batch_size=2)
+            logger.info("Sentiment model warmed up")
+        except Exception as e:
+            logger.warning(f"Sentiment model warmup failed: {e}")
+
     def _load_keywords(self) -> None:
         """Load positive and negative keywords from configuration."""
-        self.keywords_positive = [kw.lower() for kw in get_keywords_positive()]
-        self.keywords_negative = [kw.lower() for kw in get_keywords_negative()]
+        positive, negative = get_keywords_positive(), get_keywords_negative()
+        self._keyword_source = (positive, negative)
+        # casefold: comparación sin mayúsculas correcta en Unicode (ß, ﬁ...), a diferencia de lower()
+        self.keywords_positive = [kw.casefold() for kw in get_keywords_positive_set()]
+        self.keywords_negative = [kw.casefold() for kw in get_keywords_negative_set()]
+        # Positivas de una sola palabra: si el comentario contiene una como palabra suelta,
+        # gana POSITIVE sin recorrer el matcher completo
+        self._positive_words = frozenset(kw for kw in self.keywords_positive if kw and " " not in kw)
+        self._build_keyword_matcher()
+
+    def _build_keyword_matcher(self) -> None:
+        """
+        Compila las keywords una sola vez: autómata Aho-Corasick si pyahocorasick está
+        instalado; si no, una regex alternada por polaridad.
+        """
+        self._keyword_automaton = None
+        self._keyword_regex = None
+        polarity = {kw: "NEGATIVE" for kw in self.keywords_negative if kw}
+        # Las positivas tienen prioridad (mismo orden que el escaneo original)
+        polarity.update({kw: "POSITIVE" for kw in self.keywords_positive if kw})
+        if not polarity:
+            return
+        if _AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for kw, label in polarity.items():
+                automaton.add_word(kw, label)
+            automaton.make_automaton()
+            self._keyword_automaton = automaton
+        else:
+            # Una regex por polaridad: search() en C, positivas primero
+            self._keyword_regex = tuple(
+                (label, re.compile("|".join(re.escape(kw) for kw, lbl in polarity.items() if lbl == label)))
+                for label in ("POSITIVE", "NEGATIVE")
+                if label in polarity.values()
+            )
+
+    def _refresh_keywords(self) -> None:
+        """Recompila el matcher solo si las keywords de config cambiaron (set_keywords_* o recarga de caché)."""
+        # get_keywords_* leen la caché en memoria de config: comparar es barato
+        if (get_keywords_positive(), get_keywords_negative()) != self._keyword_source:
+            self._load_keywords()
 
     def reload_config(self) -> None:
         """Reload model and keywords from configuration."""
         self._model_loaded = False
         self.pipeline = None
         self.model_name = None
+        with self._memo_lock:
+            self._model_memo.clear()
+        self.min_text_length = get_sentiment_min_text_length()
         self._load_keywords()
 
     def _check_keywords(self, text: str) -> Optional[Tuple[str, float]]:
-        """Check if text contains positive or negative keywords."""
+        """Check if text contains positive or negative keywords (positive wins)."""
         if not text:
             return None
-        text_lower = text.lower()
-        for keyword in self.keywords_positive:
-            if keyword in text_lower:
-                return ("POSITIVE", 0.9)
-        for keyword in self.keywords_negative:
-            if keyword in text_lower:
-                return ("NEGATIVE", 0.9)
+        text_lower = text.casefold()
+        if self._positive_words and not self._positive_words.isdisjoint(text_lower.split()):
+            return ("POSITIVE", 0.9)
+        if self._keyword_automaton is not None:
+            found_negative = False
+            for _, label in self._keyword_automaton.iter(text_lower):
+                if label == "POSITIVE":
+                    return ("POSITIVE", 0.9)
+                found_negative = True
+            return ("NEGATIVE", 0.9) if found_negative else None
+        for label, regex in self._keyword_regex or ():
+            if regex.search(text_lower):
+                return (label, 0.9)
         return None
 
+    def _is_trivial(self, text: str) -> bool:
+        """Texto demasiado corto o sin letras (solo emojis/signos): el modelo no aporta nada."""
+        stripped = text.strip()
+        if len(stripped) < self.min_text_length or not _LETTER_RE.search(stripped):
+            self.trivial_skips += 1
+            return True
+        return False
+
     def analyze(self, text: str) -> Dict[str, any]:
         """
         Analyze sentiment: keywords first; if no match and model available, use model;
@@ -125,52 +349,182 @@ class SentimentAnalyzer:
         if not text or not text.strip():
             return {"label": "NEUTRAL", "score": 0.5, "method": "empty"}
 
+        self._refresh_keywords()
         keyword_result = self._check_keywords(text)
         if keyword_result:
             label, score = keyword_result
             return {"label": label, "score": score, "method": "keyword"}
 
+        if self._is_trivial(text):
+            return {"label": "NEUTRAL", "score": 0.5, "method": "trivial"}
+
         self._ensure_model_loaded()
 
         if self.pipeline is None:
             return {"label": "NEUTRAL", "score": 0.5, "method": "fallback"}
 
         try:
-            result = self.pipeline(text[:512])
-            model_label = result[0]["label"].upper()
-            model_score = result[0]["score"]
-            if "POSITIVE" in model_label or "POS" in model_label:
-                label = "POSITIVE"
-            elif "NEGATIVE" in model_label or "NEG" in model_label:
-                label = "NEGATIVE"
-            else:
-                label = "NEUTRAL"
-            return {"label": label, "score": float(model_score), "method": "model"}
+            cached = self._memo_get(text)
+            if cached is None:
+                cached = self._analyze_model(text)
+                self._memo_put(text, cached)
+            label, score = cached
+            return {"label": label, "score": score, "method": "model"}
         except Exception as e:
             logger.error(f"Error in sentiment analysis: {e}")
             return {"label": "NEUTRAL", "score": 0.5, "method": "error"}
 
-    def analyze_batch(self, texts: List[str], batch_size: int = 10) -> List[Dict[str, any]]:
-        """Analyze multiple texts in batches."""
-        results = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            batch_results = [self.analyze(text) for text in batch]
-            results.extend(batch_results)
-            if i % (batch_size * 5) == 0:
-                import gc
-                gc.collect()
+    def _memo_get(self, text: str) -> Optional[Tuple[str, float]]:
+        """Resultado memoizado del modelo para text (clave: primeros _MODEL_MEMO_KEY_CHARS caracteres)."""
+        key = text[:_MODEL_MEMO_KEY_CHARS]
+        with self._memo_lock:
+            result = self._model_memo.get(key)
+            if result is not None:
+                self._model_memo.move_to_end(key)
+            return result
+
+    def _memo_put(self, text: str, result: Tuple[str, float]) -> None:
+        key = text[:_MODEL_MEMO_KEY_CHARS]
+        with self._memo_lock:
+            self._model_memo[key] = result
+            self._model_memo.move_to_end(key)
+            while len(self._model_memo) > _MODEL_MEMO_SIZE:
+                self._model_memo.popitem(last=False)
+
+    def _analyze_model(self, text: str) -> Tuple[str, float]:
+        """Run the model on a single text (results are memoized by analyze via _memo_get/_memo_put)."""
+        with self._model_lock, torch.inference_mode(), self._autocast():
+            result = self.pipeline(text, truncation=True)
+        return self._map_model_result(result[0])
+
+    @staticmethod
+    def _map_model_result(result: Dict[str, Any]) -> Tuple[str, float]:
+        """Map a raw pipeline output ({label, score}) to POSITIVE/NEGATIVE/NEUTRAL."""
+        model_label = result["label"].upper()
+        if "POSITIVE" in model_label or "POS" in model_label:
+            label = "POSITIVE"
+        elif "NEGATIVE" in model_label or "NEG" in model_label:
+            label = "NEGATIVE"
+        else:
+            label = "NEUTRAL"
+        return label, float(result["score"])
+
+    def _run_model_sorted(self, texts: List[str], batch_size: int) -> List[Tuple[str, float]]:
+        """
+        Inferencia por lotes ordenando por longitud: cada lote se rellena solo hasta su texto
+        más largo (no hasta el más largo de todos). Cada lote se tokeniza de una vez con el
+        tokenizer rápido (Rust) directo a tensores y se llama al modelo sin pasar por el
+        pipeline; el resultado vuelve en el orden original.
+        """
+        tokenizer = self.pipeline.tokenizer
+        model = self.pipeline.model
+        # Etiqueta final por id del modelo, resuelta una vez y no por texto
+        mapped_labels = {
+            label_id: self._map_model_result({"label": raw, "score": 0.0})[0]
+            for label_id, raw in model.config.id2label.items()
+        }
+        # La longitud en caracteres aproxima bien la de tokens y evita tokenizar dos veces
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results: List[Optional[Tuple[str, float]]] = [None] * len(texts)
+        # inference_mode: sin autograd ni contadores de versión de tensores
+        with self._model_lock, torch.inference_mode(), self._autocast():
+            for start in range(0, len(order), batch_size):
+                chunk = order[start:start + batch_size]
+                batch = tokenizer(
+                    [texts[i] for i in chunk],
+                    padding=True,
+                    truncation=True,
+                    max_length=512,
+                    return_tensors="pt",
+                ).to(self.pipeline.device)
+                probs = model(**batch).logits.float().softmax(dim=-1)
+                scores, label_ids = probs.max(dim=-1)
+                for i, score, label_id in zip(chunk, scores.tolist(), label_ids.tolist()):
+                    results[i] = (mapped_labels[label_id], float(score))
+        return results
+
+    def analyze_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[Dict[str, any]]:
+        """
+        Analyze multiple texts. Keywords se resuelven por texto; los que necesitan modelo salen del
+        memo si ya se infirieron (en este lote o en otro) y el resto se agrupa en lotes ordenados por
+        longitud y se reordena por índice.
+        """
+        if batch_size is None:
+            batch_size = get_sentiment_batch_size()
+        self._refresh_keywords()
+        results: List[Optional[Dict[str, any]]] = [None] * len(texts)
+        pending_idx: List[int] = []
+        pending_texts: List[str] = []
+
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = {"label": "NEUTRAL", "score": 0.5, "method": "empty"}
+                continue
+            keyword_result = self._check_keywords(text)
+            if keyword_result:
+                label, score = keyword_result
+                results[i] = {"label": label, "score": score, "method": "keyword"}
+                continue
+            if self._is_trivial(text):
+                results[i] = {"label": "NEUTRAL", "score": 0.5, "method": "trivial"}
+                continue
+            pending_idx.append(i)
+            pending_texts.append(text)
+
+        if pending_texts and self.pipeline is not None:
+            # Textos ya inferidos antes (otro lote, otro perfil o analyze): sin volver al modelo
+            still_idx: List[int] = []
+            still_texts: List[str] = []
+            for i, text in zip(pending_idx, pending_texts):
+                cached = self._memo_get(text)
+                if cached is None:
+                    still_idx.append(i)
+                    still_texts.append(text)
+                else:
+                    results[i] = {"label": cached[0], "score": cached[1], "method": "model"}
+            pending_idx, pending_texts = still_idx, still_texts
+
+        logger.debug(f"analyze_batch: {len(pending_texts)}/{len(texts)} texts need the model (trivial skips so far: {self.trivial_skips})")
+        if not pending_texts:
+            return results
+
+        self._ensure_model_loaded()
+        if self.pipeline is None:
+            for i in pending_idx:
+                results[i] = {"label": "NEUTRAL", "score": 0.5, "method": "fallback"}
+            return results
+
+        try:
+            # Textos repetidos dentro del lote (misma clave de memo): se infieren una sola vez
+            by_key = {}
+            for text in pending_texts:
+                by_key.setdefault(text[:_MODEL_MEMO_KEY_CHARS], text)
+            unique_texts = list(by_key.values())
+            for text, result in zip(unique_texts, self._run_model_sorted(unique_texts, batch_size)):
+                self._memo_put(text, result)
+                by_key[text[:_MODEL_MEMO_KEY_CHARS]] = result
+            for i, text in zip(pending_idx, pending_texts):
+                label, score = by_key[text[:_MODEL_MEMO_KEY_CHARS]]
+                results[i] = {"label": label, "score": score, "method": "model"}
+        except Exception as e:
+            logger.error(f"Error in batch sentiment analysis: {e}")
+            for i in pending_idx:
+                results[i] = {"label": "NEUTRAL", "score": 0.5, "method": "error"}
         return results
 
 
 _analyzer_instance: Optional[SentimentAnalyzer] = None
+# analyze_profiles procesa varios perfiles en hilos: el modelo se carga una sola vez
+_analyzer_lock = threading.Lock()
 
 
 def get_analyzer() -> SentimentAnalyzer:
     """Get or create the global sentiment analyzer instance."""
     global _analyzer_instance
     if _analyzer_instance is None:
-        _analyzer_instance = SentimentAnalyzer()
+        with _analyzer_lock:
+            if _analyzer_instance is None:
+                _analyzer_instance = SentimentAnalyzer()
     return _analyzer_instance
 
 
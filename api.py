@@ -2,14 +2,36 @@
 FastAPI REST API for Social Media Analytics Dashboard.
 Provides endpoints for profiles, posts, comments, analysis, and configuration.
 """
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, BackgroundTasks, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import partial
+from uuid import uuid4
+import hashlib
+import json
 import logging
 import os
+import sqlite3
+import threading
+import time
+
+import anyio
+
+# Import opcional: orjson serializa las respuestas JSON varias veces más rápido que json
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+    orjson = None
+    ORJSONResponse = None
 
 # Import existing modules
 from config import (
@@ -26,11 +48,15 @@ from config import (
     set_last_days, get_last_days
 )
 from db_utils import (
-    get_all_profiles, add_profile, delete_profile, update_profile_apify_token_key,
+    get_all_profiles, get_profile_by_id, add_profile, delete_profile, update_profile_apify_token_key,
     get_posts_for_dashboard, get_comments_for_dashboard, get_sentiment_stats,
+    count_posts_for_dashboard, count_comments_for_dashboard, get_sentiment_stats_by_platform,
+    get_overview_aggregates, get_dashboard_bundle,
     get_most_repeated_comments, get_comments_without_sentiment, update_comment_sentiment,
+    update_comments_sentiment_bulk,
     export_comments_to_csv, export_posts_to_csv, export_interactions_to_csv
 )
+import db_utils_async
 from scraper import analyze_profiles, ApifyScraper
 from analyzer import reload_analyzer, get_analyzer
 from pdf_generator import generate_professional_report
@@ -49,7 +75,8 @@ logger.info("Database initialized successfully")
 app = FastAPI(
     title="Social Media Analytics API",
     description="API REST para el dashboard de análisis de redes sociales",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse if _ORJSON_AVAILABLE else JSONResponse
 )
 
 # CORS middleware
@@ -79,10 +106,138 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PATCH", "DELETE"],
+    allow_headers=["Content-Type", "Authorization", "If-None-Match"],
+    max_age=86400,  # el navegador cachea el preflight un día
 )
 
+# Compresión de respuestas: los listados JSON (posts, comments, stats) comprimen 5-10x
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Límite de consultas concurrentes desde los endpoints async. Cada helper de db_utils
+# abre su propia conexión, así que esto acota las conexiones abiertas a la vez.
+DB_MAX_CONNECTIONS = max(1, int(os.getenv("DB_MAX_CONNECTIONS", "16")))
+_db_limiter: Optional[anyio.CapacityLimiter] = None
+
+def _get_db_limiter() -> anyio.CapacityLimiter:
+    # Se crea perezosamente: CapacityLimiter necesita un event loop activo
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = anyio.CapacityLimiter(DB_MAX_CONNECTIONS)
+    return _db_limiter
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking db/config helper in a worker thread without blocking the event loop."""
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=_get_db_limiter())
+
+# Caché en memoria (TTL + ETag) para respuestas que cambian poco y se piden en cada render
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+_response_cache: Dict[str, tuple] = {}  # key -> (expires_at, body, etag)
+
+def invalidate_response_cache(*keys: str):
+    """Drop cached responses (all of them when no key is given)."""
+    if not keys:
+        _response_cache.clear()
+    for key in keys:
+        _response_cache.pop(key, None)
+
+def _json_default(obj: Any) -> Any:
+    # Tipos que devuelven algunos drivers (Decimal en Postgres, datetime en el fallback json)
+    if isinstance(obj, sqlite3.Row):
+        # Filas pedidas con as_rows=True: el dict vive solo mientras se serializa esa fila
+        return dict(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+def dumps_json(data: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, with orjson when available."""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        data, default=_json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+async def cached_json_response(request: Request, key: str, loader) -> Response:
+    """Serve loader() as JSON from the TTL cache, answering 304 when If-None-Match matches."""
+    now = time.monotonic()
+    entry = _response_cache.get(key)
+    if entry is None or entry[0] <= now:
+        data = await run_db(loader)
+        body = dumps_json(jsonable_encoder(data))
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        entry = (now + RESPONSE_CACHE_TTL, body, etag)
+        _response_cache[key] = entry
+    _, body, etag = entry
+    # private, no-cache: el navegador revalida siempre (304 vía ETag) y ve al instante lo invalidado
+    # tras POST/DELETE; ningún proxy compartido guarda las respuestas (config incluye tokens de Apify)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _save_sentiments(rows: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> tuple:
+    """
+    Guarda el sentimiento de cada comentario en una sola transacción; si falla, fila a fila
+    para no perder las válidas. Devuelve (analizados, errores).
+    """
+    updates = [(row["id"], r["label"], r["score"], r["method"]) for row, r in zip(rows, results)]
+    try:
+        return update_comments_sentiment_bulk(updates), []
+    except Exception as e:
+        logger.warning(f"Bulk sentiment update failed, falling back to row by row: {e}")
+    analyzed = 0
+    errors = []
+    for comment_id, label, score, method in updates:
+        try:
+            update_comment_sentiment(
+                comment_id_internal=comment_id,
+                sentiment_label=label,
+                sentiment_score=score,
+                sentiment_method=method
+            )
+            analyzed += 1
+        except Exception as e:
+            logger.warning(f"Error analizando comentario id={comment_id}: {e}")
+            errors.append(str(e))
+    return analyzed, errors
+
+def _parse_date(value: Optional[str], field: str) -> Optional[datetime]:
+    """Parse a YYYY-MM-DD query param (fromisoformat is C-implemented, unlike strptime)."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field} format. Use YYYY-MM-DD")
+
+@app.on_event("startup")
+async def warmup_analyzer():
+    """Load (and warm up) the sentiment model before serving, off the event loop."""
+    if os.getenv("SENTIMENT_WARMUP_ON_STARTUP", "1").lower() in ("0", "false", "no"):
+        return
+    try:
+        await anyio.to_thread.run_sync(lambda: get_analyzer().warmup())
+    except Exception as e:
+        logger.warning(f"Sentiment analyzer warmup failed: {e}")
+
+@app.on_event("startup")
+async def open_async_db_pool():
+    """Pool asyncpg (solo Postgres con asyncpg instalado) para los endpoints de lectura async."""
+    try:
+        await db_utils_async.create_pool(
+            min_size=int(os.getenv("ASYNCPG_POOL_MIN", "4")),
+            max_size=int(os.getenv("ASYNCPG_POOL_MAX", "20"))
+        )
+    except Exception as e:
+        logger.warning(f"asyncpg pool unavailable, using db_utils: {e}")
+
+@app.on_event("shutdown")
+async def close_async_db_pool():
+    await db_utils_async.close_pool()
+
 # Pydantic models for request/response
 class ProfileCreate(BaseModel):
     platform: str
@@ -151,11 +306,13 @@ class ProfileApifyTokenKeyUpdate(BaseModel):
 # ==================== PROFILES ENDPOINTS ====================
 
 @app.get("/api/profiles", response_model=List[ProfileResponse])
-def get_profiles():
+async def get_profiles(request: Request):
     """Get all profiles."""
     try:
-        profiles = get_all_profiles()
-        return profiles
+        return await cached_json_response(
+            request, "profiles",
+            lambda: [ProfileResponse(**p) for p in get_all_profiles()]
+        )
     except Exception as e:
         logger.error(f"Error getting profiles: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -165,8 +322,8 @@ def create_profile(profile: ProfileCreate):
     """Create a new profile."""
     try:
         profile_id = add_profile(profile.platform, profile.username_or_url)
-        profiles = get_all_profiles()
-        new_profile = next((p for p in profiles if p["id"] == profile_id), None)
+        invalidate_response_cache("profiles")
+        new_profile = get_profile_by_id(profile_id) if profile_id is not None else None
         if not new_profile:
             raise HTTPException(status_code=404, detail="Profile not found after creation")
         return new_profile
@@ -179,6 +336,7 @@ def update_profile_apify_token_key_endpoint(profile_id: int, request: ProfileApi
     """Asigna qué API key usa este perfil: facebook_1, facebook_2, instagram, tiktok (o null para auto)."""
     try:
         update_profile_apify_token_key(profile_id, request.apify_token_key)
+        invalidate_response_cache("profiles")
         return {"success": True, "message": "API key del perfil actualizada"}
     except Exception as e:
         logger.error(f"Error updating profile apify token key: {e}")
@@ -189,6 +347,7 @@ def delete_profile_endpoint(profile_id: int):
     """Delete a profile."""
     try:
         success = delete_profile(profile_id)
+        invalidate_response_cache("profiles")
         if not success:
             raise HTTPException(status_code=404, detail="Profile not found")
         return {"success": True, "message": "Profile deleted successfully"}
@@ -201,7 +360,7 @@ def delete_profile_endpoint(profile_id: int):
 # ==================== POSTS ENDPOINTS ====================
 
 @app.get("/api/posts")
-def get_posts(
+async def get_posts(
     platform: Optional[str] = Query(None, description="Filter by platform"),
     profile_id: Optional[int] = Query(None, description="Filter by profile ID"),
     min_interactions: int = Query(0, description="Minimum interactions"),
@@ -212,39 +371,31 @@ def get_posts(
 ):
     """Get posts with filters."""
     try:
-        date_from_obj = None
-        date_to_obj = None
+        date_from_obj = _parse_date(date_from, "date_from")
+        date_to_obj = _parse_date(date_to, "date_to")
         
-        if date_from:
-            try:
-                date_from_obj = datetime.strptime(date_from, "%Y-%m-%d")
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date_from format. Use YYYY-MM-DD")
-        
-        if date_to:
-            try:
-                date_to_obj = datetime.strptime(date_to, "%Y-%m-%d")
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date_to format. Use YYYY-MM-DD")
-        
-        posts = get_posts_for_dashboard(
+        filters = dict(
             platform=platform,
             profile_id=profile_id,
             min_interactions=min_interactions,
             date_from=date_from_obj,
             date_to=date_to_obj
         )
+        # Paginación en SQL: solo se traen las filas de la página
+        if db_utils_async.get_pool() is not None:
+            # asyncpg: la consulta corre en el event loop, sin ocupar un hilo del limitador
+            posts = await db_utils_async.get_posts_for_dashboard(**filters, limit=limit, offset=offset)
+        else:
+            posts = await run_db(get_posts_for_dashboard, **filters, limit=limit, offset=offset, as_rows=True)
+        total = await run_db(count_posts_for_dashboard, **filters)
         
-        # Simple pagination
-        total = len(posts)
-        posts = posts[offset:offset + limit]
-        
-        return {
+        # Filas ya planas: se serializan directamente, sin pasar por jsonable_encoder
+        return Response(content=dumps_json({
             "data": posts,
             "total": total,
             "limit": limit,
             "offset": offset
-        }
+        }), media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
@@ -254,7 +405,7 @@ def get_posts(
 # ==================== COMMENTS ENDPOINTS ====================
 
 @app.get("/api/comments")
-def get_comments(
+async def get_comments(
     platform: Optional[str] = Query(None, description="Filter by platform"),
     profile_id: Optional[int] = Query(None, description="Filter by profile ID"),
     post_id: Optional[int] = Query(None, description="Filter by post ID"),
@@ -264,50 +415,89 @@ def get_comments(
 ):
     """Get comments with filters."""
     try:
-        comments = get_comments_for_dashboard(
+        filters = dict(
             post_id=post_id,
             sentiment=sentiment,
             platform=platform,
             profile_id=profile_id
         )
+        # Paginación en SQL: solo se traen las filas de la página
+        comments = await run_db(get_comments_for_dashboard, **filters, limit=limit, offset=offset, as_rows=True)
+        total = await run_db(count_comments_for_dashboard, **filters)
         
-        # Simple pagination
-        total = len(comments)
-        comments = comments[offset:offset + limit]
-        
-        return {
+        # Filas ya planas: se serializan directamente, sin pasar por jsonable_encoder
+        return Response(content=dumps_json({
             "data": comments,
             "total": total,
             "limit": limit,
             "offset": offset
-        }
+        }), media_type="application/json")
     except Exception as e:
         logger.error(f"Error getting comments: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # ==================== ANALYSIS ENDPOINTS ====================
 
-@app.post("/api/analysis/run")
-def run_analysis(request: AnalysisRequest):
-    """Run analysis for profiles."""
+# Trabajos de análisis en segundo plano (en memoria, por proceso)
+MAX_ANALYSIS_JOBS = 100
+analysis_jobs: Dict[str, Dict[str, Any]] = {}
+_analysis_jobs_lock = threading.Lock()
+
+def _update_analysis_job(job_id: str, **fields):
+    with _analysis_jobs_lock:
+        job = analysis_jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+def _run_analysis_job(job_id: str, profile_ids: Optional[List[int]], force: bool):
+    """Run analyze_profiles for a job and store its result or error."""
+    _update_analysis_job(job_id, status="running", started_at=datetime.now().isoformat())
     try:
-        results = analyze_profiles(profile_ids=request.profile_ids, force=request.force)
-        return {
-            "success": True,
-            "results": results
-        }
+        results = analyze_profiles(profile_ids=profile_ids, force=force)
+        _update_analysis_job(job_id, status="completed", results=results)
     except ValueError as e:
         msg = str(e)
+        status_code = 400
         if msg.startswith("APIFY_QUOTA:"):
             logger.warning(f"Apify quota/limit exceeded during analysis: {msg}")
-            raise HTTPException(status_code=402, detail=msg.replace("APIFY_QUOTA: ", ""))
-        if msg.startswith("APIFY_AUTH:"):
+            status_code, msg = 402, msg.replace("APIFY_QUOTA: ", "")
+        elif msg.startswith("APIFY_AUTH:"):
             logger.warning(f"Apify auth error during analysis: {msg}")
-            raise HTTPException(status_code=401, detail=msg.replace("APIFY_AUTH: ", ""))
-        raise HTTPException(status_code=400, detail=msg)
+            status_code, msg = 401, msg.replace("APIFY_AUTH: ", "")
+        _update_analysis_job(job_id, status="failed", error=msg, status_code=status_code)
     except Exception as e:
-        logger.error(f"Error running analysis: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Error running analysis job {job_id}: {e}")
+        _update_analysis_job(job_id, status="failed", error=str(e), status_code=500)
+    finally:
+        invalidate_response_cache("profiles")
+        _update_analysis_job(job_id, finished_at=datetime.now().isoformat())
+
+@app.post("/api/analysis/run", status_code=202)
+def run_analysis(request: AnalysisRequest, background_tasks: BackgroundTasks):
+    """Queue analysis for profiles; poll /api/analysis/status/{job_id} for the result."""
+    job_id = uuid4().hex
+    with _analysis_jobs_lock:
+        # Descartar los trabajos más antiguos para no crecer sin límite
+        while len(analysis_jobs) >= MAX_ANALYSIS_JOBS:
+            analysis_jobs.pop(next(iter(analysis_jobs)))
+        analysis_jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "profile_ids": request.profile_ids,
+            "force": request.force,
+            "created_at": datetime.now().isoformat()
+        }
+    background_tasks.add_task(_run_analysis_job, job_id, request.profile_ids, request.force)
+    return {"success": True, "job_id": job_id, "status": "queued"}
+
+@app.get("/api/analysis/status/{job_id}")
+def get_analysis_status(job_id: str):
+    """Get status (queued/running/completed/failed) and results of an analysis job."""
+    with _analysis_jobs_lock:
+        job = analysis_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return dict(job)
 
 @app.post("/api/import-apify-run")
 def import_apify_run(request: ImportApifyRunRequest):
@@ -324,6 +514,7 @@ def import_apify_run(request: ImportApifyRunRequest):
             platform=request.platform.strip().lower(),
             profile_id=request.profile_id,
         )
+        invalidate_response_cache("profiles")
         return {
             "success": True,
             "message": f"Importados {stats['posts_imported']} posts y {stats['comments_imported']} comentarios",
@@ -403,23 +594,9 @@ def import_apify_comments_runs_bulk(request: ImportApifyCommentsRunsRequest):
                     platform=request.platform.strip().lower(),
                     limit=None
                 )
-                analyzer = get_analyzer()
-                analyzed = 0
-                for row in pending:
-                    try:
-                        text = (row.get("text") or "").strip()
-                        if not text:
-                            continue
-                        result = analyzer.analyze(text)
-                        update_comment_sentiment(
-                            comment_id_internal=row["id"],
-                            sentiment_label=result["label"],
-                            sentiment_score=result["score"],
-                            sentiment_method=result["method"],
-                        )
-                        analyzed += 1
-                    except Exception as e:
-                        logger.warning(f"Error analizando comentario id={row.get('id')}: {e}")
+                pending = [row for row in pending if (row.get("text") or "").strip()]
+                sentiments = get_analyzer().analyze_batch([row["text"].strip() for row in pending])
+                analyzed, _ = _save_sentiments(pending, sentiments)
                 resp["analyzed_after_import"] = analyzed
                 if analyzed:
                     resp["message"] = resp["message"] + f" Analizados {analyzed} comentarios para el dashboard."
@@ -437,11 +614,10 @@ def import_apify_comments_runs_bulk(request: ImportApifyCommentsRunsRequest):
 # ==================== CONFIG ENDPOINTS ====================
 
 @app.get("/api/config")
-def get_config():
+async def get_config(request: Request):
     """Get all configuration."""
     try:
-        config = get_all_config()
-        return config
+        return await cached_json_response(request, "config", get_all_config)
     except Exception as e:
         logger.error(f"Error getting config: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -451,6 +627,7 @@ def update_apify_token(request: ApifyTokenUpdate):
     """Update Apify token (por defecto / fallback)."""
     try:
         set_apify_token(request.apify_token)
+        invalidate_response_cache("config")
         return {"success": True, "message": "Token actualizado"}
     except Exception as e:
         logger.error(f"Error updating token: {e}")
@@ -468,6 +645,7 @@ def update_apify_tokens_by_platform(request: ApifyTokenKeyUpdate):
             set_apify_token_instagram(request.apify_token_instagram)
         if request.apify_token_tiktok is not None:
             set_apify_token_tiktok(request.apify_token_tiktok)
+        invalidate_response_cache("config")
         return {"success": True, "message": "Tokens por plataforma actualizados"}
     except Exception as e:
         logger.error(f"Error updating apify tokens: {e}")
@@ -478,6 +656,7 @@ def update_actor_id(platform: str, actor_type: str, actor_id: str):
     """Update actor ID for a platform."""
     try:
         set_actor_id(platform, actor_type, actor_id)
+        invalidate_response_cache("config")
         return {"success": True, "message": "Actor ID updated successfully"}
     except Exception as e:
         logger.error(f"Error updating actor ID: {e}")
@@ -488,6 +667,7 @@ def update_date_from(request: DateFromUpdate):
     """Update date filter from for ALL platforms (YYYY-MM-DD format or None)."""
     try:
         set_date_from(request.date_from if request.date_from else None)
+        invalidate_response_cache("config")
         return {"success": True, "message": "Date from updated successfully"}
     except Exception as e:
         logger.error(f"Error updating date from: {e}")
@@ -498,6 +678,7 @@ def update_date_to(request: DateToUpdate):
     """Update date filter to for ALL platforms (YYYY-MM-DD format or None)."""
     try:
         set_date_to(request.date_to if request.date_to else None)
+        invalidate_response_cache("config")
         return {"success": True, "message": "Date to updated successfully"}
     except Exception as e:
         logger.error(f"Error updating date to: {e}")
@@ -508,6 +689,7 @@ def update_last_days(request: LastDaysUpdate):
     """Update last N days filter for ALL platforms (0 = no filter)."""
     try:
         set_last_days(int(request.last_days))
+        invalidate_response_cache("config")
         return {"success": True, "message": "Last days updated successfully"}
     except Exception as e:
         logger.error(f"Error updating last days: {e}")
@@ -518,6 +700,7 @@ def update_limit_posts(request: LimitPostsUpdate):
     """Update default max number of posts to scrape per profile."""
     try:
         set_default_limit_posts(max(1, int(request.default_limit_posts)))
+        invalidate_response_cache("config")
         return {"success": True, "message": "Límite de publicaciones actualizado"}
     except Exception as e:
         logger.error(f"Error updating limit posts: {e}")
@@ -528,6 +711,7 @@ def update_limit_comments(request: LimitCommentsUpdate):
     """Update default max number of comments per post to scrape."""
     try:
         set_default_limit_comments(max(1, int(request.default_limit_comments)))
+        invalidate_response_cache("config")
         return {"success": True, "message": "Límite de comentarios actualizado"}
     except Exception as e:
         logger.error(f"Error updating limit comments: {e}")
@@ -536,14 +720,13 @@ def update_limit_comments(request: LimitCommentsUpdate):
 # ==================== STATS ENDPOINTS ====================
 
 @app.get("/api/stats/sentiment")
-def get_sentiment_stats_endpoint(
+async def get_sentiment_stats_endpoint(
     platform: Optional[str] = Query(None),
     profile_id: Optional[int] = Query(None)
 ):
     """Get sentiment statistics."""
     try:
-        from db_utils import get_sentiment_stats as get_sentiment_stats_db
-        stats = get_sentiment_stats_db(platform=platform, profile_id=profile_id)
+        stats = await run_db(get_sentiment_stats, platform=platform, profile_id=profile_id)
         
         # Ensure the response format matches what the frontend expects
         return {
@@ -573,7 +756,7 @@ def get_sentiment_stats_endpoint(
         }
 
 @app.get("/api/stats/overview")
-def get_overview_stats(
+async def get_overview_stats(
     platform: Optional[str] = Query(None),
     profile_id: Optional[int] = Query(None),
     date_from: Optional[str] = Query(None),
@@ -581,22 +764,19 @@ def get_overview_stats(
 ):
     """Get overview statistics (KPIs)."""
     try:
-        date_from_obj = None
-        date_to_obj = None
+        date_from_obj = _parse_date(date_from, "date_from")
+        date_to_obj = _parse_date(date_to, "date_to")
         
-        if date_from:
-            date_from_obj = datetime.strptime(date_from, "%Y-%m-%d")
-        if date_to:
-            date_to_obj = datetime.strptime(date_to, "%Y-%m-%d")
-        
-        posts = get_posts_for_dashboard(
+        # Posts e interacciones agregados en SQL (sin traer las filas a Python)
+        aggregates = await run_db(
+            get_overview_aggregates,
             platform=platform,
             profile_id=profile_id,
             date_from=date_from_obj,
             date_to=date_to_obj
         )
         
-        if not posts:
+        if not aggregates:
             return {
                 "total_posts": 0,
                 "total_interactions": 0,
@@ -605,49 +785,38 @@ def get_overview_stats(
                 "platforms": []
             }
         
-        total_interactions = sum(p.get("interactions_total", 0) for p in posts)
+        total_posts = sum(a["posts"] for a in aggregates)
+        total_interactions = sum(a["interactions"] for a in aggregates)
         
-        # Get sentiment stats safely
+        # Sentimiento por plataforma en una sola consulta (antes: 1 + 1 por plataforma)
         try:
-            from db_utils import get_sentiment_stats as get_sentiment_stats_db
-            sentiment_stats = get_sentiment_stats_db(platform=platform, profile_id=profile_id)
-            total_comments = sentiment_stats.get("total", 0)
+            sentiment_by_platform = await run_db(get_sentiment_stats_by_platform, profile_id=profile_id, platform=platform)
         except Exception as e:
             logger.warning(f"Error getting sentiment stats: {e}")
-            total_comments = 0
-        
-        avg_interactions = total_interactions / len(posts) if posts else 0
+            sentiment_by_platform = {}
+        total_comments = sum(s.get("total", 0) for s in sentiment_by_platform.values())
         
-        # Group by platform
-        platforms = {}
-        for post in posts:
-            platform_name = post.get("platform", "unknown")
-            if platform_name not in platforms:
-                platforms[platform_name] = {
-                    "platform": platform_name,
-                    "posts": 0,
-                    "interactions": 0,
-                    "comments": 0
-                }
-            platforms[platform_name]["posts"] += 1
-            platforms[platform_name]["interactions"] += post.get("interactions_total", 0)
+        avg_interactions = total_interactions / total_posts if total_posts else 0
         
-        # Add comment counts per platform (simplified - would need separate query for accuracy)
-        from db_utils import get_sentiment_stats as get_sentiment_stats_db
-        for platform_name in platforms:
-            try:
-                platform_sentiment = get_sentiment_stats_db(platform=platform_name, profile_id=profile_id)
-                platforms[platform_name]["comments"] = platform_sentiment.get("total", 0)
-            except Exception:
-                platforms[platform_name]["comments"] = 0
+        platforms = [
+            {
+                "platform": a["platform"],
+                "posts": a["posts"],
+                "interactions": a["interactions"],
+                "comments": sentiment_by_platform.get(a["platform"], {}).get("total", 0)
+            }
+            for a in aggregates
+        ]
         
         return {
-            "total_posts": len(posts),
+            "total_posts": total_posts,
             "total_interactions": total_interactions,
             "total_comments": total_comments,
             "avg_interactions": round(avg_interactions, 2),
-            "platforms": list(platforms.values())
+            "platforms": platforms
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting overview stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -776,25 +945,9 @@ def analyze_pending_comments_endpoint(
                 "analyzed": 0,
                 "errors": []
             }
-        analyzer = get_analyzer()
-        analyzed = 0
-        errors = []
-        for row in pending:
-            try:
-                text = (row.get("text") or "").strip()
-                if not text:
-                    continue
-                result = analyzer.analyze(text)
-                update_comment_sentiment(
-                    comment_id_internal=row["id"],
-                    sentiment_label=result["label"],
-                    sentiment_score=result["score"],
-                    sentiment_method=result["method"]
-                )
-                analyzed += 1
-            except Exception as e:
-                logger.warning(f"Error analizando comentario id={row.get('id')}: {e}")
-                errors.append(str(e))
+        to_analyze = [row for row in pending if (row.get("text") or "").strip()]
+        sentiments = get_analyzer().analyze_batch([row["text"].strip() for row in to_analyze])
+        analyzed, errors = _save_sentiments(to_analyze, sentiments)
         logger.info(f"Analizados {analyzed} comentarios pendientes (errores: {len(errors)})")
         return {
             "success": True,
@@ -897,16 +1050,9 @@ def generate_pdf_report(
         combined_sentiment_counts = {"POSITIVE": 0, "NEGATIVE": 0, "NEUTRAL": 0}
         
         for pid in selected_profile_ids:
-            # Obtener posts
-            profile_posts = get_posts_for_dashboard(profile_id=pid, platform=platform)
+            # Posts y comentarios del perfil con una sola conexión
+            profile_posts, profile_comments = get_dashboard_bundle(profile_id=pid, platform=platform)
             all_posts.extend(profile_posts)
-            
-            # Obtener comentarios
-            profile_comments = get_comments_for_dashboard(
-                profile_id=pid,
-                platform=platform,
-                sentiment=None
-            )
             all_comments.extend(profile_comments)
             
             # Combinar sentimientos
@@ -3,12 +3,18 @@ Main Streamlit application for Social Media Analytics Dashboard.
 Multi-page app with Configuration, Profiles, Analysis, and Dashboard sections.
 """
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 import logging
+import queue
+import re
+import threading
+import time
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 from config import (
     ensure_database_initialized, get_all_config, set_apify_token, get_apify_token,
@@ -21,15 +27,16 @@ from config import (
     set_default_limit_posts, get_default_limit_posts, set_default_limit_comments,
     get_default_limit_comments, set_auto_skip_recent, get_auto_skip_recent,
     set_date_from, get_date_from, set_date_to, get_date_to,
-    set_last_days, get_last_days
+    set_last_days, get_last_days, has_any_apify_token
 )
 from db_utils import (
     get_all_profiles, add_profile, delete_profile, update_profile_apify_token_key,
     get_posts_for_dashboard, get_comments_for_dashboard, get_sentiment_stats
 )
 from utils import normalize_username_or_url
-from scraper import analyze_profiles
-from analyzer import reload_analyzer
+
+# pandas/numpy/plotly, scraper y analyzer (transformers) se importan dentro de las funciones
+# que los usan: las páginas de Configuración y Perfiles no pagan ese coste de arranque.
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -48,8 +55,8 @@ st.set_page_config(
     }
 )
 
-# Custom CSS for better UI
-st.markdown("""
+# Custom CSS for better UI (constante de módulo; se emite en cada rerun desde _inject_css)
+_CSS_SOURCE = """
 <style>
     /* Main container improvements */
     .main .block-container {
@@ -165,14 +172,233 @@ st.markdown("""
         color: white;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+# Minificado una vez al importar: sin comentarios ni sangría el mensaje de cada rerun pesa ~1/3 menos
+CSS_BLOB = re.sub(r"\s+", " ", re.sub(r"/\*.*?\*/", "", _CSS_SOURCE, flags=re.S)).strip()
+
+
+def _inject_css() -> None:
+    """Emit the app stylesheet. Must run on every rerun: elements not re-sent are removed from the page."""
+    st.markdown(CSS_BLOB, unsafe_allow_html=True)
+
 
 # Initialize database
 ensure_database_initialized()
 
 
+# Caché de consultas: Streamlit re-ejecuta todo el script en cada interacción.
+# Solo argumentos primitivos (str/int/None) para que el hash de la clave sea barato.
+@st.cache_data(ttl=30, show_spinner=False)
+def _cfg() -> Dict[str, Any]:
+    """get_all_config cacheado; se limpia con _cfg.clear() tras cada set_*."""
+    return get_all_config()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_profiles() -> List[Dict[str, Any]]:
+    return get_all_profiles()
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _platform_counts() -> Dict[str, int]:
+    """Perfiles por plataforma para el resumen del sidebar."""
+    return dict(Counter(p['platform'].lower() for p in _cached_profiles()))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _dashboard_filter_options() -> tuple:
+    """Opciones de los filtros del dashboard: (plataformas, etiquetas de perfil, id por nombre)."""
+    profiles = _cached_profiles()
+    # sorted: orden estable para que Streamlit no resetee el selectbox entre reruns
+    platforms = ["Todos"] + sorted({p["platform"] for p in profiles})
+    labels = ["Todos"] + [f"{p['username_or_url']} ({p['platform']})" for p in profiles]
+    # reversed: con nombres repetidos gana el primero, como el antiguo next(...)
+    ids_by_name = {p['username_or_url']: p['id'] for p in reversed(profiles)}
+    return platforms, labels, ids_by_name
+
+
+def _clear_profile_caches() -> None:
+    _cached_profiles.clear()
+    _platform_counts.clear()
+    _dashboard_filter_options.clear()
+
+
+# Solo las columnas de get_posts_for_dashboard que usa el dashboard, con tipos fijos.
+# Texto como string[pyarrow] (pyarrow viene con streamlit): sin objetos str de Python por celda
+POST_COLS = (
+    'id', 'profile_id', 'platform', 'text', 'likes', 'comments_count',
+    'shares', 'interactions_total', 'posted_at', 'username_or_url'
+)
+POST_COUNT_COLS = ('likes', 'comments_count', 'shares', 'interactions_total')
+POST_STRING_COLS = ('platform', 'text', 'username_or_url')
+POST_DTYPES = {
+    'id': 'int64', 'profile_id': 'int64',
+    **{c: 'int64' for c in POST_COUNT_COLS},
+    **{c: 'string[pyarrow]' for c in POST_STRING_COLS},
+}
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_posts(
+    platform: Optional[str],
+    profile_id: Optional[int],
+    min_interactions: int,
+    date_from: Optional[str],
+    date_to: Optional[str]
+) -> "pd.DataFrame":
+    """Posts del dashboard como DataFrame, con posted_at convertido una sola vez al cargar."""
+    import pandas as pd
+    
+    columns, rows = get_posts_for_dashboard(
+        platform=platform,
+        profile_id=profile_id,
+        min_interactions=min_interactions,
+        date_from=datetime.fromisoformat(date_from) if date_from else None,
+        date_to=datetime.fromisoformat(date_to) if date_to else None,
+        as_columns=True
+    )
+    # Tuplas + nombres de columna (sin un dict por fila); luego proyección a POST_COLS
+    df = pd.DataFrame.from_records(rows, columns=columns or None).reindex(columns=list(POST_COLS))
+    df[list(POST_COUNT_COLS)] = df[list(POST_COUNT_COLS)].fillna(0)
+    df = df.astype(POST_DTYPES, copy=False)
+    # ISO8601: parser rápido; utc=True porque conviven fechas con y sin zona horaria
+    df['posted_at'] = pd.to_datetime(
+        df['posted_at'], format='ISO8601', utc=True, errors='coerce', cache=True
+    ).dt.tz_convert(None)
+    # Día del post ya truncado (datetime64[D]) para agrupar sin recalcularlo en cada rerun
+    df['posted_date'] = df['posted_at'].to_numpy().astype('datetime64[D]')
+    return df
+
+
+# Columnas que muestra la tabla de comentarios (proyección en el SELECT)
+COMMENT_DISPLAY_COLS = ('text', 'author', 'likes', 'sentiment_label', 'sentiment_score', 'posted_at')
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_comments(
+    sentiment_label: Optional[str],
+    min_likes: int,
+    profile_id: Optional[int]
+) -> "pd.DataFrame":
+    """Comentarios de la tabla del dashboard (solo COMMENT_DISPLAY_COLS), por combinación de filtros."""
+    import pandas as pd
+    
+    _, rows = get_comments_for_dashboard(
+        post_id=None,
+        sentiment_label=sentiment_label,
+        min_likes=min_likes,
+        profile_id=profile_id,
+        as_columns=True,
+        columns=list(COMMENT_DISPLAY_COLS)
+    )
+    return pd.DataFrame.from_records(rows, columns=list(COMMENT_DISPLAY_COLS))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_comments_csv(
+    sentiment_label: Optional[str],
+    min_likes: int,
+    profile_id: Optional[int]
+) -> bytes:
+    """CSV de exportación (todas las columnas), generado una vez por combinación de filtros."""
+    import pandas as pd
+    
+    columns, rows = get_comments_for_dashboard(
+        post_id=None,
+        sentiment_label=sentiment_label,
+        min_likes=min_likes,
+        profile_id=profile_id,
+        as_columns=True
+    )
+    return pd.DataFrame.from_records(rows, columns=columns or None).to_csv(index=False).encode("utf-8")
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_sentiment(profile_id: Optional[int], platform: Optional[str]) -> Dict[str, Any]:
+    return get_sentiment_stats(profile_id=profile_id, platform=platform)
+
+
+@st.cache_resource(show_spinner=False)
+def _apify_scraper(token: str):
+    """Un ApifyScraper por token guardado, reutilizado entre reruns."""
+    from scraper import ApifyScraper
+    return ApifyScraper()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _apify_usage(token: str) -> Optional[Dict[str, Any]]:
+    """Uso de la cuenta Apify; como mucho una llamada HTTP cada 5 minutos por token."""
+    return _apify_scraper(token).get_usage_info()
+
+
+# Los tokens de Apify (apify_api_...) son bastante más largos; por debajo no se consulta el uso
+MIN_APIFY_TOKEN_LENGTH = 20
+
+
+# Colores por plataforma (mismos que los badges del CSS)
+PLATFORM_COLORS = {"facebook": "#1877f2", "instagram": "#dc2743", "tiktok": "#000000"}
+
+SENTIMENT_COLORS = {"POSITIVE": "green", "NEGATIVE": "red", "NEUTRAL": "gray"}
+
+# Por encima de esto la serie temporal se reduce antes de pasarla a Plotly
+MAX_CHART_POINTS = 2000
+CHART_POINTS_OUT = 1500
+
+
+def _downsample_series(x: "np.ndarray", y: "np.ndarray") -> tuple:
+    """Reduce una serie a CHART_POINTS_OUT puntos (LTTB si está disponible) conservando la forma."""
+    import numpy as np
+    
+    if len(y) <= MAX_CHART_POINTS:
+        return x, y
+    # Import opcional: LTTB (pip install tsdownsample); sin él se muestrea uniforme
+    try:
+        from tsdownsample import LTTBDownsampler
+        idx = LTTBDownsampler().downsample(x.astype("datetime64[ns]").astype(np.int64), y, n_out=CHART_POINTS_OUT)
+    except ImportError:
+        idx = np.linspace(0, len(y) - 1, CHART_POINTS_OUT).astype(np.int64)
+    return x[idx], y[idx]
+
+
+def _truncate_text(texts: "pd.Series", max_len: int) -> "pd.Series":
+    """Recorta a max_len caracteres + '...' con los kernels .str de pandas (sin lambda por fila)."""
+    s = texts.astype('string')
+    too_long = s.str.len().gt(max_len).fillna(False)
+    return s.mask(too_long, s.str.slice(0, max_len) + '...')
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_temporal(
+    platform: Optional[str],
+    profile_id: Optional[int],
+    min_interactions: int,
+    date_from: Optional[str],
+    date_to: Optional[str]
+) -> Optional[tuple]:
+    """Interacciones por día (ya reducidas) para el gráfico de evolución temporal."""
+    import numpy as np
+    
+    df = _cached_posts(platform, profile_id, min_interactions, date_from, date_to)
+    if df.empty or 'posted_at' not in df.columns or not df['posted_at'].notna().any():
+        return None
+    # Clave datetime64 precalculada al cargar (ruta hash rápida, sin pasar por .dt)
+    daily = df.groupby('posted_date', sort=True)['interactions_total'].sum()
+    return _downsample_series(daily.index.to_numpy(), daily.to_numpy(dtype=np.float64))
+
+
+def _clear_data_caches() -> None:
+    """Invalidar tras escribir perfiles o correr un análisis."""
+    _clear_profile_caches()
+    _cached_posts.clear()
+    _cached_sentiment.clear()
+    _cached_comments.clear()
+    _cached_comments_csv.clear()
+    _cached_temporal.clear()
+
+
 def main():
     """Main application entry point."""
+    _inject_css()
     # Sidebar header with better styling
     st.sidebar.markdown("""
     <div style='text-align: center; padding: 1rem 0;'>
@@ -194,17 +420,13 @@ def main():
     
     # Quick stats in sidebar
     try:
-        profiles = get_all_profiles()
+        profiles = _cached_profiles()
         if profiles:
             st.sidebar.markdown("### 📈 Resumen Rápido")
             st.sidebar.metric("Perfiles", len(profiles))
             
-            platforms_count = {}
-            for p in profiles:
-                platforms_count[p['platform']] = platforms_count.get(p['platform'], 0) + 1
-            
-            for platform, count in platforms_count.items():
-                platform_emoji = {"facebook": "📘", "instagram": "📷", "tiktok": "🎵"}.get(platform.lower(), "📱")
+            for platform, count in _platform_counts().items():
+                platform_emoji = {"facebook": "📘", "instagram": "📷", "tiktok": "🎵"}.get(platform, "📱")
                 st.sidebar.metric(f"{platform_emoji} {platform.capitalize()}", count)
     except:
         pass
@@ -219,6 +441,16 @@ def main():
         show_analysis()
 
 
+def _delete_keyword(state_key: str, idx: int) -> None:
+    """on_click de los botones 🗑️: corre antes del rerun, así que no hace falta st.rerun()."""
+    keywords = st.session_state[state_key]
+    st.session_state[state_key] = keywords[:idx] + keywords[idx + 1:]
+    setter = set_keywords_positive if state_key == "pos_kw" else set_keywords_negative
+    setter(list(st.session_state[state_key]))
+    _cfg.clear()
+    st.session_state["keywords_flash"] = f"✅ Eliminada: {keywords[idx]}"
+
+
 def show_configuration():
     """Configuration page - edit all settings."""
     # Header
@@ -226,7 +458,7 @@ def show_configuration():
     st.markdown("Configura todos los parámetros del sistema desde aquí. Los cambios se guardan automáticamente.")
     st.markdown("---")
     
-    config = get_all_config()
+    config = _cfg()
     
     # Organize in tabs for better UX
     tab1, tab2, tab3, tab4 = st.tabs(["🔑 API & Tokens", "🤖 Análisis", "📊 Límites", "📅 Filtros"])
@@ -234,40 +466,50 @@ def show_configuration():
     with tab1:
         st.subheader("🔑 Configuración de APIs")
         
-        # Apify Token
-        st.markdown("#### Token de Apify")
-        apify_token = st.text_input(
-            "Token de API de Apify",
-            value=config["apify_token"],
-            type="password",
-            help="Obtén tu token en https://console.apify.com/account/integrations",
-            key="apify_token_input"
-        )
-        col1, col2 = st.columns([1, 4])
-        with col1:
-            if st.button("💾 Guardar Token", key="save_apify_token"):
-                set_apify_token(apify_token)
-                st.success("✅ Token guardado correctamente")
-        
-        st.markdown("#### Tokens por plataforma (repartir cuota)")
-        st.markdown("Opcional: una API key para cada tipo de perfil para no gastar todo en un solo token.")
-        t_fb1 = st.text_input("Token Apify Facebook (perfil 1)", value=config.get("apify_token_facebook_1") or "", type="password", key="apify_fb1")
-        t_fb2 = st.text_input("Token Apify Facebook (perfil 2)", value=config.get("apify_token_facebook_2") or "", type="password", key="apify_fb2")
-        t_ig = st.text_input("Token Apify Instagram", value=config.get("apify_token_instagram") or "", type="password", key="apify_ig")
-        t_tt = st.text_input("Token Apify TikTok", value=config.get("apify_token_tiktok") or "", type="password", key="apify_tt")
-        if st.button("💾 Guardar tokens por plataforma", key="save_apify_tokens_platform"):
-            set_apify_token_facebook_1(t_fb1 or "")
-            set_apify_token_facebook_2(t_fb2 or "")
-            set_apify_token_instagram(t_ig or "")
-            set_apify_token_tiktok(t_tt or "")
-            st.success("✅ Tokens por plataforma guardados")
+        # Formularios: escribir en los campos no dispara reruns; se guarda todo al enviar
+        with st.form("api_tokens_form"):
+            # Apify Token
+            st.markdown("#### Token de Apify")
+            apify_token = st.text_input(
+                "Token de API de Apify",
+                value=config["apify_token"],
+                type="password",
+                help="Obtén tu token en https://console.apify.com/account/integrations",
+                key="apify_token_input"
+            )
+            
+            st.markdown("#### Tokens por plataforma (repartir cuota)")
+            st.markdown("Opcional: una API key para cada tipo de perfil para no gastar todo en un solo token.")
+            t_fb1 = st.text_input("Token Apify Facebook (perfil 1)", value=config.get("apify_token_facebook_1") or "", type="password", key="apify_fb1")
+            t_fb2 = st.text_input("Token Apify Facebook (perfil 2)", value=config.get("apify_token_facebook_2") or "", type="password", key="apify_fb2")
+            t_ig = st.text_input("Token Apify Instagram", value=config.get("apify_token_instagram") or "", type="password", key="apify_ig")
+            t_tt = st.text_input("Token Apify TikTok", value=config.get("apify_token_tiktok") or "", type="password", key="apify_tt")
+            
+            if st.form_submit_button("💾 Guardar tokens"):
+                if apify_token != config["apify_token"]:
+                    set_apify_token(apify_token)
+                    _apify_usage.clear()
+                    st.session_state.pop("_last_apify_usage", None)
+                    config["apify_token"] = apify_token
+                set_apify_token_facebook_1(t_fb1 or "")
+                set_apify_token_facebook_2(t_fb2 or "")
+                set_apify_token_instagram(t_ig or "")
+                set_apify_token_tiktok(t_tt or "")
+                _cfg.clear()
+                st.success("✅ Tokens guardados correctamente")
         
-        # Show usage info if token is configured
-        if apify_token:
+        # Show usage info if token is configured (y tiene pinta de token completo)
+        apify_token = config["apify_token"]
+        if apify_token and len(apify_token) >= MIN_APIFY_TOKEN_LENGTH:
             try:
-                from scraper import ApifyScraper
-                scraper = ApifyScraper()
-                usage_info = scraper.get_usage_info()
+                # Mismo token que en el rerun anterior: se reutiliza el resultado de la sesión
+                last_usage = st.session_state.get("_last_apify_usage")
+                if last_usage and last_usage[0] == apify_token:
+                    usage_info = last_usage[1]
+                else:
+                    # Clave = token guardado (el que usa ApifyScraper): al rotarlo se invalida solo
+                    usage_info = _apify_usage(apify_token)
+                    st.session_state["_last_apify_usage"] = (apify_token, usage_info)
                 
                 if usage_info:
                     st.markdown("---")
@@ -296,37 +538,46 @@ def show_configuration():
         platforms = ["instagram", "tiktok", "facebook"]
         actor_types = ["posts", "comments"]
         
-        for platform in platforms:
-            st.markdown(f"**{platform.upper()}**")
-            cols = st.columns(2)
-            for idx, actor_type in enumerate(actor_types):
-                with cols[idx]:
-                    current_id = get_actor_id(platform, actor_type)
-                    new_id = st.text_input(
-                        f"{actor_type.capitalize()} Actor ID",
-                        value=current_id,
-                        key=f"actor_{platform}_{actor_type}",
-                        help=f"Actor ID para {platform} {actor_type}"
-                    )
-                    if st.button(f"💾 Guardar", key=f"save_{platform}_{actor_type}"):
+        with st.form("actor_ids_form"):
+            actor_inputs = {}
+            for platform in platforms:
+                st.markdown(f"**{platform.upper()}**")
+                cols = st.columns(2)
+                for idx, actor_type in enumerate(actor_types):
+                    with cols[idx]:
+                        current_id = config.get(f"actor_{platform}_{actor_type}") or get_actor_id(platform, actor_type)
+                        actor_inputs[(platform, actor_type)] = (current_id, st.text_input(
+                            f"{actor_type.capitalize()} Actor ID",
+                            value=current_id,
+                            key=f"actor_{platform}_{actor_type}",
+                            help=f"Actor ID para {platform} {actor_type}"
+                        ))
+            if st.form_submit_button("💾 Guardar Actor IDs"):
+                # Solo se escriben los que cambiaron
+                for (platform, actor_type), (current_id, new_id) in actor_inputs.items():
+                    if new_id != current_id:
                         set_actor_id(platform, actor_type, new_id)
-                        st.success(f"✅ Actor ID guardado para {platform} {actor_type}")
+                _cfg.clear()
+                st.success("✅ Actor IDs guardados")
     
     with tab2:
         st.subheader("🤖 Configuración de Análisis de Sentimiento")
         
         # HuggingFace Model
         st.markdown("#### Modelo de Sentimiento (HuggingFace)")
-        hf_model = st.text_input(
-            "Modelo de HuggingFace",
-            value=config["huggingface_model"],
-            help="Ejemplo: cardiffnlp/twitter-xlm-roberta-base-sentiment",
-            key="hf_model_input"
-        )
-        if st.button("💾 Guardar Modelo", key="save_hf_model"):
-            set_huggingface_model(hf_model)
-            reload_analyzer()
-            st.success("✅ Modelo guardado. El analizador se recargará automáticamente.")
+        with st.form("hf_model_form"):
+            hf_model = st.text_input(
+                "Modelo de HuggingFace",
+                value=config["huggingface_model"],
+                help="Ejemplo: cardiffnlp/twitter-xlm-roberta-base-sentiment",
+                key="hf_model_input"
+            )
+            if st.form_submit_button("💾 Guardar Modelo"):
+                set_huggingface_model(hf_model)
+                _cfg.clear()
+                from analyzer import reload_analyzer
+                reload_analyzer()
+                st.success("✅ Modelo guardado. El analizador se recargará automáticamente.")
         
         st.markdown("---")
         
@@ -334,9 +585,15 @@ def show_configuration():
         st.markdown("#### Palabras Clave para Sentimiento")
         st.markdown("Estas palabras se usan junto con el modelo de IA para determinar el sentimiento.")
         
+        flash = st.session_state.pop("keywords_flash", None)
+        if flash:
+            st.success(flash)
+        
         # Positive keywords
         st.markdown("##### ✅ Palabras Clave Positivas")
-        pos_keywords = config["keywords_positive"].copy()
+        # Tupla en session_state: sin copiar la lista en cada rerun y borrado por índice
+        st.session_state.setdefault("pos_kw", tuple(config["keywords_positive"]))
+        pos_keywords = st.session_state.pos_kw
         
         col1, col2 = st.columns([3, 1])
         with col1:
@@ -345,8 +602,9 @@ def show_configuration():
             st.markdown("<br>", unsafe_allow_html=True)
             if st.button("➕ Agregar", key="add_pos"):
                 if new_pos_keyword and new_pos_keyword.strip():
-                    pos_keywords.append(new_pos_keyword.strip().lower())
-                    set_keywords_positive(pos_keywords)
+                    st.session_state.pos_kw = pos_keywords + (new_pos_keyword.strip().lower(),)
+                    set_keywords_positive(list(st.session_state.pos_kw))
+                    _cfg.clear()
                     st.success(f"✅ Agregada: {new_pos_keyword}")
                     st.rerun()
         
@@ -356,11 +614,7 @@ def show_configuration():
             cols = st.columns(min(4, len(pos_keywords)))
             for idx, keyword in enumerate(pos_keywords):
                 with cols[idx % len(cols)]:
-                    if st.button(f"🗑️ {keyword}", key=f"del_pos_{idx}"):
-                        pos_keywords.remove(keyword)
-                        set_keywords_positive(pos_keywords)
-                        st.success(f"✅ Eliminada: {keyword}")
-                        st.rerun()
+                    st.button(f"🗑️ {keyword}", key=f"del_pos_{idx}", on_click=_delete_keyword, args=("pos_kw", idx))
         else:
             st.info("No hay palabras clave positivas configuradas.")
         
@@ -368,7 +622,9 @@ def show_configuration():
         
         # Negative keywords
         st.markdown("##### ❌ Palabras Clave Negativas")
-        neg_keywords = config["keywords_negative"].copy()
+        # Tupla en session_state: sin copiar la lista en cada rerun y borrado por índice
+        st.session_state.setdefault("neg_kw", tuple(config["keywords_negative"]))
+        neg_keywords = st.session_state.neg_kw
         
         col1, col2 = st.columns([3, 1])
         with col1:
@@ -377,8 +633,9 @@ def show_configuration():
             st.markdown("<br>", unsafe_allow_html=True)
             if st.button("➕ Agregar", key="add_neg"):
                 if new_neg_keyword and new_neg_keyword.strip():
-                    neg_keywords.append(new_neg_keyword.strip().lower())
-                    set_keywords_negative(neg_keywords)
+                    st.session_state.neg_kw = neg_keywords + (new_neg_keyword.strip().lower(),)
+                    set_keywords_negative(list(st.session_state.neg_kw))
+                    _cfg.clear()
                     st.success(f"✅ Agregada: {new_neg_keyword}")
                     st.rerun()
         
@@ -388,11 +645,7 @@ def show_configuration():
             cols = st.columns(min(4, len(neg_keywords)))
             for idx, keyword in enumerate(neg_keywords):
                 with cols[idx % len(cols)]:
-                    if st.button(f"🗑️ {keyword}", key=f"del_neg_{idx}"):
-                        neg_keywords.remove(keyword)
-                        set_keywords_negative(neg_keywords)
-                        st.success(f"✅ Eliminada: {keyword}")
-                        st.rerun()
+                    st.button(f"🗑️ {keyword}", key=f"del_neg_{idx}", on_click=_delete_keyword, args=("neg_kw", idx))
         else:
             st.info("No hay palabras clave negativas configuradas.")
     
@@ -400,45 +653,43 @@ def show_configuration():
         st.subheader("📊 Límites por Defecto")
         st.markdown("Configura los límites por defecto para el scraping.")
         
-        col1, col2 = st.columns(2)
-        with col1:
-            limit_posts = st.number_input(
-                "Límite de Posts",
-                min_value=1,
-                max_value=1000,
-                value=config["default_limit_posts"],
-                key="limit_posts",
-                help="Número máximo de posts a analizar por perfil"
+        with st.form("limits_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                limit_posts = st.number_input(
+                    "Límite de Posts",
+                    min_value=1,
+                    max_value=1000,
+                    value=config["default_limit_posts"],
+                    key="limit_posts",
+                    help="Número máximo de posts a analizar por perfil"
+                )
+            
+            with col2:
+                limit_comments = st.number_input(
+                    "Límite de Comentarios por Post",
+                    min_value=1,
+                    max_value=1000,
+                    value=config["default_limit_comments"],
+                    key="limit_comments",
+                    help="Número máximo de comentarios a analizar por post"
+                )
+            
+            st.markdown("---")
+            
+            # Auto-skip option
+            st.markdown("#### ⏭️ Opciones de Análisis")
+            auto_skip = st.checkbox(
+                "Saltar perfiles analizados recientemente (últimos 7 días)",
+                value=config["auto_skip_recent"],
+                help="Si está activado, los perfiles analizados en los últimos 7 días se saltarán automáticamente"
             )
-            if st.button("💾 Guardar Límite Posts", key="save_limit_posts"):
+            if st.form_submit_button("💾 Guardar Límites y Opciones"):
                 set_default_limit_posts(int(limit_posts))
-                st.success("✅ Límite de posts guardado")
-        
-        with col2:
-            limit_comments = st.number_input(
-                "Límite de Comentarios por Post",
-                min_value=1,
-                max_value=1000,
-                value=config["default_limit_comments"],
-                key="limit_comments",
-                help="Número máximo de comentarios a analizar por post"
-            )
-            if st.button("💾 Guardar Límite Comentarios", key="save_limit_comments"):
                 set_default_limit_comments(int(limit_comments))
-                st.success("✅ Límite de comentarios guardado")
-        
-        st.markdown("---")
-        
-        # Auto-skip option
-        st.markdown("#### ⏭️ Opciones de Análisis")
-        auto_skip = st.checkbox(
-            "Saltar perfiles analizados recientemente (últimos 7 días)",
-            value=config["auto_skip_recent"],
-            help="Si está activado, los perfiles analizados en los últimos 7 días se saltarán automáticamente"
-        )
-        if st.button("💾 Guardar Opción", key="save_auto_skip"):
-            set_auto_skip_recent(auto_skip)
-            st.success("✅ Opción guardada")
+                set_auto_skip_recent(auto_skip)
+                _cfg.clear()
+                st.success("✅ Límites y opciones guardados")
     
     with tab4:
         st.subheader("📅 Filtros de Fecha para TikTok")
@@ -446,22 +697,24 @@ def show_configuration():
         
         # Option 1: Last N days
         st.markdown("#### Opción 1: Últimos N días")
-        last_days = st.number_input(
-            "Analizar posts de los últimos N días (0 = sin filtro)",
-            min_value=0,
-            max_value=365,
-            value=config.get("last_days", 7),
-            key="last_days",
-            help="Si configuras 7, solo analizará posts de los últimos 7 días"
-        )
-        if st.button("💾 Guardar Días", key="save_last_days"):
-            days_value = int(last_days)
-            set_last_days(days_value)
-            saved_value = get_last_days()
-            if saved_value == days_value:
-                st.success(f"✅ Configurado para analizar últimos {last_days} días" if last_days > 0 else "✅ Filtro de días desactivado")
-            else:
-                st.error(f"⚠️ Error: Se intentó guardar {days_value} pero se leyó {saved_value}. Por favor, intenta de nuevo.")
+        with st.form("last_days_form"):
+            last_days = st.number_input(
+                "Analizar posts de los últimos N días (0 = sin filtro)",
+                min_value=0,
+                max_value=365,
+                value=config.get("last_days", 7),
+                key="last_days",
+                help="Si configuras 7, solo analizará posts de los últimos 7 días"
+            )
+            if st.form_submit_button("💾 Guardar Días"):
+                days_value = int(last_days)
+                set_last_days(days_value)
+                _cfg.clear()
+                saved_value = get_last_days()
+                if saved_value == days_value:
+                    st.success(f"✅ Configurado para analizar últimos {last_days} días" if last_days > 0 else "✅ Filtro de días desactivado")
+                else:
+                    st.error(f"⚠️ Error: Se intentó guardar {days_value} pero se leyó {saved_value}. Por favor, intenta de nuevo.")
         
         st.markdown("---")
         
@@ -469,42 +722,53 @@ def show_configuration():
         st.markdown("#### Opción 2: Rango de fechas específico")
         st.markdown("**O** configura un rango de fechas específico:")
         
-        col1, col2 = st.columns(2)
-        with col1:
-            date_from_str = config.get("date_from")
-            try:
-                date_from_default = datetime.strptime(date_from_str, "%Y-%m-%d").date() if date_from_str else None
-            except:
-                date_from_default = None
-            date_from = st.date_input(
-                "Fecha desde (opcional)",
-                value=date_from_default,
-                key="date_from",
-                help="Fecha de inicio del análisis"
-            )
-        with col2:
-            date_to_str = config.get("date_to")
-            try:
-                date_to_default = datetime.strptime(date_to_str, "%Y-%m-%d").date() if date_to_str else None
-            except:
-                date_to_default = None
-            date_to = st.date_input(
-                "Fecha hasta (opcional)",
-                value=date_to_default,
-                key="date_to",
-                help="Fecha de fin del análisis"
-            )
-        
-        if st.button("💾 Guardar Rango de Fechas", key="save_dates"):
-            date_from_val = date_from.strftime("%Y-%m-%d") if date_from else None
-            date_to_val = date_to.strftime("%Y-%m-%d") if date_to else None
-            set_date_from(date_from_val)
-            set_date_to(date_to_val)
-            st.success("✅ Rango de fechas guardado")
+        with st.form("date_range_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                date_from_str = config.get("date_from")
+                try:
+                    date_from_default = datetime.strptime(date_from_str, "%Y-%m-%d").date() if date_from_str else None
+                except:
+                    date_from_default = None
+                date_from = st.date_input(
+                    "Fecha desde (opcional)",
+                    value=date_from_default,
+                    key="date_from",
+                    help="Fecha de inicio del análisis"
+                )
+            with col2:
+                date_to_str = config.get("date_to")
+                try:
+                    date_to_default = datetime.strptime(date_to_str, "%Y-%m-%d").date() if date_to_str else None
+                except:
+                    date_to_default = None
+                date_to = st.date_input(
+                    "Fecha hasta (opcional)",
+                    value=date_to_default,
+                    key="date_to",
+                    help="Fecha de fin del análisis"
+                )
+            
+            if st.form_submit_button("💾 Guardar Rango de Fechas"):
+                date_from_val = date_from.strftime("%Y-%m-%d") if date_from else None
+                date_to_val = date_to.strftime("%Y-%m-%d") if date_to else None
+                set_date_from(date_from_val)
+                set_date_to(date_to_val)
+                _cfg.clear()
+                st.success("✅ Rango de fechas guardado")
         
         st.info("💡 **Nota:** Si configuras 'últimos N días', ese filtro tiene prioridad sobre el rango de fechas específico.")
 
 
+def _delete_profile(profile_id: int, name: str) -> None:
+    """on_click de 🗑️ Eliminar; el resultado se muestra en el rerun siguiente."""
+    if delete_profile(profile_id):
+        _clear_data_caches()
+        st.session_state["profiles_flash"] = ("success", f"✅ Perfil eliminado: {name}")
+    else:
+        st.session_state["profiles_flash"] = ("error", "❌ Error al eliminar perfil")
+
+
 def show_profiles():
     """Profiles management page."""
     st.title("👥 Perfiles")
@@ -534,6 +798,7 @@ def show_profiles():
                 
                 try:
                     profile_id = add_profile(detected_platform, username)
+                    _clear_profile_caches()
                     st.success(f"✅ Perfil agregado: {username} ({detected_platform})")
                     st.rerun()
                 except Exception as e:
@@ -545,7 +810,10 @@ def show_profiles():
     
     # List existing profiles with better cards
     st.markdown("## 📋 Perfiles Guardados")
-    profiles = get_all_profiles()
+    flash = st.session_state.pop("profiles_flash", None)
+    if flash:
+        getattr(st, flash[0])(flash[1])
+    profiles = _cached_profiles()
     
     if not profiles:
         st.info("ℹ️ No hay perfiles guardados. Agrega uno arriba para comenzar.")
@@ -573,7 +841,7 @@ def show_profiles():
                             <h4 style='margin: 0; color: #2c3e50;'>{profile['username_or_url']}</h4>
                             <p style='margin: 0.5rem 0; color: #7f8c8d; font-size: 0.9rem;'>
                                 <strong>Plataforma:</strong> {profile['platform']}<br>
-                                <strong>Último análisis:</strong> {profile['last_analyzed'][:10] if profile.get('last_analyzed') else 'Nunca'}
+                                <strong>Último análisis:</strong> {profile.get('last_analyzed_short') or 'Nunca'}
                             </p>
                         </div>
                         """, unsafe_allow_html=True)
@@ -590,23 +858,106 @@ def show_profiles():
                         )
                         if st.button("💾 Guardar API key", key=f"save_tk_{profile['id']}"):
                             update_profile_apify_token_key(profile["id"], token_key.strip() or None)
+                            _clear_profile_caches()
                             st.success("✅ API key del perfil guardada")
                             st.rerun()
-                        if st.button("🗑️ Eliminar", key=f"delete_{profile['id']}", width='stretch'):
-                            if delete_profile(profile['id']):
-                                st.success(f"✅ Perfil eliminado: {profile['username_or_url']}")
-                                st.rerun()
-                            else:
-                                st.error("❌ Error al eliminar perfil")
+                        st.button(
+                            "🗑️ Eliminar", key=f"delete_{profile['id']}", width='stretch',
+                            on_click=_delete_profile, args=(profile['id'], profile['username_or_url'])
+                        )
             
             st.markdown("---")
 
 
+def _start_analysis_job(profile_ids: List[int], force: bool) -> Dict[str, Any]:
+    """Lanza analyze_profiles en un hilo; el script lee el progreso de la cola en cada rerun."""
+    from scraper import analyze_profiles
+    
+    events: queue.Queue = queue.Queue()
+
+    def worker():
+        try:
+            results = analyze_profiles(
+                profile_ids,
+                force=force,
+                on_progress=lambda done, total: events.put(("progress", done, total))
+            )
+            events.put(("done", results))
+        except Exception as e:
+            logger.error(f"Analysis error: {e}", exc_info=True)
+            events.put(("error", str(e)))
+
+    threading.Thread(target=worker, name="analysis-job", daemon=True).start()
+    return {"queue": events, "done": 0, "total": len(profile_ids), "running": True, "results": None, "error": None}
+
+
+def _poll_analysis_job(job: Dict[str, Any]) -> None:
+    """Vacía la cola de eventos del hilo de análisis en el estado del trabajo."""
+    while True:
+        try:
+            event = job["queue"].get_nowait()
+        except queue.Empty:
+            return
+        if event[0] == "progress":
+            job["done"], job["total"] = event[1], event[2]
+        else:
+            job["running"] = False
+            if event[0] == "done":
+                job["results"] = event[1]
+            else:
+                job["error"] = event[1]
+            # Los datos cambiaron: invalidar una vez, desde el hilo del script
+            _clear_data_caches()
+
+
+def _show_analysis_job(job: Dict[str, Any], profiles: List[Dict[str, Any]]) -> None:
+    """Progreso del análisis en curso o resultados del último análisis (cola ya vaciada por el llamador)."""
+    if job["running"]:
+        total = max(job["total"], 1)
+        st.progress(job["done"] / total)
+        st.text(f"Analizando perfiles... {job['done']}/{job['total']}")
+        return
+    if job["error"]:
+        st.error(f"❌ Error durante el análisis: {job['error']}")
+        return
+    
+    # Display results with better cards
+    st.markdown("### 📊 Resultados del Análisis")
+    
+    profiles_by_id = {p['id']: p for p in profiles}
+    for profile_id, result in job["results"].items():
+        profile = profiles_by_id.get(profile_id)
+        if not profile:
+            continue
+        
+        platform_emoji = {"facebook": "📘", "instagram": "📷", "tiktok": "🎵"}.get(profile['platform'].lower(), "📱")
+        
+        with st.expander(f"{platform_emoji} {profile['username_or_url']} ({profile['platform']})", expanded=True):
+            if "error" in result:
+                st.error(f"❌ **Error:** {result['error']}")
+            elif result.get("skipped"):
+                st.info(f"⏭️ **Saltado:** {result.get('reason', 'unknown')}")
+            else:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("📝 Posts Analizados", result.get('posts_scraped', 0))
+                with col2:
+                    st.metric("💬 Comentarios Analizados", result.get('comments_scraped', 0))
+                
+                if result.get('errors'):
+                    st.warning(f"⚠️ **Errores encontrados:** {len(result['errors'])}")
+                    with st.expander("Ver detalles de errores"):
+                        for error in result['errors']:
+                            st.caption(f"  • {error}")
+    
+    st.success("🎉 Análisis completado exitosamente!")
+
+
 def show_analysis():
     """Analysis execution page."""
     st.title("🔄 Análisis")
     
-    profiles = get_all_profiles()
+    profiles = _cached_profiles()
     
     if not profiles:
         st.warning("⚠️ No hay perfiles configurados. Ve a la página 'Perfiles' para agregar algunos.")
@@ -614,14 +965,10 @@ def show_analysis():
     
     st.subheader("Seleccionar Perfiles para Analizar")
     
-    # Profile selection checkboxes
-    selected_profiles = []
-    for profile in profiles:
-        if st.checkbox(
-            f"{profile['username_or_url']} ({profile['platform']})",
-            key=f"select_{profile['id']}"
-        ):
-            selected_profiles.append(profile['id'])
+    # Un solo multiselect en lugar de un checkbox por perfil
+    options = {f"{p['username_or_url']} ({p['platform']})": p['id'] for p in profiles}
+    selected_labels = st.multiselect("Perfiles", list(options), key="select_profiles")
+    selected_profiles = [options[label] for label in selected_labels]
     
     if not selected_profiles:
         st.info("Selecciona al menos un perfil para analizar.")
@@ -641,62 +988,23 @@ def show_analysis():
         st.markdown("")
         st.markdown("")
     
-    # Run analysis button
-    if st.button("🚀 Correr Análisis Fresco", type="primary", width='stretch'):
+    job = st.session_state.get("analysis_job")
+    if job is not None:
+        # Vaciar la cola antes de leer "running": la ejecución que ve terminar el trabajo ya no espera
+        # ni relanza el script, y el botón se habilita en ese mismo render
+        _poll_analysis_job(job)
+    job_running = job is not None and job["running"]
+    
+    # Run analysis button (deshabilitado mientras hay un análisis en curso)
+    if st.button("🚀 Correr Análisis Fresco", type="primary", width='stretch', disabled=job_running):
         if not has_any_apify_token():
             st.error("❌ Ningún token de Apify configurado. Ve a Configuración → API & Tokens (token por defecto o por plataforma).")
             return
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        try:
-            status_text.text("Iniciando análisis...")
-            progress_bar.progress(10)
-            
-            results = analyze_profiles(selected_profiles, force=force_analysis)
-            progress_bar.progress(50)
-            
-            status_text.text("Procesando resultados...")
-            progress_bar.progress(90)
-            
-            # Display results with better cards
-            st.markdown("### 📊 Resultados del Análisis")
-            
-            for profile_id, result in results.items():
-                profile = next((p for p in profiles if p['id'] == profile_id), None)
-                if not profile:
-                    continue
-                
-                platform_emoji = {"facebook": "📘", "instagram": "📷", "tiktok": "🎵"}.get(profile['platform'].lower(), "📱")
-                
-                with st.expander(f"{platform_emoji} {profile['username_or_url']} ({profile['platform']})", expanded=True):
-                    if "error" in result:
-                        st.error(f"❌ **Error:** {result['error']}")
-                    elif result.get("skipped"):
-                        st.info(f"⏭️ **Saltado:** {result.get('reason', 'unknown')}")
-                    else:
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("📝 Posts Analizados", result.get('posts_scraped', 0))
-                        with col2:
-                            st.metric("💬 Comentarios Analizados", result.get('comments_scraped', 0))
-                        
-                        if result.get('errors'):
-                            st.warning(f"⚠️ **Errores encontrados:** {len(result['errors'])}")
-                            with st.expander("Ver detalles de errores"):
-                                for error in result['errors']:
-                                    st.caption(f"  • {error}")
-            
-            progress_bar.progress(100)
-            status_text.text("✅ Análisis completado!")
-            st.success("🎉 Análisis completado exitosamente!")
-            
-        except Exception as e:
-            st.error(f"❌ Error durante el análisis: {e}")
-            logger.error(f"Analysis error: {e}", exc_info=True)
-        finally:
-            progress_bar.empty()
+        st.session_state.analysis_job = _start_analysis_job(selected_profiles, force_analysis)
+        st.rerun()
+    
+    if job is not None:
+        _show_analysis_job(job, profiles)
     
     st.markdown("---")
     st.subheader("📅 Actualización Semanal Automática")
@@ -714,10 +1022,19 @@ def show_analysis():
     
     **Nota:** Asegúrate de que el análisis se ejecute en modo headless o automatizado.
     """)
+    
+    # Mientras el hilo trabaja, volver a ejecutar el script cada medio segundo para refrescar el progreso
+    if job_running:
+        time.sleep(0.5)
+        st.rerun()
 
 
 def show_dashboard():
     """Main dashboard with metrics and visualizations."""
+    import numpy as np
+    import pandas as pd
+    import plotly.graph_objects as go
+    
     # Header with better styling
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -728,7 +1045,7 @@ def show_dashboard():
         if st.button("🔄 Actualizar Datos", width='stretch'):
             st.rerun()
     
-    profiles = get_all_profiles()
+    profiles = _cached_profiles()
     
     if not profiles:
         st.warning("⚠️ No hay perfiles configurados. Ve a 'Perfiles' para agregar algunos y luego a 'Análisis' para procesarlos.")
@@ -737,20 +1054,17 @@ def show_dashboard():
     # Filters in sidebar with better organization
     st.sidebar.markdown("### 🔍 Filtros de Visualización")
     
+    platforms, profile_options, profile_ids_by_name = _dashboard_filter_options()
+    
     # Platform filter
-    platforms = ["Todos"] + list(set(p["platform"] for p in profiles))
     selected_platform = st.sidebar.selectbox("Plataforma", platforms)
     platform_filter = None if selected_platform == "Todos" else selected_platform
     
     # Profile filter
-    profile_options = ["Todos"] + [f"{p['username_or_url']} ({p['platform']})" for p in profiles]
     selected_profile = st.sidebar.selectbox("Perfil", profile_options)
     profile_filter = None
     if selected_profile != "Todos":
-        profile_name = selected_profile.split(" (")[0]
-        profile = next((p for p in profiles if p['username_or_url'] == profile_name), None)
-        if profile:
-            profile_filter = profile['id']
+        profile_filter = profile_ids_by_name.get(selected_profile.split(" (")[0])
     
     # Date range filter
     date_range = st.sidebar.date_input(
@@ -770,21 +1084,19 @@ def show_dashboard():
     )
     
     # Get filtered data
-    posts = get_posts_for_dashboard(
-        platform=platform_filter,
-        profile_id=profile_filter,
-        min_interactions=min_interactions,
-        date_from=date_from,
-        date_to=date_to
+    posts_args = (
+        platform_filter,
+        profile_filter,
+        int(min_interactions),
+        date_from.isoformat() if date_from else None,
+        date_to.isoformat() if date_to else None
     )
+    df_posts = _cached_posts(*posts_args)
     
-    if not posts:
+    if df_posts.empty:
         st.info("No hay datos para mostrar con los filtros seleccionados.")
         return
     
-    # Convert to DataFrame
-    df_posts = pd.DataFrame(posts)
-    
     # Metrics with better styling
     st.markdown("### 📈 Métricas Generales")
     
@@ -792,7 +1104,7 @@ def show_dashboard():
     total_interactions = df_posts['interactions_total'].sum()
     avg_interactions = df_posts['interactions_total'].mean()
     platforms_count = df_posts['platform'].nunique()
-    total_comments = get_sentiment_stats(profile_id=profile_filter, platform=platform_filter)['total']
+    total_comments = _cached_sentiment(profile_filter, platform_filter)['total']
     
     # Display metrics in cards
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -815,29 +1127,31 @@ def show_dashboard():
     
     with col1:
         st.subheader("📊 Interacciones por Plataforma")
-        platform_interactions = df_posts.groupby('platform')['interactions_total'].sum().reset_index()
-        fig_platform = px.bar(
-            platform_interactions,
-            x='platform',
-            y='interactions_total',
-            labels={'platform': 'Plataforma', 'interactions_total': 'Interacciones Totales'},
-            color='platform'
-        )
+        # Pocas plataformas: factorize + bincount en lugar de la maquinaria de groupby
+        codes, uniques = pd.factorize(df_posts['platform'].to_numpy(), sort=False)
+        sums = np.bincount(codes, weights=df_posts['interactions_total'].to_numpy(dtype=np.float64))
+        # go.Bar directo con arrays numpy: sin el ensamblado de figura de plotly.express
+        fig_platform = go.Figure(go.Bar(
+            x=np.asarray(uniques),
+            y=sums,
+            marker_color=[PLATFORM_COLORS.get(str(p).lower(), "#7f8c8d") for p in uniques]
+        ))
+        fig_platform.update_layout(xaxis_title='Plataforma', yaxis_title='Interacciones Totales', showlegend=False)
         st.plotly_chart(fig_platform, width='stretch')
     
     with col2:
         st.subheader("📈 Evolución Temporal")
-        if 'posted_at' in df_posts.columns and df_posts['posted_at'].notna().any():
-            df_posts['posted_at'] = pd.to_datetime(df_posts['posted_at'], errors='coerce')
-            df_temporal = df_posts.groupby(df_posts['posted_at'].dt.date)['interactions_total'].sum().reset_index()
-            df_temporal.columns = ['fecha', 'interacciones']
-            fig_temporal = px.line(
-                df_temporal,
-                x='fecha',
-                y='interacciones',
-                labels={'fecha': 'Fecha', 'interacciones': 'Interacciones'},
-                markers=True
-            )
+        temporal = _cached_temporal(*posts_args)
+        if temporal is not None:
+            fechas, interacciones = temporal
+            # Traza WebGL construida directamente (sin el ensamblado de plotly.express)
+            fig_temporal = go.Figure(go.Scattergl(
+                x=fechas,
+                y=interacciones,
+                mode='lines+markers',
+                name='Interacciones'
+            ))
+            fig_temporal.update_layout(xaxis_title='Fecha', yaxis_title='Interacciones')
             st.plotly_chart(fig_temporal, width='stretch')
         else:
             st.info("No hay datos de fechas disponibles.")
@@ -845,42 +1159,32 @@ def show_dashboard():
     # Sentiment analysis
     st.subheader("😊 Análisis de Sentimiento")
     
-    sentiment_stats = get_sentiment_stats(
-        profile_id=profile_filter,
-        platform=platform_filter
-    )
+    sentiment_stats = _cached_sentiment(profile_filter, platform_filter)
     
     if sentiment_stats['total'] > 0:
         col1, col2 = st.columns(2)
         
         with col1:
             # Pie chart
-            sentiment_df = pd.DataFrame({
-                'Sentimiento': list(sentiment_stats['counts'].keys()),
-                'Cantidad': list(sentiment_stats['counts'].values())
-            })
-            fig_sentiment = px.pie(
-                sentiment_df,
-                values='Cantidad',
-                names='Sentimiento',
-                title="Distribución de Sentimiento",
-                color='Sentimiento',
-                color_discrete_map={
-                    'POSITIVE': 'green',
-                    'NEGATIVE': 'red',
-                    'NEUTRAL': 'gray'
-                }
-            )
+            # Directo desde el dict de conteos: sin DataFrame intermedio ni plotly.express
+            sentiment_counts = sentiment_stats['counts']
+            fig_sentiment = go.Figure(go.Pie(
+                labels=list(sentiment_counts),
+                values=list(sentiment_counts.values()),
+                marker_colors=[SENTIMENT_COLORS.get(label, 'gray') for label in sentiment_counts]
+            ))
+            fig_sentiment.update_layout(title="Distribución de Sentimiento")
             st.plotly_chart(fig_sentiment, width='stretch')
         
         with col2:
             # Percentages
             st.markdown("### Porcentajes")
-            for label, pct in sentiment_stats['percentages'].items():
+            # get_sentiment_stats construye percentages recorriendo counts: mismo orden de claves
+            for (label, pct), count in zip(sentiment_stats['percentages'].items(), sentiment_stats['counts'].values()):
                 st.metric(
                     label,
                     f"{pct:.1f}%",
-                    delta=f"{sentiment_stats['counts'][label]} comentarios"
+                    delta=f"{count} comentarios"
                 )
     else:
         st.info("No hay datos de sentimiento disponibles. Ejecuta un análisis primero.")
@@ -890,14 +1194,15 @@ def show_dashboard():
     # Top Posts Table
     st.subheader("🏆 Top Posts")
     
-    top_posts = df_posts.nlargest(10, 'interactions_total')[
+    # Top-K sobre la Serie numérica y luego proyección: el ranking no toca las columnas de texto
+    top_idx = df_posts['interactions_total'].nlargest(10, keep='first').index
+    top_posts = df_posts.loc[
+        top_idx,
         ['username_or_url', 'platform', 'text', 'likes', 'comments_count', 'shares', 'interactions_total', 'posted_at']
     ]
     
     # Truncate text for display
-    top_posts['text'] = top_posts['text'].apply(
-        lambda x: (x[:100] + '...') if x and len(str(x)) > 100 else x
-    )
+    top_posts['text'] = _truncate_text(top_posts['text'], 100)
     
     st.dataframe(
         top_posts,
@@ -923,33 +1228,27 @@ def show_dashboard():
         key="min_comment_likes"
     )
     
-    # Get comments
-    comments = get_comments_for_dashboard(
-        post_id=None,
-        sentiment_label=None if comment_sentiment == "Todos" else comment_sentiment,
-        min_likes=min_comment_likes
+    # Get comments (el filtro de perfil va en el JOIN con posts, no en pandas)
+    df_comments = _cached_comments(
+        None if comment_sentiment == "Todos" else comment_sentiment,
+        int(min_comment_likes),
+        profile_filter
     )
     
-    if comments:
-        df_comments = pd.DataFrame(comments)
-        
-        # Filter by selected post if needed
-        if profile_filter:
-            # Get post IDs for selected profile
-            post_ids_for_profile = [p['id'] for p in posts if p.get('profile_id') == profile_filter]
-            df_comments = df_comments[df_comments['post_id'].isin(post_ids_for_profile)]
+    if not df_comments.empty:
         
         # Display table
-        display_cols = ['text', 'author', 'likes', 'sentiment_label', 'sentiment_score', 'posted_at']
-        df_display = df_comments[display_cols].copy()
-        df_display['text'] = df_display['text'].apply(
-            lambda x: (x[:150] + '...') if x and len(str(x)) > 150 else x
-        )
+        # assign devuelve un frame nuevo sin copiar a mano las columnas que no cambian
+        df_display = df_comments.assign(text=_truncate_text(df_comments['text'], 150))
         
         st.dataframe(df_display, width='stretch', hide_index=True)
         
         # Export button
-        csv = df_comments.to_csv(index=False)
+        csv = _cached_comments_csv(
+            None if comment_sentiment == "Todos" else comment_sentiment,
+            int(min_comment_likes),
+            profile_filter
+        )
         st.download_button(
             label="📥 Descargar Comentarios (CSV)",
             data=csv,
@@ -2,29 +2,41 @@
 Configuration management module.
 Handles loading and saving all application settings from/to SQLite database.
 """
-from typing import Any, Dict, List, Optional
-from db_utils import get_config, set_config, init_database
-
-# Default configuration values
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Sequence
+from db_utils import (
+    set_config_raw, get_all_config_rows, bulk_set_defaults, init_database,
+    encode_config_value, decode_config_value, config_value_type, sqlite_config_version
+)
+
+# Default configuration values (solo lectura: MappingProxyType y tuplas, nadie puede mutar los defaults)
 # API keys por plataforma/perfil: una para cada perfil Facebook, una Instagram, una TikTok
-DEFAULT_CONFIG = {
+DEFAULT_CONFIG = MappingProxyType({
     "apify_token": "",  # Token por defecto (fallback)
     "apify_token_facebook_1": "",
     "apify_token_facebook_2": "",
     "apify_token_instagram": "",
     "apify_token_tiktok": "",
     "huggingface_model": "cardiffnlp/twitter-xlm-roberta-base-sentiment",
+    "sentiment_batch_size": 32,  # Textos por lote en la llamada al modelo (analyze_batch)
+    "int8_quantization": True,  # CPU: cuantización dinámica int8 de las capas Linear del modelo (≈ mitad de RAM)
+    "sentiment_onnx_runtime": False,  # Exportar el modelo a ONNX Runtime (requiere optimum[onnxruntime])
+    "sentiment_compile_model": False,  # torch.compile del modelo al cargarlo (más lento al arrancar, más rápido después)
+    "sentiment_min_text_length": 2,  # Textos más cortos (o sin letras, p.ej. solo emojis) van a NEUTRAL sin pasar por el modelo
     # Afinadas para comentarios de redes (Riobamba/EC): positivas y negativas
-    "keywords_positive": [
+    "keywords_positive": (
         "excelente", "exelente", "recomiendo", "genial", "perfecto", "amazing", "great", "love", "best",
         "chevere", "chévere", "maravilla", "disfrute", "hermosura", "bienvenido", "dale", "desarrollo",
         "despertando", "gusto", "balneario", "visitar", "carnaval",
-    ],
-    "keywords_negative": [
+    ),
+    "keywords_negative": (
         "malo", "horrible", "terrible", "pésimo", "bad", "worst", "hate", "disappointed",
         "mierda", "asco", "huecos", "polvo", "delincuencia", "reelección", "pagaron", "puro polvo",
         "no hace nada", "no hace", "tierra", "inconcluso", "abandonado", "bache", "dejaron",
-    ],
+    ),
     "actor_instagram_posts": "shu8hvrXbJbY3Eb9W",
     "actor_instagram_comments": "instagram-comment-scraper",
     "actor_tiktok_posts": "GdWCkxBtKWOsKjdch",  # clockworks/tiktok-scraper (the correct actor)
@@ -37,36 +49,98 @@ DEFAULT_CONFIG = {
     "date_from": None,  # Filter posts from this date for ALL platforms (YYYY-MM-DD format, None = no filter)
     "date_to": None,  # Filter posts to this date for ALL platforms (YYYY-MM-DD format, None = no filter)
     "last_days": 7,  # Alternative: filter by last N days for ALL platforms (0 = no filter)
-}
+})
+
+# Valores por defecto ya serializados una sola vez (los usa la siembra inicial)
+_DEFAULT_CONFIG_ENCODED = {key: encode_config_value(value) for key, value in DEFAULT_CONFIG.items()}
+
+
+# Caché en memoria de la tabla config (una sola SELECT); los set_* escriben en BD y aquí.
+# Cambios hechos desde otro proceso (API / Streamlit): con SQLite local se comprueba como mucho cada
+# CONFIG_VERSION_CHECK_SECS la versión de config (config_version, la mantienen triggers solo sobre
+# config) y se recarga si cambió; con Postgres / Turso se recarga cada CONFIG_CACHE_TTL segundos.
+CONFIG_CACHE_TTL = float(os.environ.get("CONFIG_CACHE_TTL", "30"))
+CONFIG_VERSION_CHECK_SECS = float(os.environ.get("CONFIG_VERSION_CHECK_SECS", "1"))
+_CONFIG_CACHE: Dict[str, Any] = {}
+_config_cache_loaded_at: Optional[float] = None
+_config_cache_checked_at: float = 0.0
+_config_cache_version: Optional[int] = None
+_config_cache_lock = threading.Lock()
+
+
+def reload_config_cache(version: Optional[int] = None) -> None:
+    """Reload every config value from the database in one query."""
+    global _config_cache_loaded_at, _config_cache_checked_at, _config_cache_version
+    if version is None:
+        version = sqlite_config_version()
+    rows = get_all_config_rows()
+    with _config_cache_lock:
+        _CONFIG_CACHE.clear()
+        _CONFIG_CACHE.update(rows)
+        _config_cache_loaded_at = _config_cache_checked_at = time.monotonic()
+        _config_cache_version = version
+
+
+def _get_config(key: str, default: Any = None) -> Any:
+    global _config_cache_checked_at
+    if _config_cache_loaded_at is None:
+        reload_config_cache()
+    else:
+        now = time.monotonic()
+        if now - _config_cache_checked_at >= CONFIG_VERSION_CHECK_SECS:
+            _config_cache_checked_at = now
+            version = sqlite_config_version()
+            if version is not None:
+                # Leída antes de recargar: un cambio concurrente provoca otra recarga, nunca una pérdida
+                if version != _config_cache_version:
+                    reload_config_cache(version)
+            elif now - _config_cache_loaded_at > CONFIG_CACHE_TTL:
+                reload_config_cache()
+    return _CONFIG_CACHE.get(key, default)
+
+
+def _get_bool_config(key: str) -> bool:
+    """Flag booleano; tolera filas antiguas con "True"/"False" como texto (bool("False") sería True)."""
+    value = _get_config(key, DEFAULT_CONFIG[key])
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def _set_config(key: str, value: Any) -> None:
+    encoded = encode_config_value(value)
+    value_type = config_value_type(encoded)
+    # Guardar lo mismo que devolvería get_config al releerlo (p.ej. True -> "True")
+    decoded = decode_config_value(encoded, value_type)
+    set_config_raw(key, encoded, value_type, decoded)
+    _CONFIG_CACHE[key] = decoded
 
 
 def ensure_database_initialized() -> None:
     """Ensure database is initialized with default config if needed."""
     init_database()
-    
-    # Set default values if they don't exist
-    for key, value in DEFAULT_CONFIG.items():
-        if get_config(key) is None:
-            set_config(key, value)
+    # Set default values if they don't exist (una SELECT + un executemany)
+    bulk_set_defaults(_DEFAULT_CONFIG_ENCODED)
+    reload_config_cache()
 
 
 def get_apify_token() -> str:
     """Get Apify API token from configuration."""
-    return get_config("apify_token", "")
+    return _get_config("apify_token", "")
 
 
 def set_apify_token(token: str) -> None:
     """Set Apify API token in configuration."""
-    set_config("apify_token", token)
+    _set_config("apify_token", token)
 
 
 # Tokens por plataforma/perfil (repartir cuota: Facebook x2, Instagram, TikTok)
 def _get_apify_token_key(key: str) -> str:
-    return get_config(key, "")
+    return _get_config(key, "")
 
 
 def _set_apify_token_key(key: str, token: str) -> None:
-    set_config(key, token)
+    _set_config(key, token)
 
 
 def get_apify_token_facebook_1() -> str:
@@ -126,7 +200,7 @@ def get_apify_token_for_profile(profile_id: Optional[int] = None, profile: Optio
     pid = p.get("id") or profile_id
     key = (p.get("apify_token_key") or "").strip()
     if key:
-        token = get_config(f"apify_token_{key}", "")
+        token = _get_config(f"apify_token_{key}", "")
         if token:
             return token
     platform = (p.get("platform") or "").lower()
@@ -153,107 +227,188 @@ def get_apify_token_for_profile(profile_id: Optional[int] = None, profile: Optio
 
 def get_huggingface_model() -> str:
     """Get HuggingFace model name from configuration."""
-    return get_config("huggingface_model", DEFAULT_CONFIG["huggingface_model"])
+    return _get_config("huggingface_model", DEFAULT_CONFIG["huggingface_model"])
 
 
 def set_huggingface_model(model: str) -> None:
     """Set HuggingFace model name in configuration."""
-    set_config("huggingface_model", model)
+    _set_config("huggingface_model", model)
+
+
+def get_sentiment_batch_size() -> int:
+    """Get batch size for model inference in analyze_batch."""
+    value = _get_config("sentiment_batch_size", DEFAULT_CONFIG["sentiment_batch_size"])
+    try:
+        return max(1, int(value))
+    except (ValueError, TypeError):
+        return DEFAULT_CONFIG["sentiment_batch_size"]
+
+
+def set_sentiment_batch_size(batch_size: int) -> None:
+    """Set batch size for model inference in analyze_batch."""
+    _set_config("sentiment_batch_size", max(1, int(batch_size)))
+
+
+def get_int8_quantization() -> bool:
+    """Get whether to apply dynamic int8 quantization to the sentiment model on CPU."""
+    return _get_bool_config("int8_quantization")
+
+
+def set_int8_quantization(enabled: bool) -> None:
+    """Set whether to apply dynamic int8 quantization to the sentiment model on CPU."""
+    _set_config("int8_quantization", enabled)
+
+
+def get_sentiment_onnx_runtime() -> bool:
+    """Get whether to run the sentiment model with ONNX Runtime (optimum)."""
+    return _get_bool_config("sentiment_onnx_runtime")
+
+
+def set_sentiment_onnx_runtime(enabled: bool) -> None:
+    """Set whether to run the sentiment model with ONNX Runtime (optimum)."""
+    _set_config("sentiment_onnx_runtime", enabled)
+
+
+def get_sentiment_compile_model() -> bool:
+    """Get whether to compile the sentiment model with torch.compile after loading."""
+    return _get_bool_config("sentiment_compile_model")
 
 
-def get_keywords_positive() -> List[str]:
-    """Get list of positive keywords from configuration."""
-    keywords = get_config("keywords_positive", DEFAULT_CONFIG["keywords_positive"])
-    if isinstance(keywords, list):
+def set_sentiment_compile_model(enabled: bool) -> None:
+    """Set whether to compile the sentiment model with torch.compile after loading."""
+    _set_config("sentiment_compile_model", enabled)
+
+
+def get_sentiment_min_text_length() -> int:
+    """Get minimum stripped text length for a comment to be sent to the sentiment model."""
+    value = _get_config("sentiment_min_text_length", DEFAULT_CONFIG["sentiment_min_text_length"])
+    try:
+        return max(0, int(value))
+    except (ValueError, TypeError):
+        return DEFAULT_CONFIG["sentiment_min_text_length"]
+
+
+def set_sentiment_min_text_length(length: int) -> None:
+    """Set minimum stripped text length for a comment to be sent to the sentiment model."""
+    _set_config("sentiment_min_text_length", max(0, int(length)))
+
+
+def get_keywords_positive() -> Sequence[str]:
+    """Get positive keywords from configuration (list guardada, o la tupla por defecto)."""
+    keywords = _get_config("keywords_positive", DEFAULT_CONFIG["keywords_positive"])
+    if isinstance(keywords, (list, tuple)):
         return keywords
     return DEFAULT_CONFIG["keywords_positive"]
 
 
 def set_keywords_positive(keywords: List[str]) -> None:
     """Set list of positive keywords in configuration."""
-    set_config("keywords_positive", keywords)
+    _set_config("keywords_positive", keywords)
 
 
-def get_keywords_negative() -> List[str]:
-    """Get list of negative keywords from configuration."""
-    keywords = get_config("keywords_negative", DEFAULT_CONFIG["keywords_negative"])
-    if isinstance(keywords, list):
+def get_keywords_negative() -> Sequence[str]:
+    """Get negative keywords from configuration (list guardada, o la tupla por defecto)."""
+    keywords = _get_config("keywords_negative", DEFAULT_CONFIG["keywords_negative"])
+    if isinstance(keywords, (list, tuple)):
         return keywords
     return DEFAULT_CONFIG["keywords_negative"]
 
 
 def set_keywords_negative(keywords: List[str]) -> None:
     """Set list of negative keywords in configuration."""
-    set_config("keywords_negative", keywords)
+    _set_config("keywords_negative", keywords)
+
+
+# frozenset por lista de keywords: se reconstruye solo cuando cambia la lista en la caché de config
+_keyword_sets: Dict[str, tuple] = {}
+
+
+def _keyword_set(key: str, keywords: Sequence[str]) -> frozenset:
+    cached = _keyword_sets.get(key)
+    if cached is not None and cached[0] is keywords:
+        return cached[1]
+    result = frozenset(keywords)
+    _keyword_sets[key] = (keywords, result)
+    return result
+
+
+def get_keywords_positive_set() -> frozenset:
+    """Positive keywords as a frozenset (O(1) membership, hashable); order-preserving list stays in get_keywords_positive."""
+    return _keyword_set("keywords_positive", get_keywords_positive())
+
+
+def get_keywords_negative_set() -> frozenset:
+    """Negative keywords as a frozenset (O(1) membership, hashable); order-preserving list stays in get_keywords_negative."""
+    return _keyword_set("keywords_negative", get_keywords_negative())
 
 
 def get_actor_id(platform: str, actor_type: str = "posts") -> str:
     """Get Apify Actor ID for a platform and type (posts or comments)."""
     key = f"actor_{platform.lower()}_{actor_type}"
-    return get_config(key, DEFAULT_CONFIG.get(key, ""))
+    return _get_config(key, DEFAULT_CONFIG.get(key, ""))
 
 
 def set_actor_id(platform: str, actor_type: str, actor_id: str) -> None:
     """Set Apify Actor ID for a platform and type."""
     key = f"actor_{platform.lower()}_{actor_type}"
-    set_config(key, actor_id)
+    _set_config(key, actor_id)
 
 
 def get_default_limit_posts() -> int:
     """Get default limit for number of posts to scrape."""
-    v = get_config("default_limit_posts", DEFAULT_CONFIG["default_limit_posts"])
+    v = _get_config("default_limit_posts", DEFAULT_CONFIG["default_limit_posts"])
     return int(v) if v is not None else DEFAULT_CONFIG["default_limit_posts"]
 
 
 def set_default_limit_posts(limit: int) -> None:
     """Set default limit for number of posts to scrape."""
-    set_config("default_limit_posts", int(limit))
+    _set_config("default_limit_posts", int(limit))
 
 
 def get_default_limit_comments() -> int:
     """Get default limit for number of comments per post."""
-    v = get_config("default_limit_comments", DEFAULT_CONFIG["default_limit_comments"])
+    v = _get_config("default_limit_comments", DEFAULT_CONFIG["default_limit_comments"])
     return int(v) if v is not None else DEFAULT_CONFIG["default_limit_comments"]
 
 
 def set_default_limit_comments(limit: int) -> None:
     """Set default limit for number of comments per post."""
-    set_config("default_limit_comments", int(limit))
+    _set_config("default_limit_comments", int(limit))
 
 
 def get_auto_skip_recent() -> bool:
     """Get whether to auto-skip recently analyzed profiles."""
-    return get_config("auto_skip_recent", DEFAULT_CONFIG["auto_skip_recent"])
+    return _get_bool_config("auto_skip_recent")
 
 
 def set_auto_skip_recent(enabled: bool) -> None:
     """Set whether to auto-skip recently analyzed profiles."""
-    set_config("auto_skip_recent", enabled)
+    _set_config("auto_skip_recent", enabled)
 
 
 def get_date_from() -> Optional[str]:
     """Get date filter from for ALL platforms (YYYY-MM-DD format)."""
-    return get_config("date_from", DEFAULT_CONFIG["date_from"])
+    return _get_config("date_from", DEFAULT_CONFIG["date_from"])
 
 
 def set_date_from(date_str: Optional[str]) -> None:
     """Set date filter from for ALL platforms (YYYY-MM-DD format or None)."""
-    set_config("date_from", date_str)
+    _set_config("date_from", date_str)
 
 
 def get_date_to() -> Optional[str]:
     """Get date filter to for ALL platforms (YYYY-MM-DD format)."""
-    return get_config("date_to", DEFAULT_CONFIG["date_to"])
+    return _get_config("date_to", DEFAULT_CONFIG["date_to"])
 
 
 def set_date_to(date_str: Optional[str]) -> None:
     """Set date filter to for ALL platforms (YYYY-MM-DD format or None)."""
-    set_config("date_to", date_str)
+    _set_config("date_to", date_str)
 
 
 def get_last_days() -> int:
     """Get last N days filter for ALL platforms (0 = no filter)."""
-    value = get_config("last_days", DEFAULT_CONFIG["last_days"])
+    value = _get_config("last_days", DEFAULT_CONFIG["last_days"])
     # Ensure it's an integer (config might store as string)
     try:
         return int(value) if value is not None else DEFAULT_CONFIG["last_days"]
@@ -263,7 +418,7 @@ def get_last_days() -> int:
 
 def set_last_days(days: int) -> None:
     """Set last N days filter for ALL platforms (0 = no filter)."""
-    set_config("last_days", days)
+    _set_config("last_days", days)
 
 
 def get_all_config() -> Dict[str, Any]:
@@ -275,6 +430,11 @@ def get_all_config() -> Dict[str, Any]:
         "apify_token_instagram": get_apify_token_instagram(),
         "apify_token_tiktok": get_apify_token_tiktok(),
         "huggingface_model": get_huggingface_model(),
+        "sentiment_batch_size": get_sentiment_batch_size(),
+        "int8_quantization": get_int8_quantization(),
+        "sentiment_onnx_runtime": get_sentiment_onnx_runtime(),
+        "sentiment_compile_model": get_sentiment_compile_model(),
+        "sentiment_min_text_length": get_sentiment_min_text_length(),
         "keywords_positive": get_keywords_positive(),
         "keywords_negative": get_keywords_negative(),
         "actor_instagram_posts": get_actor_id("instagram", "posts"),
@@ -7,16 +7,27 @@ Handles initialization, schema creation, and common database operations.
 """
 import json
 import os
+import atexit
 import csv
 import io
-from typing import Any, Dict, List, Optional, Tuple
-from datetime import datetime
+import itertools
+import queue
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+from datetime import datetime, timezone
 from pathlib import Path
 
+from utils import parse_timestamp
+
 # Try to import PostgreSQL adapter
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    import psycopg2.pool
+    from psycopg2.extras import Json, RealDictCursor, execute_values, register_default_jsonb
     PSYCOPG2_AVAILABLE = True
 except ImportError:
     PSYCOPG2_AVAILABLE = False
@@ -28,6 +39,13 @@ try:
 except ImportError:
     SQLITE_AVAILABLE = False
 
+# Import opcional: orjson (de)serializa los valores de config varias veces más rápido que json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Try to import Turso/libSQL client (pip install libsql-client)
 try:
     import libsql_client
@@ -41,6 +59,7 @@ DB_PATH = Path(os.getenv("DB_PATH", str(_THIS_DIR / "social_media_analytics.db")
 
 # Cadenas de conexión por variable de entorno
 DATABASE_URL = os.getenv("DATABASE_URL")  # Postgres: postgresql://...
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")  # Postgres réplica de lectura (opcional)
 TURSO_DATABASE_URL = os.getenv("TURSO_DATABASE_URL")  # Turso: libsql://nombre-usuario.region.turso.io
 TURSO_AUTH_TOKEN = os.getenv("TURSO_AUTH_TOKEN")  # Token desde Turso Cloud → Create Token
 
@@ -54,6 +73,18 @@ USE_TURSO = (
 )
 USE_SQLITE = not USE_POSTGRES and not USE_TURSO and SQLITE_AVAILABLE
 
+# UPSERT ... RETURNING (SQLite >= 3.35; Turso/libSQL siempre lo soporta): evita el SELECT previo
+SQLITE_RETURNING = USE_TURSO or (SQLITE_AVAILABLE and sqlite3.sqlite_version_info >= (3, 35, 0))
+# Columnas generadas (SQLite >= 3.31; Turso/libSQL y Postgres >= 12): posts.interactions_total
+SQLITE_GENERATED_COLUMNS = USE_TURSO or (SQLITE_AVAILABLE and sqlite3.sqlite_version_info >= (3, 31, 0))
+
+# Errores de driver sobre los que se hace rollback explícito en las escrituras (Turso no tiene transacción abierta)
+_DB_ERRORS: Tuple[type, ...] = ()
+if PSYCOPG2_AVAILABLE:
+    _DB_ERRORS += (psycopg2.Error,)
+if SQLITE_AVAILABLE:
+    _DB_ERRORS += (sqlite3.Error,)
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -84,6 +115,20 @@ class _TursoCursorWrapper:
         args = list(params) if params else None
         self._last_result = self._conn._client.execute(query, args)
 
+    def executemany(self, query: str, seq_of_params) -> None:
+        # batch: todas las sentencias en una sola petición HTTP y una transacción
+        stmts = [(query, list(params)) for params in seq_of_params]
+        if stmts:
+            results = self._conn._client.batch(stmts)
+            self._last_result = results[-1] if results else None
+
+    def execute_batch(self, statements) -> None:
+        """Varias sentencias distintas [(sql, params), ...] en una sola petición HTTP y una transacción."""
+        stmts = [(query, list(params)) for query, params in statements]
+        if stmts:
+            results = self._conn._client.batch(stmts)
+            self._last_result = results[-1] if results else None
+
     def fetchall(self):
         if not self._last_result:
             return []
@@ -138,67 +183,347 @@ class _TursoConnectionWrapper:
             pass
 
 
+# --- Pool de conexiones (Postgres y SQLite) ---
+# Los helpers siguen haciendo get_connection() ... conn.close(); close() devuelve la conexión al pool.
+# DB_POOL_SIZE=0 desactiva el pool (una conexión nueva por llamada, como antes).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+_pg_pool = None
+_pg_read_pool = None
+_sqlite_pool: "queue.Queue" = queue.Queue(maxsize=max(DB_POOL_SIZE, 1))
+# SQLite: lectores aparte en modo solo lectura (con WAL leen en paralelo al escritor)
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+_sqlite_read_pool: "queue.Queue" = queue.Queue(maxsize=max(SQLITE_READ_POOL_SIZE, 1))
+_pool_lock = threading.Lock()
+
+
+class _PooledConnection:
+    """Proxy de una conexión del pool: todo se delega salvo close(), que la devuelve al pool."""
+    def __init__(self, conn, release):
+        self._conn = conn
+        self._release = release
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            # Deshacer lo no confirmado (Postgres abre transacción incluso en SELECT)
+            conn.rollback()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._release(conn, broken=True)
+            return
+        self._release(conn, broken=False)
+
+
+def _get_pg_pool():
+    global _pg_pool
+    if _pg_pool is None:
+        with _pool_lock:
+            if _pg_pool is None:
+                _pg_pool = psycopg2.pool.ThreadedConnectionPool(1, DB_POOL_SIZE, DATABASE_URL)
+    return _pg_pool
+
+
+# Pool de lectura: réplica si REPLICA_DATABASE_URL está definida (si no, el primario), con las
+# sesiones en solo lectura para que ninguna escritura se cuele por get_read_connection.
+_PG_READ_OPTIONS = "-c default_transaction_read_only=on"
+
+
+def _pg_read_url() -> str:
+    return (REPLICA_DATABASE_URL or "").strip() or DATABASE_URL
+
+
+def _get_pg_read_pool():
+    global _pg_read_pool
+    if _pg_read_pool is None:
+        with _pool_lock:
+            if _pg_read_pool is None:
+                _pg_read_pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, DB_POOL_SIZE, _pg_read_url(), options=_PG_READ_OPTIONS
+                )
+    return _pg_read_pool
+
+
+def _release_pg_read(conn, broken: bool) -> None:
+    _get_pg_read_pool().putconn(conn, close=broken or bool(conn.closed))
+
+
+def _release_pg(conn, broken: bool) -> None:
+    if not broken and not conn.closed and conn.autocommit:
+        # Prestada como conexión de lectura (get_read_connection() sin réplica): volver al modo transaccional
+        conn.autocommit = False
+    _get_pg_pool().putconn(conn, close=broken or bool(conn.closed))
+
+
+# PRAGMAs por conexión (se aplican al crearla, no en cada préstamo del pool).
+# journal_mode=WAL es persistente en el fichero: basta una vez por proceso.
+_SQLITE_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",  # seguro con WAL; sin fsync en cada commit
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256 MB de lecturas mapeadas en memoria
+    "PRAGMA cache_size=-65536",  # 64 MB de caché de páginas
+    "PRAGMA busy_timeout=5000",  # esperar al escritor en vez de fallar con "database is locked"
+    "PRAGMA foreign_keys=ON",  # ON DELETE CASCADE de posts/comments (igual que en Postgres)
+)
+_SQLITE_READ_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+)
+# Sentencias compiladas que sqlite3 guarda por conexión. Las 32 variantes del WHERE de posts y de
+# comentarios (cada una con y sin LIMIT) más las sentencias fijas caben sin desalojos.
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", "512"))
+_sqlite_wal_enabled = False
+
+
+def _adapt_sqlite_datetime(value: datetime) -> str:
+    """
+    datetime -> 'YYYY-MM-DD HH:MM:SS' en UTC, el mismo formato que CURRENT_TIMESTAMP.
+    Texto de ancho fijo: claves de índice más cortas y comparaciones (posted_at >= ?) correctas
+    aunque el valor venga con zona horaria o microsegundos (el adaptador por defecto los conservaba).
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(" ", "seconds")
+
+
+if SQLITE_AVAILABLE:
+    sqlite3.register_adapter(datetime, _adapt_sqlite_datetime)
+
+
+def _new_sqlite_connection():
+    global _sqlite_wal_enabled
+    # check_same_thread=False: la conexión puede volver al pool desde otro hilo (API, análisis en background)
+    # cached_statements: caché de sentencias preparadas de sqlite3 por conexión; con el pool
+    # la conexión vive entre llamadas y las consultas repetidas no se vuelven a compilar
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=DB_POOL_SIZE <= 0, cached_statements=SQLITE_CACHED_STATEMENTS
+    )
+    conn.row_factory = sqlite3.Row
+    if not _sqlite_wal_enabled:
+        try:
+            # WAL: los lectores (dashboard) no bloquean al escritor (scraping) y viceversa
+            conn.execute("PRAGMA journal_mode=WAL")
+            _sqlite_wal_enabled = True
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Could not enable SQLite WAL mode: {e}")
+    for pragma in _SQLITE_CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _release_sqlite(conn, broken: bool) -> None:
+    if broken:
+        return
+    try:
+        _sqlite_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def _new_sqlite_read_connection():
+    # mode=ro: el fichero se abre sin permiso de escritura; query_only rechaza además cualquier escritura
+    conn = sqlite3.connect(
+        f"{DB_PATH.absolute().as_uri()}?mode=ro", uri=True,
+        check_same_thread=SQLITE_READ_POOL_SIZE <= 0, cached_statements=SQLITE_CACHED_STATEMENTS
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in _SQLITE_READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _release_sqlite_read(conn, broken: bool) -> None:
+    if broken:
+        return
+    try:
+        _sqlite_read_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+# Versión de la tabla config en SQLite local: la suben triggers en cada INSERT/UPDATE/DELETE de config.
+# config.py la consulta para saber si recargar su caché; PRAGMA data_version no servía porque cambia con
+# cualquier escritura (posts y comentarios durante el scraping), no solo con las de config.
+_CONFIG_VERSION_SQLITE_DDL = (
+    "CREATE TABLE IF NOT EXISTS config_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO config_version (id, version) VALUES (1, 0)",
+) + tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS config_version_{suffix} AFTER {event} ON config BEGIN
+        UPDATE config_version SET version = version + 1 WHERE id = 1;
+    END"""
+    for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+)
+
+# Conexión dedicada (solo lectura) para leer config_version sin ocupar una del pool
+_sqlite_version_conn = None
+_sqlite_version_lock = threading.Lock()
+
+
+def sqlite_config_version() -> Optional[int]:
+    """
+    Versión de la tabla config (SQLite local): si no cambia entre dos llamadas, nadie ha tocado la config.
+    None con Postgres / Turso, o si la BD aún no tiene config_version (los llamadores usan su TTL).
+    """
+    global _sqlite_version_conn
+    if not USE_SQLITE:
+        return None
+    with _sqlite_version_lock:
+        if _sqlite_version_conn is None:
+            _sqlite_version_conn = sqlite3.connect(
+                f"{DB_PATH.absolute().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )
+        try:
+            row = _sqlite_version_conn.execute("SELECT version FROM config_version WHERE id = 1").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
+
+def close_pools() -> None:
+    """Cierra las conexiones que quedan en los pools (se registra con atexit)."""
+    global _pg_pool, _pg_read_pool, _sqlite_version_conn
+    with _pool_lock:
+        pools, _pg_pool, _pg_read_pool = (_pg_pool, _pg_read_pool), None, None
+    with _sqlite_version_lock:
+        version_conn, _sqlite_version_conn = _sqlite_version_conn, None
+    if version_conn is not None:
+        version_conn.close()
+    for pool in pools:
+        if pool is not None:
+            pool.closeall()
+    # Primero los lectores: la última conexión en cerrarse (una de escritura) hace el checkpoint del WAL
+    for sqlite_pool in (_sqlite_read_pool, _sqlite_pool):
+        while True:
+            try:
+                conn = sqlite_pool.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+# Al salir, cerrar limpiamente: SQLite hace checkpoint del WAL al cerrar la última conexión
+atexit.register(close_pools)
+
+
+# Postgres: sentencias preparadas en el servidor (PREPARE ... / EXECUTE) por conexión física.
+# psycopg2 no prepara nada por sí mismo; las consultas más repetidas se preparan una vez por sesión.
+_pg_prepared_statements: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _pg_execute_prepared(conn, cursor, name: str, sql: str, params: Tuple) -> None:
+    """Ejecuta sql (con $1..$n) como sentencia preparada `name`, preparándola la primera vez en esta conexión."""
+    raw = conn._conn if isinstance(conn, _PooledConnection) else conn
+    prepared = _pg_prepared_statements.setdefault(raw, set())
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        prepared.add(name)
+    cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+
 def get_connection():
-    """Get a database connection (PostgreSQL, Turso or SQLite)."""
+    """Get a database connection (PostgreSQL, Turso or SQLite). close() la devuelve al pool."""
     if USE_POSTGRES:
-        return psycopg2.connect(DATABASE_URL)
+        if DB_POOL_SIZE <= 0:
+            return psycopg2.connect(DATABASE_URL)
+        try:
+            return _PooledConnection(_get_pg_pool().getconn(), _release_pg)
+        except psycopg2.pool.PoolError:
+            # Pool agotado: conexión suelta que se cierra de verdad al hacer close()
+            return psycopg2.connect(DATABASE_URL)
     if USE_TURSO:
         return _TursoConnectionWrapper()
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    if DB_POOL_SIZE <= 0:
+        return _new_sqlite_connection()
+    try:
+        conn = _sqlite_pool.get_nowait()
+    except queue.Empty:
+        conn = _new_sqlite_connection()
+    return _PooledConnection(conn, _release_sqlite)
+
+
+def get_read_connection(replica: bool = False):
+    """
+    Conexión para consultas de solo lectura: no se hace commit.
+    En Postgres va en autocommit (sin BEGIN/ROLLBACK alrededor de cada SELECT) y por defecto lee del
+    primario, para ver lo recién escrito en la misma petición o trabajo (read-your-writes).
+    replica=True usa el pool de lectura (REPLICA_DATABASE_URL si existe, default_transaction_read_only=on):
+    solo para agregados del dashboard y estadísticas, que toleran el retraso de replicación.
+    En SQLite sale del pool de lectores (mode=ro + query_only), que con WAL no bloquean al escritor.
+    """
+    if USE_SQLITE:
+        if SQLITE_READ_POOL_SIZE <= 0:
+            return get_connection()
+        try:
+            conn = _sqlite_read_pool.get_nowait()
+        except queue.Empty:
+            conn = _new_sqlite_read_connection()
+        return _PooledConnection(conn, _release_sqlite_read)
+    if not USE_POSTGRES:
+        return get_connection()
+    if not replica:
+        conn = get_connection()
+    elif DB_POOL_SIZE <= 0:
+        conn = psycopg2.connect(_pg_read_url(), options=_PG_READ_OPTIONS)
+    else:
+        try:
+            conn = _PooledConnection(_get_pg_read_pool().getconn(), _release_pg_read)
+        except psycopg2.pool.PoolError:
+            # Pool agotado: conexión suelta que se cierra de verdad al hacer close()
+            conn = psycopg2.connect(_pg_read_url(), options=_PG_READ_OPTIONS)
+    raw = conn._conn if isinstance(conn, _PooledConnection) else conn
+    raw.autocommit = True
     return conn
 
 
-def _execute_query(query: str, params: Tuple = (), fetch: bool = True):
-    """Execute a query and return results. Handles both PostgreSQL and SQLite."""
-    conn = get_connection()
+# Literales '...' (con '' escapado) o un placeholder ?: solo se traducen los ? fuera de literales
+_SQL_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|\?")
+
+
+@lru_cache(maxsize=256)
+def _translate_query(query: str) -> str:
+    """Traduce SQL estilo SQLite a Postgres (? -> %s, INSERT OR REPLACE -> INSERT). Memoizado por texto."""
+    if not USE_POSTGRES:
+        return query
+    query = _SQL_PLACEHOLDER_RE.sub(lambda m: "%s" if m.group() == "?" else m.group(), query)
+    # PostgreSQL uses ON CONFLICT instead of INSERT OR REPLACE
+    return query.replace("INSERT OR REPLACE", "INSERT")
+
+
+def _execute_read(query: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+    """Execute a read-only query and return rows as dicts. Handles both PostgreSQL and SQLite."""
+    conn = get_read_connection()
     cursor = conn.cursor()
     
     try:
         # Convert SQLite-style ? placeholders to PostgreSQL %s if needed
-        if USE_POSTGRES:
-            query = query.replace("?", "%s")
-        
+        query = _translate_query(query)
         cursor.execute(query, params)
-        
-        if fetch:
-            if USE_POSTGRES:
-                # Use RealDictCursor for PostgreSQL to get dict-like rows
-                cursor.close()
-                dict_cursor = conn.cursor(cursor_factory=RealDictCursor)
-                dict_cursor.execute(query, params)
-                rows = dict_cursor.fetchall()
-                result = [dict(row) for row in rows]
-                dict_cursor.close()
-            else:
-                # SQLite
-                rows = cursor.fetchall()
-                result = [dict(row) for row in rows]
-        else:
-            result = None
-        
-        conn.commit()
-        return result
-    except Exception as e:
-        conn.rollback()
-        raise
+        return _rows_to_dicts(cursor)
     finally:
         conn.close()
 
 
 def _execute_update(query: str, params: Tuple = ()):
-    """Execute an update/insert query and return lastrowid."""
+    """Execute an update/insert query, commit it and return lastrowid."""
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
         # Convert SQLite-style ? placeholders to PostgreSQL %s if needed
-        if USE_POSTGRES:
-            query = query.replace("?", "%s")
-            # PostgreSQL uses ON CONFLICT instead of INSERT OR REPLACE
-            query = query.replace("INSERT OR REPLACE", "INSERT")
-            query = query.replace("INSERT INTO", "INSERT INTO")
-        
+        query = _translate_query(query)
         cursor.execute(query, params)
         
         if USE_POSTGRES:
@@ -214,13 +539,361 @@ def _execute_update(query: str, params: Tuple = ()):
             conn.commit()
         
         return lastrowid
-    except Exception as e:
+    except _DB_ERRORS:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _add_column_if_missing(cursor, table: str, column: str, col_type: str) -> None:
+    """ALTER TABLE ... ADD COLUMN solo si la columna no existe."""
+    # Para Turso/SQLite: comprobar primero si existe (evita KeyError en libsql_client cuando Turso devuelve error)
+    col_exists = False
+    if USE_POSTGRES:
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+            (table, column)
+        )
+        col_exists = cursor.fetchone() is not None
+    else:
+        cursor.execute(f"PRAGMA table_info({table})")
+        rows = cursor.fetchall()
+        # rows: dict (Turso) o tuple (SQLite) - name es columna 1
+        for r in rows:
+            col_name = r["name"] if isinstance(r, dict) else r[1]
+            if col_name == column:
+                col_exists = True
+                break
+    if not col_exists:
+        try:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+        except Exception as e:
+            if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                pass
+            else:
+                raise
+
+
+def _migrate_sqlite_fk_cascade(conn) -> None:
+    """
+    BD SQLite antiguas: posts/comments se crearon sin ON DELETE CASCADE y SQLite no permite
+    cambiar una FK con ALTER TABLE. Se reconstruye cada tabla afectada (una sola vez).
+    """
+    pending = []
+    for table in ("posts", "comments"):
+        # foreign_key_list: columna 6 = on_delete
+        fks = conn.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+        if any(fk[6].upper() != "CASCADE" for fk in fks):
+            pending.append(table)
+    if not pending:
+        return
+    
+    logger.info(f"Migrating SQLite tables {pending} to ON DELETE CASCADE")
+    conn.commit()
+    # foreign_keys no se puede cambiar dentro de una transacción
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        conn.execute("BEGIN")
+        for table in pending:
+            (create_sql,) = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            new_sql = re.sub(
+                r"(REFERENCES\s+\w+\s*\(\s*id\s*\))(?!\s+ON\s+DELETE)", r"\1 ON DELETE CASCADE", create_sql
+            )
+            new_sql = re.sub(
+                rf"^CREATE TABLE(\s+IF NOT EXISTS)?\s+\"?{table}\"?", f"CREATE TABLE {table}_new", new_sql.strip()
+            )
+            conn.execute(new_sql)
+            conn.execute(f"INSERT INTO {table}_new SELECT * FROM {table}")
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        conn.commit()
+    except Exception:
         conn.rollback()
         raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+
+
+# posts.interactions_total la calcula el motor a partir de sus partes (no puede desincronizarse)
+_INTERACTIONS_TOTAL_EXPR = (
+    "COALESCE(likes, 0) + COALESCE(comments_count, 0) + COALESCE(shares, 0) + COALESCE(views, 0)"
+)
+_INTERACTIONS_TOTAL_COLUMN = f"INTEGER GENERATED ALWAYS AS ({_INTERACTIONS_TOTAL_EXPR}) STORED"
+
+
+@lru_cache(maxsize=1)
+def _posts_interactions_generated() -> bool:
+    """True si posts.interactions_total es columna generada (si no, insert_post la calcula). Cacheado."""
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    try:
+        if USE_POSTGRES:
+            cursor.execute(
+                "SELECT is_generated FROM information_schema.columns "
+                "WHERE table_name = 'posts' AND column_name = 'interactions_total'"
+            )
+            row = cursor.fetchone()
+            return bool(row) and row[0] == "ALWAYS"
+        cursor.execute("PRAGMA table_xinfo(posts)")
+        for r in cursor.fetchall():
+            # table_xinfo: name = columna 1, hidden = columna 6 (2 = VIRTUAL, 3 = STORED)
+            name, hidden = (r["name"], r["hidden"]) if isinstance(r, dict) else (r[1], r[6])
+            if name == "interactions_total":
+                return hidden in (2, 3)
+        return False
+    except Exception:
+        return False
     finally:
         conn.close()
 
 
+def _migrate_pg_generated_interactions(cursor) -> None:
+    """BD Postgres antiguas: interactions_total era una columna normal; se recrea como generada."""
+    cursor.execute(
+        "SELECT is_generated FROM information_schema.columns "
+        "WHERE table_name = 'posts' AND column_name = 'interactions_total'"
+    )
+    row = cursor.fetchone()
+    if row and row[0] == "ALWAYS":
+        return
+    logger.info("Migrating posts.interactions_total to a generated column")
+    # DROP COLUMN elimina también idx_posts_dash, que se vuelve a crear después
+    cursor.execute("ALTER TABLE posts DROP COLUMN IF EXISTS interactions_total")
+    cursor.execute(f"ALTER TABLE posts ADD COLUMN interactions_total {_INTERACTIONS_TOTAL_COLUMN}")
+
+
+def _migrate_sqlite_generated_interactions(conn) -> None:
+    """
+    BD SQLite antiguas: interactions_total era una columna normal. SQLite no puede añadir una
+    columna STORED con ALTER TABLE, así que se reconstruye la tabla posts (una sola vez).
+    """
+    if not SQLITE_GENERATED_COLUMNS:
+        return
+    # table_xinfo: name = columna 1, hidden = columna 6 (2 = VIRTUAL, 3 = STORED)
+    info = {r[1]: r[6] for r in conn.execute("PRAGMA table_xinfo(posts)").fetchall()}
+    if info.get("interactions_total", 0) in (2, 3):
+        return
+    (create_sql,) = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'posts'"
+    ).fetchone()
+    new_sql, replaced = re.subn(
+        r"interactions_total\s+INTEGER(\s+DEFAULT\s+0)?", f"interactions_total {_INTERACTIONS_TOTAL_COLUMN}",
+        create_sql
+    )
+    if not replaced:
+        logger.warning("posts.interactions_total not found in schema; skipping generated column migration")
+        return
+    new_sql = re.sub(r"^CREATE TABLE(\s+IF NOT EXISTS)?\s+\"?posts\"?", "CREATE TABLE posts_new", new_sql.strip())
+    columns = ", ".join(name for name in info if name != "interactions_total")
+    
+    logger.info("Migrating SQLite posts.interactions_total to a generated column")
+    conn.commit()
+    # foreign_keys no se puede cambiar dentro de una transacción
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        conn.execute("BEGIN")
+        conn.execute(new_sql)
+        conn.execute(f"INSERT INTO posts_new ({columns}) SELECT {columns} FROM posts")
+        conn.execute("DROP TABLE posts")
+        conn.execute("ALTER TABLE posts_new RENAME TO posts")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+
+
+def _migrate_pg_config_jsonb(cursor) -> None:
+    """BD Postgres antiguas: config.value era TEXT con JSON codificado; se pasa a JSONB ya decodificado."""
+    cursor.execute(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = 'config' AND column_name = 'value'"
+    )
+    row = cursor.fetchone()
+    if not row or row[0] == "jsonb":
+        return
+    logger.info("Migrating config.value to JSONB")
+    cursor.execute("SELECT key, value, value_type FROM config")
+    decoded = [(Json(decode_config_value(value, value_type)), key) for key, value, value_type in cursor.fetchall()]
+    # to_jsonb(text) siempre es válido; después cada fila recibe su valor decodificado
+    cursor.execute("ALTER TABLE config ALTER COLUMN value TYPE JSONB USING to_jsonb(value)")
+    cursor.executemany("UPDATE config SET value = %s WHERE key = %s", decoded)
+
+
+def _migrate_config_bool_values(cursor) -> None:
+    """
+    Filas de config guardadas antes de la etiqueta 'bool' ("True"/"False" como 'str' o sin etiqueta):
+    se etiquetan como 'bool' (y en Postgres el JSONB pasa de cadena a booleano).
+    """
+    if USE_POSTGRES:
+        cursor.execute(
+            "UPDATE config SET value = to_jsonb(value = '\"True\"'::jsonb), value_type = 'bool' "
+            "WHERE value IN ('\"True\"'::jsonb, '\"False\"'::jsonb)"
+        )
+    else:
+        cursor.execute(
+            "UPDATE config SET value_type = 'bool' "
+            "WHERE value IN ('True', 'False') AND (value_type IS NULL OR value_type <> 'bool')"
+        )
+
+
+def _migrate_sqlite_datetime_text(conn) -> None:
+    """
+    BD SQLite antiguas: posted_at guardado con el adaptador por defecto ('...T...', '+00:00',
+    microsegundos). Se reescribe una vez al formato de _adapt_sqlite_datetime con datetime() de
+    SQLite (misma conversión a UTC); PRAGMA user_version marca la BD como ya migrada.
+    """
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    if version >= 1:
+        return
+    for table in ("posts", "comments"):
+        conn.execute(
+            f"UPDATE {table} SET posted_at = datetime(posted_at) "
+            "WHERE datetime(posted_at) IS NOT NULL AND posted_at <> datetime(posted_at)"
+        )
+    conn.execute("PRAGMA user_version = 1")
+
+
+def _migrate_sqlite_config_without_rowid(conn) -> None:
+    """
+    BD SQLite antiguas: config se creó con rowid (tabla + índice de la PK por separado).
+    Se reconstruye como WITHOUT ROWID dentro de la transacción de init_database (una sola vez).
+    """
+    (create_sql,) = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'config'"
+    ).fetchone()
+    if re.search(r"WITHOUT\s+ROWID", create_sql, re.IGNORECASE):
+        return
+    logger.info("Migrating SQLite config table to WITHOUT ROWID")
+    conn.execute("""
+        CREATE TABLE config_new (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            value_type TEXT
+        ) WITHOUT ROWID
+    """)
+    # Una PK WITHOUT ROWID es NOT NULL; con rowid SQLite admitía key NULL
+    conn.execute(
+        "INSERT INTO config_new (key, value, value_type) "
+        "SELECT key, value, value_type FROM config WHERE key IS NOT NULL"
+    )
+    conn.execute("DROP TABLE config")
+    conn.execute("ALTER TABLE config_new RENAME TO config")
+
+
+# Índices secundarios (nombre, definición): los crea init_database y los rehace bulk_load_context
+_INDEX_DDL = (
+    ("idx_posts_platform", "posts(platform)"),
+    # Filtro más frecuente del dashboard (solo perfil): sirve el ORDER BY y min_interactions sin ir a la tabla
+    ("idx_posts_profile_posted", "posts(profile_id, posted_at DESC, interactions_total)"),
+    # Filtros y orden del dashboard: evitan el sort (posted_at DESC / likes DESC, posted_at DESC)
+    ("idx_posts_dash", "posts(platform, profile_id, posted_at DESC, interactions_total)"),
+    ("idx_comments_dash", "comments(post_id, sentiment_label, likes DESC, posted_at DESC)"),
+    # Comentarios de un post sin filtro de sentimiento: ORDER BY likes DESC, posted_at DESC sin sort
+    ("idx_comments_post_likes", "comments(post_id, likes DESC, posted_at DESC)"),
+    ("idx_comments_sentiment", "comments(sentiment_label)"),
+    # Índice parcial (Postgres y SQLite): solo comentarios ya analizados, cubre post_id + etiqueta
+    ("idx_comments_sent_nonnull", "comments(post_id, sentiment_label) WHERE sentiment_label IS NOT NULL"),
+)
+# Cubiertos por un índice de _INDEX_DDL con el mismo prefijo: init_database los elimina
+_OBSOLETE_INDEXES = (
+    "idx_posts_platform_profile_posted",  # -> idx_posts_dash
+    "idx_posts_profile",  # -> idx_posts_profile_posted
+    "idx_comments_post",  # -> idx_comments_post_likes
+)
+
+
+# Resumen de sentimiento por post, mantenido por triggers sobre comments: get_sentiment_stats suma
+# unas pocas filas por post en vez de recorrer todos los comentarios. Por post (y no por perfil) para
+# que un post reasignado de perfil o borrado en cascada no deje el resumen desfasado.
+_SENTIMENT_SUMMARY_UPSERT = """
+    ON CONFLICT (post_id, sentiment_label) DO UPDATE SET
+        count = sentiment_summary.count + 1,
+        sum_score = sentiment_summary.sum_score + EXCLUDED.sum_score"""
+_SENTIMENT_SUMMARY_DECREMENT = """
+    UPDATE sentiment_summary SET
+        count = count - 1,
+        sum_score = sum_score - COALESCE(OLD.sentiment_score, 0)
+    WHERE post_id = OLD.post_id AND sentiment_label = OLD.sentiment_label"""
+_SENTIMENT_SUMMARY_SQLITE_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS comments_summary_ai AFTER INSERT ON comments
+    WHEN NEW.sentiment_label IS NOT NULL BEGIN
+        INSERT INTO sentiment_summary (post_id, sentiment_label, count, sum_score)
+        VALUES (NEW.post_id, NEW.sentiment_label, 1, COALESCE(NEW.sentiment_score, 0))
+        {_SENTIMENT_SUMMARY_UPSERT};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS comments_summary_ad AFTER DELETE ON comments
+    WHEN OLD.sentiment_label IS NOT NULL BEGIN
+        {_SENTIMENT_SUMMARY_DECREMENT};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS comments_summary_au
+    AFTER UPDATE OF post_id, sentiment_label, sentiment_score ON comments BEGIN
+        {_SENTIMENT_SUMMARY_DECREMENT} AND OLD.sentiment_label IS NOT NULL;
+        INSERT INTO sentiment_summary (post_id, sentiment_label, count, sum_score)
+        SELECT NEW.post_id, NEW.sentiment_label, 1, COALESCE(NEW.sentiment_score, 0)
+        WHERE NEW.sentiment_label IS NOT NULL
+        {_SENTIMENT_SUMMARY_UPSERT};
+    END""",
+)
+_SENTIMENT_SUMMARY_PG_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION sentiment_summary_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.sentiment_label IS NOT NULL THEN
+            {_SENTIMENT_SUMMARY_DECREMENT};
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.sentiment_label IS NOT NULL THEN
+            INSERT INTO sentiment_summary (post_id, sentiment_label, count, sum_score)
+            VALUES (NEW.post_id, NEW.sentiment_label, 1, COALESCE(NEW.sentiment_score, 0))
+            {_SENTIMENT_SUMMARY_UPSERT};
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+
+def _create_sentiment_summary(cursor) -> None:
+    """Tabla sentiment_summary + triggers; la primera vez se rellena desde comments."""
+    if USE_POSTGRES:
+        cursor.execute("SELECT to_regclass('sentiment_summary') IS NOT NULL")
+        existed = cursor.fetchone()[0]
+    else:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sentiment_summary'")
+        existed = cursor.fetchone() is not None
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS sentiment_summary (
+            post_id INTEGER NOT NULL,
+            sentiment_label {"VARCHAR(50)" if USE_POSTGRES else "TEXT"} NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            sum_score REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (post_id, sentiment_label),
+            FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+        )
+    """)
+    if not existed:
+        cursor.execute("""
+            INSERT INTO sentiment_summary (post_id, sentiment_label, count, sum_score)
+            SELECT post_id, sentiment_label, COUNT(*), COALESCE(SUM(sentiment_score), 0)
+            FROM comments
+            WHERE sentiment_label IS NOT NULL
+            GROUP BY post_id, sentiment_label
+        """)
+    if USE_POSTGRES:
+        cursor.execute(_SENTIMENT_SUMMARY_PG_FUNCTION)
+        cursor.execute("DROP TRIGGER IF EXISTS comments_sentiment_summary ON comments")
+        cursor.execute("""
+            CREATE TRIGGER comments_sentiment_summary
+            AFTER INSERT OR DELETE OR UPDATE OF post_id, sentiment_label, sentiment_score ON comments
+            FOR EACH ROW EXECUTE PROCEDURE sentiment_summary_sync()
+        """)
+    else:
+        for trigger in _SENTIMENT_SUMMARY_SQLITE_TRIGGERS:
+            cursor.execute(trigger)
+
+
 def init_database() -> None:
     """Initialize database with all required tables."""
     conn = get_connection()
@@ -232,15 +905,16 @@ def init_database() -> None:
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS config (
                     key VARCHAR(255) PRIMARY KEY,
-                    value TEXT NOT NULL
+                    value JSONB NOT NULL
                 )
             """)
         else:
+            # WITHOUT ROWID: la clave es la fila (un solo B-tree en vez de tabla + índice de la PK)
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS config (
                     key TEXT PRIMARY KEY,
                     value TEXT NOT NULL
-                )
+                ) WITHOUT ROWID
             """)
         
         # Profiles table: stores monitored profiles
@@ -283,7 +957,7 @@ def init_database() -> None:
                     comments_count INTEGER DEFAULT 0,
                     shares INTEGER DEFAULT 0,
                     views INTEGER DEFAULT 0,
-                    interactions_total INTEGER DEFAULT 0,
+                    interactions_total """ + _INTERACTIONS_TOTAL_COLUMN + """,
                     posted_at TIMESTAMP,
                     scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (profile_id) REFERENCES profiles(id) ON DELETE CASCADE,
@@ -303,10 +977,10 @@ def init_database() -> None:
                     comments_count INTEGER DEFAULT 0,
                     shares INTEGER DEFAULT 0,
                     views INTEGER DEFAULT 0,
-                    interactions_total INTEGER DEFAULT 0,
+                    interactions_total """ + (_INTERACTIONS_TOTAL_COLUMN if SQLITE_GENERATED_COLUMNS else "INTEGER DEFAULT 0") + """,
                     posted_at DATETIME,
                     scraped_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (profile_id) REFERENCES profiles(id),
+                    FOREIGN KEY (profile_id) REFERENCES profiles(id) ON DELETE CASCADE,
                     UNIQUE(platform, post_id)
                 )
             """)
@@ -344,122 +1018,272 @@ def init_database() -> None:
                     sentiment_method TEXT,
                     posted_at DATETIME,
                     scraped_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (post_id) REFERENCES posts(id),
+                    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
                     UNIQUE(post_id, comment_id)
                 )
             """)
         
-        # Create indexes for better performance
-        indexes = [
-            ("idx_posts_profile", "posts(profile_id)"),
-            ("idx_posts_platform", "posts(platform)"),
-            ("idx_comments_post", "comments(post_id)"),
-            ("idx_comments_sentiment", "comments(sentiment_label)"),
-        ]
+        # Antes de los índices: reconstruir tablas / borrar columnas elimina los suyos y se vuelven a crear abajo
+        if USE_SQLITE:
+            _migrate_sqlite_fk_cascade(conn)
+            _migrate_sqlite_generated_interactions(conn)
+            _migrate_sqlite_datetime_text(conn)
+        elif USE_POSTGRES:
+            _migrate_pg_generated_interactions(cursor)
         
-        for idx_name, idx_def in indexes:
+        # Tras las migraciones: reconstruir comments borra sus triggers y aquí se vuelven a crear
+        _create_sentiment_summary(cursor)
+        
+        # Create indexes for better performance
+        for idx_name, idx_def in _INDEX_DDL:
             try:
                 cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_def}")
             except Exception as e:
                 # Index might already exist, ignore
                 pass
         
+        # Índices sustituidos por otros que cubren el mismo prefijo; mantener ambos solo encarece los INSERT
+        for idx_name in _OBSOLETE_INDEXES:
+            try:
+                cursor.execute(f"DROP INDEX IF EXISTS {idx_name}")
+            except Exception:
+                pass
+        
         # Migración: columna apify_token_key en profiles (qué API key usar: facebook_1, facebook_2, instagram, tiktok)
-        # Para Turso/SQLite: comprobar primero si existe (evita KeyError en libsql_client cuando Turso devuelve error)
-        col_exists = False
+        _add_column_if_missing(cursor, "profiles", "apify_token_key", "VARCHAR(50)" if USE_POSTGRES else "TEXT")
+        # Migración: config.value_type ('json' / 'str' / 'bool'; NULL = fila antigua, se detecta al leer)
+        _add_column_if_missing(cursor, "config", "value_type", "VARCHAR(16)" if USE_POSTGRES else "TEXT")
         if USE_POSTGRES:
-            cursor.execute(
-                "SELECT column_name FROM information_schema.columns WHERE table_name='profiles' AND column_name='apify_token_key'"
-            )
-            col_exists = cursor.fetchone() is not None
-        else:
-            cursor.execute("PRAGMA table_info(profiles)")
-            rows = cursor.fetchall()
-            # rows: dict (Turso) o tuple (SQLite) - name es columna 1
-            for r in rows:
-                col_name = r["name"] if isinstance(r, dict) else r[1]
-                if col_name == "apify_token_key":
-                    col_exists = True
-                    break
-        if not col_exists:
-            try:
-                if USE_POSTGRES:
-                    cursor.execute("ALTER TABLE profiles ADD COLUMN apify_token_key VARCHAR(50)")
-                else:
-                    cursor.execute("ALTER TABLE profiles ADD COLUMN apify_token_key TEXT")
-            except Exception as e:
-                if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
-                    pass
-                else:
-                    raise
+            _migrate_pg_config_jsonb(cursor)
+        elif USE_SQLITE:
+            _migrate_sqlite_config_without_rowid(conn)
+        _migrate_config_bool_values(cursor)
+        if USE_SQLITE:
+            # Después de rehacer config (WITHOUT ROWID): los triggers van sobre la tabla definitiva
+            for statement in _CONFIG_VERSION_SQLITE_DDL:
+                cursor.execute(statement)
         
         conn.commit()
-    except Exception as e:
+        _posts_interactions_generated.cache_clear()
+    except _DB_ERRORS:
         conn.rollback()
         raise
     finally:
         conn.close()
 
 
+def _json_loads(val: Union[str, bytes]) -> Any:
+    """
+    json.loads con orjson cuando está instalado; JSONDecodeError si no es JSON.
+    Mismo resultado salvo enteros de más de 64 bits, que orjson devuelve como float.
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(val)
+        except orjson.JSONDecodeError:
+            # Infinity o surrogates sueltos: solo los acepta json
+            pass
+    return json.loads(val)
+
+
+def _json_dumps(value: Any) -> str:
+    """json.dumps con orjson cuando está instalado (JSON compacto, claves no str convertidas)."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(value)
+
+
+# Postgres: config.value es JSONB; psycopg2 lo decodifica con json.loads salvo que se le indique otra cosa
+if PSYCOPG2_AVAILABLE and ORJSON_AVAILABLE:
+    register_default_jsonb(globally=True, loads=_json_loads)
+
+
+def encode_config_value(value: Any) -> str:
+    """Serialize a config value the way it is stored in the config table."""
+    if isinstance(value, (dict, list, tuple)):
+        return _json_dumps(value)
+    return str(value)
+
+
+# Booleanos tal como los codifica encode_config_value (str(True) / str(False))
+_CONFIG_BOOL_TEXT = {"True": True, "False": False}
+
+
+def config_value_type(encoded: str) -> str:
+    """
+    Etiqueta value_type de un valor ya codificado: 'bool' para "True"/"False",
+    'json' si se parsea como JSON, 'str' si no.
+    """
+    if encoded in _CONFIG_BOOL_TEXT:
+        return "bool"
+    try:
+        _json_loads(encoded)
+        return "json"
+    except json.JSONDecodeError:
+        return "str"
+
+
+def decode_config_value(val: str, value_type: Optional[str] = None) -> Any:
+    """Parse a stored config value (JSON when possible, raw string otherwise)."""
+    # Con etiqueta no hace falta intentar el parseo (la decisión se tomó al escribir)
+    if value_type == "str" or val is None:
+        return val
+    if value_type == "bool":
+        return _CONFIG_BOOL_TEXT.get(val, False)
+    if value_type == "json":
+        return _json_loads(val)
+    if val in _CONFIG_BOOL_TEXT:
+        return _CONFIG_BOOL_TEXT[val]
+    try:
+        return _json_loads(val)
+    except json.JSONDecodeError:
+        return val
+
+
+_UNSET = object()
+
+
+def _config_db_value(value: str, value_type: Optional[str], decoded: Any = _UNSET) -> Any:
+    """Parámetro para config.value: Postgres guarda el valor decodificado en JSONB, SQLite/Turso el texto."""
+    if not USE_POSTGRES:
+        return value
+    return Json(decode_config_value(value, value_type) if decoded is _UNSET else decoded, dumps=_json_dumps)
+
+
 def get_config(key: str, default: Any = None) -> Any:
     """Get a configuration value from the database."""
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     
     try:
         if USE_POSTGRES:
-            cursor.execute("SELECT value FROM config WHERE key = %s", (key,))
+            _pg_execute_prepared(
+                conn, cursor, "get_config_value", "SELECT value, value_type FROM config WHERE key = $1", (key,)
+            )
         else:
-            cursor.execute("SELECT value FROM config WHERE key = ?", (key,))
+            cursor.execute("SELECT value, value_type FROM config WHERE key = ?", (key,))
         row = cursor.fetchone()
         
+        if row and USE_POSTGRES:
+            # JSONB: psycopg2 ya devuelve el valor decodificado
+            return row[0]
         if row:
             # Turso devuelve dict (row["value"]), Postgres/SQLite pueden devolver tuple (row[0])
-            val = row["value"] if isinstance(row, dict) else row[0]
-            try:
-                return json.loads(val)
-            except json.JSONDecodeError:
-                return val
+            if isinstance(row, dict):
+                return decode_config_value(row["value"], row["value_type"])
+            return decode_config_value(row[0], row[1])
         return default
     finally:
         conn.close()
 
 
-def set_config(key: str, value: Any) -> None:
-    """Set a configuration value in the database."""
+def get_all_config_rows() -> Dict[str, Any]:
+    """Get every configuration key/value in a single query (values already decoded)."""
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    
+    try:
+        if USE_POSTGRES:
+            # JSONB: psycopg2 ya devuelve los valores decodificados
+            cursor.execute("SELECT key, value FROM config")
+            return dict(cursor.fetchall())
+        cursor.execute("SELECT key, value, value_type FROM config")
+        result = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                result[row["key"]] = decode_config_value(row["value"], row["value_type"])
+            else:
+                result[row[0]] = decode_config_value(row[1], row[2])
+        return result
+    finally:
+        conn.close()
+
+
+def bulk_set_defaults(defaults: Dict[str, str]) -> int:
+    """
+    Insert the config keys that are missing, in one transaction. Returns how many were inserted.
+    Values must already be encoded with encode_config_value.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value)
-        else:
-            value = str(value)
+        cursor.execute("SELECT key FROM config")
+        existing = {row["key"] if isinstance(row, dict) else row[0] for row in cursor.fetchall()}
+        missing = []
+        for k, v in defaults.items():
+            if k not in existing:
+                value_type = config_value_type(v)
+                missing.append((k, _config_db_value(v, value_type), value_type))
+        if not missing:
+            return 0
         
         if USE_POSTGRES:
-            cursor.execute(
-                "INSERT INTO config (key, value) VALUES (%s, %s) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
-                (key, value)
+            cursor.executemany(
+                "INSERT INTO config (key, value, value_type) VALUES (%s, %s, %s) ON CONFLICT (key) DO NOTHING",
+                missing
             )
         else:
-            cursor.execute(
-                "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)",
-                (key, value)
+            cursor.executemany(
+                "INSERT OR IGNORE INTO config (key, value, value_type) VALUES (?, ?, ?)",
+                missing
             )
         
         conn.commit()
+        return len(missing)
     finally:
         conn.close()
 
 
-def get_all_profiles() -> List[Dict[str, Any]]:
-    """Get all profiles from the database."""
-    query = """
-        SELECT id, platform, username_or_url, display_name, last_analyzed, created_at, apify_token_key
-        FROM profiles
+def set_config(key: str, value: Any) -> None:
+    """Set a configuration value in the database."""
+    set_config_raw(key, encode_config_value(value))
+
+
+def set_config_raw(key: str, value: str, value_type: Optional[str] = None, decoded: Any = _UNSET) -> None:
+    """
+    Set a configuration value that is already encoded with encode_config_value.
+    decoded (el valor tal como lo devuelve get_config) evita volver a parsearlo para el JSONB de Postgres.
+    """
+    if value_type is None:
+        value_type = config_value_type(value)
+    db_value = _config_db_value(value, value_type, decoded)
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        if USE_POSTGRES:
+            cursor.execute(
+                "INSERT INTO config (key, value, value_type) VALUES (%s, %s, %s) "
+                "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, value_type = EXCLUDED.value_type",
+                (key, db_value, value_type)
+            )
+        else:
+            # UPSERT y no INSERT OR REPLACE: actualiza la fila en su sitio en vez de borrarla y reinsertarla
+            cursor.execute(
+                "INSERT INTO config (key, value, value_type) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, value_type = excluded.value_type",
+                (key, db_value, value_type)
+            )
+        
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_all_profiles() -> List[Dict[str, Any]]:
+    """Get all profiles from the database."""
+    query = """
+        SELECT id, platform, username_or_url, display_name, last_analyzed,
+               substr(CAST(last_analyzed AS TEXT), 1, 10) AS last_analyzed_short,
+               created_at, apify_token_key
+        FROM profiles
         ORDER BY platform, username_or_url
     """
-    rows = _execute_query(query)
+    rows = _execute_read(query)
     # Asegurar que apify_token_key existe (BD antiguas pueden no tener la columna en el SELECT)
     for r in rows:
         if "apify_token_key" not in r:
@@ -469,7 +1293,7 @@ def get_all_profiles() -> List[Dict[str, Any]]:
 
 def get_profile_by_id(profile_id: int) -> Optional[Dict[str, Any]]:
     """Get a single profile by ID."""
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     try:
         if USE_POSTGRES:
@@ -486,9 +1310,8 @@ def get_profile_by_id(profile_id: int) -> Optional[Dict[str, Any]]:
         row = cursor.fetchone()
         if not row:
             return None
-        if USE_POSTGRES:
-            d = dict(row)
-        elif isinstance(row, dict):
+        if isinstance(row, dict):
+            # RealDictRow (Postgres) y Turso ya son dicts
             d = row
         else:
             d = dict(zip([c[0] for c in cursor.description], row))
@@ -523,8 +1346,24 @@ def add_profile(platform: str, username_or_url: str, display_name: Optional[str]
                 """, (platform, username_or_url))
                 row = cursor.fetchone()
                 profile_id = row[0] if row else None
+        elif SQLITE_RETURNING:
+            cursor.execute("""
+                INSERT INTO profiles (platform, username_or_url, display_name)
+                VALUES (?, ?, ?)
+                ON CONFLICT (platform, username_or_url) DO NOTHING
+                RETURNING id
+            """, (platform, username_or_url, display_name or username_or_url))
+            row = cursor.fetchone()
+            if not row:
+                # Profile already exists, get its ID
+                cursor.execute("""
+                    SELECT id FROM profiles 
+                    WHERE platform = ? AND username_or_url = ?
+                """, (platform, username_or_url))
+                row = cursor.fetchone()
+            profile_id = (row["id"] if isinstance(row, dict) else row[0]) if row else None
         else:
-            # SQLite: Check if profile exists first, then INSERT or get existing ID
+            # SQLite antiguo: Check if profile exists first, then INSERT or get existing ID
             cursor.execute("""
                 SELECT id FROM profiles 
                 WHERE platform = ? AND username_or_url = ?
@@ -549,22 +1388,30 @@ def add_profile(platform: str, username_or_url: str, display_name: Optional[str]
 
 
 def delete_profile(profile_id: int) -> bool:
-    """Delete a profile and all associated posts and comments."""
+    """Delete a profile and all associated posts and comments (one transaction)."""
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        if USE_POSTGRES:
-            # PostgreSQL CASCADE will handle deletions
-            cursor.execute("DELETE FROM profiles WHERE id = %s", (profile_id,))
+        if USE_POSTGRES or USE_SQLITE:
+            # Resumen de sentimiento primero: los triggers de los comentarios borrados en cascada
+            # ya no encuentran fila que actualizar. Lo demás lo borra ON DELETE CASCADE
+            # (SQLite local: foreign_keys=ON, ver _migrate_sqlite_fk_cascade)
+            ph = "%s" if USE_POSTGRES else "?"
+            cursor.execute(
+                f"DELETE FROM sentiment_summary WHERE post_id IN (SELECT id FROM posts WHERE profile_id = {ph})",
+                (profile_id,)
+            )
+            cursor.execute(f"DELETE FROM profiles WHERE id = {ph}", (profile_id,))
         else:
-            # SQLite: delete manually
-            cursor.execute("""
-                DELETE FROM comments 
-                WHERE post_id IN (SELECT id FROM posts WHERE profile_id = ?)
-            """, (profile_id,))
-            cursor.execute("DELETE FROM posts WHERE profile_id = ?", (profile_id,))
-            cursor.execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
+            # Turso: cada petición HTTP es independiente (sin PRAGMA foreign_keys), borrar a mano,
+            # todas las sentencias en un solo batch (una petición, atómico)
+            cursor.execute_batch([
+                ("DELETE FROM sentiment_summary WHERE post_id IN (SELECT id FROM posts WHERE profile_id = ?)", (profile_id,)),
+                ("DELETE FROM comments WHERE post_id IN (SELECT id FROM posts WHERE profile_id = ?)", (profile_id,)),
+                ("DELETE FROM posts WHERE profile_id = ?", (profile_id,)),
+                ("DELETE FROM profiles WHERE id = ?", (profile_id,)),
+            ])
         
         conn.commit()
         return cursor.rowcount > 0
@@ -611,6 +1458,49 @@ def update_profile_last_analyzed(profile_id: int) -> None:
         conn.close()
 
 
+# Orden de columnas de las filas de insert_posts_bulk (interactions_total la calcula la BD)
+POST_INSERT_COLUMNS = (
+    "profile_id", "platform", "post_id", "url", "text", "likes", "comments_count",
+    "shares", "views", "posted_at"
+)
+_POST_KEY_COLUMNS = ("platform", "post_id")
+
+
+def _post_insert_columns(generated: bool) -> Tuple[str, ...]:
+    return POST_INSERT_COLUMNS if generated else POST_INSERT_COLUMNS + ("interactions_total",)
+
+
+def _legacy_post_values(row: Tuple) -> Tuple:
+    """Fila de POST_INSERT_COLUMNS + interactions_total, para esquemas sin columna generada."""
+    likes, comments_count, shares, views = row[5:9]
+    return tuple(row) + ((likes or 0) + (comments_count or 0) + (shares or 0) + (views or 0),)
+
+
+@lru_cache(maxsize=16)
+def _post_upsert_sql(generated: bool, placeholder: str, upsert: bool, bulk: bool = False) -> str:
+    """
+    INSERT de posts (con UPSERT ... RETURNING id si upsert). placeholder "$" = $1..$n (Postgres).
+    bulk: sin RETURNING (executemany); con placeholder "%s" queda "VALUES %s" para execute_values.
+    """
+    columns = _post_insert_columns(generated)
+    if bulk and placeholder == "%s":
+        values = "%s"
+    elif placeholder == "$":
+        values = "(" + ", ".join(f"${i}" for i in range(1, len(columns) + 1)) + ")"
+    else:
+        values = "(" + ", ".join(placeholder for _ in columns) + ")"
+    sql = f"INSERT INTO posts ({', '.join(columns)}) VALUES {values}"
+    if upsert:
+        sql += (
+            " ON CONFLICT (platform, post_id) DO UPDATE SET "
+            + ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in _POST_KEY_COLUMNS)
+            + ", scraped_at = CURRENT_TIMESTAMP"
+        )
+        if not bulk:
+            sql += " RETURNING id"
+    return sql
+
+
 def insert_post(
     profile_id: int,
     platform: str,
@@ -628,38 +1518,29 @@ def insert_post(
     No se borran nunca posts anteriores: solo se insertan nuevos o se actualizan existentes
     por (platform, post_id). Los posts ya guardados del perfil se mantienen.
     """
+    generated = _posts_interactions_generated()
+    values = (profile_id, platform, post_id, url, text, likes, comments_count, shares, views, posted_at)
+    if not generated:
+        # Esquema antiguo (Turso / SQLite < 3.31 sin migrar): el total se guarda desde Python
+        values = _legacy_post_values(values)
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        interactions_total = likes + comments_count + shares + (views if views else 0)
-        
         if USE_POSTGRES:
-            cursor.execute("""
-                INSERT INTO posts 
-                (profile_id, platform, post_id, url, text, likes, comments_count, 
-                 shares, views, interactions_total, posted_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (platform, post_id) DO UPDATE SET
-                    profile_id = EXCLUDED.profile_id,
-                    url = EXCLUDED.url,
-                    text = EXCLUDED.text,
-                    likes = EXCLUDED.likes,
-                    comments_count = EXCLUDED.comments_count,
-                    shares = EXCLUDED.shares,
-                    views = EXCLUDED.views,
-                    interactions_total = EXCLUDED.interactions_total,
-                    posted_at = EXCLUDED.posted_at,
-                    scraped_at = CURRENT_TIMESTAMP
-                RETURNING id
-            """, (
-                profile_id, platform, post_id, url, text, likes, comments_count,
-                shares, views, interactions_total, posted_at
-            ))
+            _pg_execute_prepared(
+                conn, cursor, "upsert_post" if generated else "upsert_post_legacy",
+                _post_upsert_sql(generated, "$", True), values
+            )
             result = cursor.fetchone()
             post_db_id = result[0] if result else None
+        elif SQLITE_RETURNING:
+            # Una sola sentencia: UPSERT y id devuelto por RETURNING (Turso devuelve dict, SQLite tuple)
+            cursor.execute(_post_upsert_sql(generated, "?", True), values)
+            result = cursor.fetchone()
+            post_db_id = (result["id"] if isinstance(result, dict) else result[0]) if result else None
         else:
-            # SQLite: Check if post exists first, then INSERT or UPDATE accordingly
+            # SQLite antiguo (< 3.35): Check if post exists first, then INSERT or UPDATE accordingly
             cursor.execute("SELECT id FROM posts WHERE platform = ? AND post_id = ?", (platform, post_id))
             existing = cursor.fetchone()
             
@@ -667,36 +1548,17 @@ def insert_post(
                 # Post exists, update it (prevent duplicate) (Turso devuelve dict, SQLite tuple)
                 post_db_id = existing["id"] if isinstance(existing, dict) else existing[0]
                 logger.debug(f"Post already exists (platform={platform}, post_id={post_id[:50]}), updating instead of duplicating")
-                cursor.execute("""
-                    UPDATE posts SET
-                        profile_id = ?,
-                        url = ?,
-                        text = ?,
-                        likes = ?,
-                        comments_count = ?,
-                        shares = ?,
-                        views = ?,
-                        interactions_total = ?,
-                        posted_at = ?,
-                        scraped_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (
-                    profile_id, url, text, likes, comments_count,
-                    shares, views, interactions_total, posted_at,
-                    post_db_id
-                ))
+                columns = _post_insert_columns(generated)
+                cursor.execute(
+                    "UPDATE posts SET "
+                    + ", ".join(f"{c} = ?" for c in columns if c not in _POST_KEY_COLUMNS)
+                    + ", scraped_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    tuple(v for c, v in zip(columns, values) if c not in _POST_KEY_COLUMNS) + (post_db_id,)
+                )
             else:
                 # Post doesn't exist, insert it
                 logger.debug(f"Inserting new post (platform={platform}, post_id={post_id[:50]})")
-                cursor.execute("""
-                    INSERT INTO posts 
-                    (profile_id, platform, post_id, url, text, likes, comments_count, 
-                     shares, views, interactions_total, posted_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    profile_id, platform, post_id, url, text, likes, comments_count,
-                    shares, views, interactions_total, posted_at
-                ))
+                cursor.execute(_post_upsert_sql(generated, "?", False), values)
                 post_db_id = cursor.lastrowid
         
         conn.commit()
@@ -705,20 +1567,75 @@ def insert_post(
         conn.close()
 
 
+POST_BULK_ID_CHUNK = 500
+
+
+def insert_posts_bulk(rows: List[Tuple]) -> List[Optional[int]]:
+    """
+    Insert or update many posts in one transaction (same semantics as insert_post).
+    Each row is a tuple in POST_INSERT_COLUMNS order. Returns the post database IDs in row order.
+    """
+    if not rows:
+        return []
+    # Misma (platform, post_id) dos veces en el lote: gana la última, como con insert_post en bucle
+    unique = list({(row[1], row[2]): row for row in rows}.values())
+    generated = _posts_interactions_generated()
+    values = unique if generated else [_legacy_post_values(row) for row in unique]
+    placeholder = "%s" if USE_POSTGRES else "?"
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        if USE_POSTGRES:
+            execute_values(
+                cursor, _post_upsert_sql(generated, placeholder, True, bulk=True), values,
+                page_size=COMMENT_BULK_PAGE_SIZE
+            )
+        else:
+            cursor.executemany(_post_upsert_sql(generated, placeholder, True, bulk=True), values)
+        
+        # executemany no devuelve RETURNING: un SELECT por plataforma y bloque de post_id
+        ids: Dict[Tuple[str, str], int] = {}
+        by_platform: Dict[str, List[str]] = {}
+        for row in unique:
+            by_platform.setdefault(row[1], []).append(row[2])
+        for platform, post_ids in by_platform.items():
+            for start in range(0, len(post_ids), POST_BULK_ID_CHUNK):
+                chunk = post_ids[start:start + POST_BULK_ID_CHUNK]
+                cursor.execute(
+                    f"SELECT post_id, id FROM posts WHERE platform = {placeholder} "
+                    f"AND post_id IN ({', '.join(placeholder for _ in chunk)})",
+                    [platform, *chunk]
+                )
+                for r in cursor.fetchall():
+                    post_id, post_db_id = (r["post_id"], r["id"]) if isinstance(r, dict) else (r[0], r[1])
+                    ids[(platform, post_id)] = post_db_id
+        conn.commit()
+        return [ids.get((row[1], row[2])) for row in rows]
+    except _DB_ERRORS:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 def get_post_profile_and_platform(post_id: int) -> Optional[Tuple[int, str]]:
     """Returns (profile_id, platform) for a post by its internal id, or None."""
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     try:
         if USE_POSTGRES:
-            cursor.execute("SELECT profile_id, platform FROM posts WHERE id = %s", (post_id,))
+            _pg_execute_prepared(
+                conn, cursor, "get_post_profile_platform",
+                "SELECT profile_id, platform FROM posts WHERE id = $1", (post_id,)
+            )
         else:
             cursor.execute("SELECT profile_id, platform FROM posts WHERE id = ?", (post_id,))
         row = cursor.fetchone()
         if not row:
             return None
         if isinstance(row, dict) or hasattr(row, "keys"):
-            return (row["profile_id"], (row.get("platform") or "").lower())
+            return (row["profile_id"], (row["platform"] or "").lower())
         return (row[0], (row[1] or "").lower())
     finally:
         conn.close()
@@ -744,7 +1661,7 @@ def comment_exists_same_text_author_for_profile(
     author_clean = (author or "").strip()
     if not norm_text and not author_clean:
         return False
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     try:
         ph = "%s" if USE_POSTGRES else "?"
@@ -788,11 +1705,11 @@ def insert_comment(
     
     try:
         if USE_POSTGRES:
-            cursor.execute("""
+            _pg_execute_prepared(conn, cursor, "upsert_comment", """
                 INSERT INTO comments 
                 (post_id, comment_id, text, author, likes, sentiment_label, 
                  sentiment_score, sentiment_method, posted_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
                 ON CONFLICT (post_id, comment_id) DO UPDATE SET
                     text = EXCLUDED.text,
                     author = EXCLUDED.author,
@@ -807,56 +1724,452 @@ def insert_comment(
                 sentiment_score, sentiment_method, posted_at
             ))
         else:
-            # SQLite: Check if comment exists first, then INSERT or UPDATE accordingly
-            cursor.execute("SELECT id FROM comments WHERE post_id = ? AND comment_id = ?", (post_id, comment_id))
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Comment exists, update it (prevent duplicate)
-                logger.debug(f"Comment already exists (post_id={post_id}, comment_id={comment_id[:50]}), updating instead of duplicating")
-                cursor.execute("""
-                    UPDATE comments SET
-                        text = ?,
-                        author = ?,
-                        likes = ?,
-                        sentiment_label = ?,
-                        sentiment_score = ?,
-                        sentiment_method = ?,
-                        posted_at = ?,
-                        scraped_at = CURRENT_TIMESTAMP
-                    WHERE post_id = ? AND comment_id = ?
-                """, (
-                    text, author, likes, sentiment_label,
-                    sentiment_score, sentiment_method, posted_at,
-                    post_id, comment_id
-                ))
-            else:
-                # Comment doesn't exist, insert it
-                logger.debug(f"Inserting new comment (post_id={post_id}, comment_id={comment_id[:50]})")
-                cursor.execute("""
-                    INSERT INTO comments 
-                    (post_id, comment_id, text, author, likes, sentiment_label, 
-                     sentiment_score, sentiment_method, posted_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    post_id, comment_id, text, author, likes, sentiment_label,
-                    sentiment_score, sentiment_method, posted_at
-                ))
+            # SQLite/Turso: un solo UPSERT (antes SELECT previo + UPDATE o INSERT)
+            _write_comment_rows(cursor, [(
+                post_id, comment_id, text, author, likes, sentiment_label,
+                sentiment_score, sentiment_method, posted_at
+            )])
         
         conn.commit()
     finally:
         conn.close()
 
 
-def get_posts_for_dashboard(
+# Orden de columnas de las filas de insert_comments_bulk
+COMMENT_INSERT_COLUMNS = (
+    "post_id", "comment_id", "text", "author", "likes", "sentiment_label",
+    "sentiment_score", "sentiment_method", "posted_at"
+)
+COMMENT_BULK_PAGE_SIZE = 500
+
+
+_COMMENT_UPSERT_SET = """
+                text = EXCLUDED.text,
+                author = EXCLUDED.author,
+                likes = EXCLUDED.likes,
+                sentiment_label = EXCLUDED.sentiment_label,
+                sentiment_score = EXCLUDED.sentiment_score,
+                sentiment_method = EXCLUDED.sentiment_method,
+                posted_at = EXCLUDED.posted_at,
+                scraped_at = CURRENT_TIMESTAMP"""
+
+
+# SQLite/Turso: todo el lote como un único array JSON expandido con json_each (una sentencia).
+# WHERE true: necesario para que el parser no confunda ON CONFLICT con un JOIN ... ON del SELECT.
+_COMMENT_JSON_UPSERT_SQL = (
+    f"INSERT INTO comments ({', '.join(COMMENT_INSERT_COLUMNS)}) SELECT "
+    + ", ".join(f"json_extract(value, '$[{i}]')" for i in range(len(COMMENT_INSERT_COLUMNS)))
+    + f" FROM json_each(?) WHERE true ON CONFLICT (post_id, comment_id) DO UPDATE SET {_COMMENT_UPSERT_SET}"
+)
+
+
+def _json_default_sqlite(value: Any) -> str:
+    return _adapt_sqlite_datetime(value) if isinstance(value, datetime) else str(value)
+
+
+def _comment_rows_json(rows: List[Tuple]) -> str:
+    # datetime -> _adapt_sqlite_datetime (UTC 'YYYY-MM-DD HH:MM:SS', el mismo texto que el adaptador
+    # de sqlite3); str() conservaría zona horaria y microsegundos y rompería las comparaciones de ancho fijo
+    return json.dumps(rows, default=_json_default_sqlite, ensure_ascii=False)
+
+
+def _write_comment_rows(cursor, rows: List[Tuple]) -> int:
+    """UPSERT de filas de comentarios (orden COMMENT_INSERT_COLUMNS) en el cursor dado, sin commit."""
+    # Una misma (post_id, comment_id) dos veces en el lote: gana la última, como en el bucle fila a fila
+    # (y Postgres no permite que ON CONFLICT DO UPDATE toque la misma fila dos veces en una sentencia)
+    rows = list({(row[0], row[1]): row for row in rows}.values())
+    columns = ", ".join(COMMENT_INSERT_COLUMNS)
+    if USE_POSTGRES:
+        execute_values(
+            cursor,
+            f"INSERT INTO comments ({columns}) VALUES %s "
+            f"ON CONFLICT (post_id, comment_id) DO UPDATE SET {_COMMENT_UPSERT_SET}",
+            rows,
+            page_size=COMMENT_BULK_PAGE_SIZE
+        )
+    elif USE_TURSO and len(rows) > 1:
+        # Turso: batch() manda una sentencia por fila; con json_each es una sola sentencia
+        cursor.execute(_COMMENT_JSON_UPSERT_SQL, (_comment_rows_json(rows),))
+    else:
+        # UPSERT de SQLite (>= 3.24, también en Turso): conserva el id de los comentarios existentes
+        placeholders = ", ".join("?" for _ in COMMENT_INSERT_COLUMNS)
+        cursor.executemany(
+            f"INSERT INTO comments ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT (post_id, comment_id) DO UPDATE SET {_COMMENT_UPSERT_SET}",
+            rows
+        )
+    return len(rows)
+
+
+def insert_comments_bulk(rows: List[Tuple]) -> int:
+    """
+    Insert or update many comments in one transaction (same semantics as insert_comment).
+    Each row is a tuple in COMMENT_INSERT_COLUMNS order. Returns the number of rows written.
+    """
+    if not rows:
+        return 0
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        written = _write_comment_rows(cursor, rows)
+        conn.commit()
+        return written
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def insert_comments_json(rows_json: str) -> int:
+    """
+    Insert or update comments from a JSON array of rows (each an array in COMMENT_INSERT_COLUMNS order)
+    with a single INSERT ... SELECT FROM json_each (SQLite/Turso). Returns the number of rows.
+    En Postgres se decodifica y se delega en insert_comments_bulk.
+    """
+    if USE_POSTGRES:
+        return insert_comments_bulk([tuple(row) for row in json.loads(rows_json)])
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(_COMMENT_JSON_UPSERT_SQL, (rows_json,))
+        written = cursor.rowcount
+        conn.commit()
+        return written
+    except _DB_ERRORS:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@contextmanager
+def bulk_load_context(table: str) -> Iterator[Any]:
+    """
+    Carga masiva (decenas de miles de filas, p.ej. una importación inicial) en una sola transacción:
+    borra los índices secundarios de table, entrega la conexión y, tras el COMMIT, los vuelve a crear
+    de una vez en vez de actualizarlos fila a fila. Los UNIQUE (necesarios para ON CONFLICT) se mantienen.
+
+        with bulk_load_context("comments") as conn:
+            _write_comment_rows(conn.cursor(), rows)
+
+    Mientras dura, las consultas del dashboard sobre table no tienen esos índices: no usar para lotes pequeños.
+    """
+    indexes = [(name, ddl) for name, ddl in _INDEX_DDL if ddl.startswith(f"{table}(")]
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        if USE_SQLITE:
+            # FKs comprobadas al COMMIT y no en cada fila (se desactiva sola en cada COMMIT: va tras los DROP)
+            cursor.execute("PRAGMA defer_foreign_keys=ON")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            # Tras el commit o el rollback: los índices vuelven siempre
+            for name, ddl in indexes:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {ddl}")
+            conn.commit()
+    finally:
+        conn.close()
+
+
+COMMENT_BATCH_FLUSH_SIZE = 1000
+
+
+class CommentBatchWriter:
+    """
+    Escritor de comentarios de un post con una sola conexión y una sola transacción:
+
+        with CommentBatchWriter(post_id) as writer:
+            writer.add(comment_id, text, author, likes, label, score, method, posted_at)
+
+    Sin post_id, add_row() recibe filas completas (orden de COMMENT_INSERT_COLUMNS) y un mismo
+    escritor sirve para comentarios de varios posts en una sola transacción.
+    Las filas se acumulan y se escriben (executemany / execute_values) cada flush_size filas
+    para acotar la memoria; el COMMIT se hace una vez al salir. Si hay una excepción, rollback.
+    """
+    def __init__(self, post_id: Optional[int] = None, flush_size: int = COMMENT_BATCH_FLUSH_SIZE):
+        self.post_id = post_id
+        self.flush_size = flush_size
+        self.written = 0
+        self._rows: List[Tuple] = []
+        self._conn = None
+        self._cursor = None
+
+    def __enter__(self) -> "CommentBatchWriter":
+        self._conn = get_connection()
+        self._cursor = self._conn.cursor()
+        return self
+
+    def add(
+        self,
+        comment_id: str,
+        text: Optional[str] = None,
+        author: Optional[str] = None,
+        likes: int = 0,
+        sentiment_label: Optional[str] = None,
+        sentiment_score: Optional[float] = None,
+        sentiment_method: Optional[str] = None,
+        posted_at: Optional[datetime] = None
+    ) -> None:
+        self.add_row((
+            self.post_id, comment_id, text, author, likes,
+            sentiment_label, sentiment_score, sentiment_method, posted_at
+        ))
+
+    def add_row(self, row: Tuple) -> None:
+        """Añade una fila completa (post_id incluido) en el orden de COMMENT_INSERT_COLUMNS."""
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Escribe las filas pendientes dentro de la transacción abierta (sin commit)."""
+        if self._rows:
+            self.written += _write_comment_rows(self._cursor, self._rows)
+            self._rows = []
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        except Exception:
+            self._conn.rollback()
+            raise
+        finally:
+            self._rows = []
+            self._conn.close()
+
+
+# Predicados del WHERE del dashboard, en orden fijo. Las 2**K variantes del WHERE se precalculan
+# por placeholder y se indexan con una máscara de bits de los filtros activos: misma forma de
+# filtros -> mismo texto SQL (sin concatenar en cada llamada; cachés de sentencias por texto aciertan).
+_POSTS_DASHBOARD_PREDICATES = (
+    "p.platform = {ph}",
+    "p.profile_id = {ph}",
+    "p.interactions_total >= {ph}",
+    "(p.posted_at >= {ph} OR p.posted_at IS NULL)",
+    "(p.posted_at <= {ph} OR p.posted_at IS NULL)",
+)
+_COMMENTS_DASHBOARD_PREDICATES = (
+    "c.post_id = {ph}",
+    "c.sentiment_label = {ph}",
+    "c.likes >= {ph}",
+    "p.platform = {ph}",
+    "p.profile_id = {ph}",
+)
+
+
+def _where_variants(predicates: Tuple[str, ...]) -> Dict[str, Dict[int, str]]:
+    """{placeholder: {máscara: " WHERE 1=1 AND ..."}} para todas las combinaciones de predicates."""
+    variants = {}
+    for ph in ("?", "%s"):
+        clauses = [pred.format(ph=ph) for pred in predicates]
+        variants[ph] = {
+            mask: " WHERE 1=1" + "".join(
+                f" AND {clause}" for bit, clause in enumerate(clauses) if mask & (1 << bit)
+            )
+            for mask in range(1 << len(clauses))
+        }
+    return variants
+
+
+_POSTS_DASHBOARD_WHERE = _where_variants(_POSTS_DASHBOARD_PREDICATES)
+_COMMENTS_DASHBOARD_WHERE = _where_variants(_COMMENTS_DASHBOARD_PREDICATES)
+
+
+def _filter_mask(values: Tuple) -> Tuple[int, List[Any]]:
+    """Máscara de bits de los valores no vacíos de values y sus parámetros (en el orden de los predicados)."""
+    mask = 0
+    params = []
+    for bit, value in enumerate(values):
+        if value:
+            mask |= 1 << bit
+            params.append(value)
+    return mask, params
+
+
+def _statement_variants(
+    where_variants: Dict[str, Dict[int, str]], prefix: str, suffix: str = ""
+) -> Dict[str, Dict[int, str]]:
+    """{placeholder: {máscara: prefix + WHERE + suffix}}: sentencias completas fijadas al importar."""
+    return {
+        ph: {mask: prefix + where + suffix for mask, where in variants.items()}
+        for ph, variants in where_variants.items()
+    }
+
+
+# Sentencias completas de posts del dashboard por (máscara, paginada): 2 * 32 por placeholder
+_POSTS_DASHBOARD_SELECT = """
+        SELECT p.*, pr.username_or_url, pr.display_name
+        FROM posts p
+        JOIN profiles pr ON p.profile_id = pr.id
+    """
+_POSTS_DASHBOARD_SQL = {
+    ph: {
+        (mask, paged): _POSTS_DASHBOARD_SELECT + where + " ORDER BY p.posted_at DESC"
+        + (f" LIMIT {ph} OFFSET {ph}" if paged else "")
+        for mask, where in variants.items()
+        for paged in (False, True)
+    }
+    for ph, variants in _POSTS_DASHBOARD_WHERE.items()
+}
+_POSTS_COUNT_SQL = _statement_variants(_POSTS_DASHBOARD_WHERE, """
+        SELECT COUNT(*) AS total
+        FROM posts p
+        JOIN profiles pr ON p.profile_id = pr.id
+    """)
+_POSTS_OVERVIEW_SQL = _statement_variants(_POSTS_DASHBOARD_WHERE, """
+        SELECT p.platform, COUNT(*) AS posts, COALESCE(SUM(p.interactions_total), 0) AS interactions
+        FROM posts p
+        JOIN profiles pr ON p.profile_id = pr.id
+    """, " GROUP BY p.platform")
+
+
+def _posts_dashboard_filters(
     platform: Optional[str] = None,
     profile_id: Optional[int] = None,
     min_interactions: int = 0,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None
-) -> List[Dict[str, Any]]:
-    """Get posts with filters for dashboard display."""
-    conn = get_connection()
+) -> Tuple[int, List[Any]]:
+    """(máscara, parámetros) de los filtros de posts del dashboard; la máscara indexa las sentencias precalculadas."""
+    return _filter_mask((platform, profile_id, min_interactions, date_from, date_to))
+
+
+def _rows_to_dicts(cursor) -> List[Dict[str, Any]]:
+    """
+    fetchall como lista de dicts sin copias intermedias.
+    RealDictCursor (RealDictRow es un dict) y Turso ya devuelven dicts: se devuelven tal cual.
+    SQLite: una sola tupla de nombres de columna compartida por todas las filas.
+    """
+    rows = cursor.fetchall()
+    if not rows or isinstance(rows[0], dict):
+        return rows
+    columns = tuple(d[0] for d in cursor.description)
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _fetch_columnar(cursor) -> Tuple[List[str], List[tuple]]:
+    """fetchall como (nombres de columna, tuplas) para cualquier backend."""
+    rows = cursor.fetchall()
+    if rows and isinstance(rows[0], dict):
+        # Turso y RealDictCursor devuelven dicts (orden de columnas preservado)
+        return list(rows[0].keys()), [tuple(row.values()) for row in rows]
+    columns = [d[0] for d in cursor.description] if getattr(cursor, "description", None) else []
+    return columns, [tuple(row) for row in rows]
+
+
+def _posts_dashboard_query(
+    placeholder: str,
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    min_interactions: int = 0,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> Tuple[str, List[Any]]:
+    """SELECT de posts del dashboard (listado y streaming)."""
+    mask, params = _posts_dashboard_filters(platform, profile_id, min_interactions, date_from, date_to)
+    query = _POSTS_DASHBOARD_SQL[placeholder][mask, limit is not None]
+    if limit is not None:
+        params.extend([limit, offset])
+    return query, params
+
+
+_stream_cursor_ids = itertools.count()
+
+
+def _iter_dict_rows(query: str, params: List[Any], chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre el resultado en bloques de chunk_size sin materializarlo entero.
+    Postgres: cursor con nombre (server-side, itersize). SQLite: fetchmany. Turso ya devuelve todo por HTTP.
+    Usa una conexión de lectura (réplica / lectores SQLite): una exportación larga no retiene una
+    conexión de escritura. La conexión se libera al agotar o cerrar el generador.
+    """
+    conn = get_read_connection(replica=True)
+    try:
+        if USE_POSTGRES:
+            # Un cursor con nombre necesita transacción: sin autocommit (solo lectura por la sesión);
+            # close() hace rollback al devolverla al pool
+            raw = conn._conn if isinstance(conn, _PooledConnection) else conn
+            raw.autocommit = False
+            cursor = conn.cursor(name=f"stream_{next(_stream_cursor_ids)}")
+            cursor.itersize = chunk_size
+            cursor.execute(query, params)
+            columns = None
+            for row in cursor:
+                if columns is None:
+                    columns = [d[0] for d in cursor.description]
+                yield dict(zip(columns, row))
+            cursor.close()
+            return
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        if USE_TURSO:
+            yield from cursor.fetchall()
+            return
+        columns = [d[0] for d in cursor.description]
+        cursor.arraysize = chunk_size
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+    finally:
+        conn.close()
+
+
+def iter_posts_for_dashboard(
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    min_interactions: int = 0,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    chunk_size: int = 1000
+) -> Iterator[Dict[str, Any]]:
+    """Como get_posts_for_dashboard pero en streaming (memoria constante; para exportaciones)."""
+    query, params = _posts_dashboard_query(
+        "%s" if USE_POSTGRES else "?", platform, profile_id, min_interactions, date_from, date_to
+    )
+    return _iter_dict_rows(query, params, chunk_size)
+
+
+def get_posts_for_dashboard(
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    min_interactions: int = 0,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    conn=None,
+    as_columns: bool = False,
+    as_rows: bool = False
+) -> Union[List[Dict[str, Any]], List[Any], Tuple[List[str], List[tuple]]]:
+    """
+    Get posts with filters for dashboard display. limit/offset paginan en SQL.
+    Si se pasa conn, se usa esa conexión y no se cierra (ver get_dashboard_bundle).
+    as_columns=True devuelve (columnas, filas como tuplas) para construir un DataFrame sin dicts.
+    as_rows=True devuelve las filas del driver sin copiarlas a dicts (sqlite3.Row en SQLite: acceso
+    por nombre pero sin .get ni escritura); para quien solo las serializa (API JSON).
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection(replica=True)
     cursor = conn.cursor()
     
     try:
@@ -866,44 +2179,69 @@ def get_posts_for_dashboard(
         else:
             placeholder = "?"
         
-        query = """
-            SELECT p.*, pr.username_or_url, pr.display_name
-            FROM posts p
-            JOIN profiles pr ON p.profile_id = pr.id
-            WHERE 1=1
-        """
-        params = []
-        
-        if platform:
-            query += f" AND p.platform = {placeholder}"
-            params.append(platform)
-        
-        if profile_id:
-            query += f" AND p.profile_id = {placeholder}"
-            params.append(profile_id)
-        
-        if min_interactions:
-            query += f" AND p.interactions_total >= {placeholder}"
-            params.append(min_interactions)
-        
-        if date_from:
-            query += f" AND (p.posted_at >= {placeholder} OR p.posted_at IS NULL)"
-            params.append(date_from)
-        
-        if date_to:
-            query += f" AND (p.posted_at <= {placeholder} OR p.posted_at IS NULL)"
-            params.append(date_to)
-        
-        query += " ORDER BY p.posted_at DESC"
-        
+        query, params = _posts_dashboard_query(
+            placeholder, platform, profile_id, min_interactions, date_from, date_to, limit, offset
+        )
         cursor.execute(query, params)
         
-        if USE_POSTGRES:
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
-        else:
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+        if as_columns:
+            return _fetch_columnar(cursor)
+        if as_rows:
+            return cursor.fetchall()
+        return _rows_to_dicts(cursor)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def count_posts_for_dashboard(
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    min_interactions: int = 0,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> int:
+    """Count posts matching the dashboard filters (total para la paginación)."""
+    placeholder = "%s" if USE_POSTGRES else "?"
+    mask, params = _posts_dashboard_filters(platform, profile_id, min_interactions, date_from, date_to)
+    return _fetch_count(_POSTS_COUNT_SQL[placeholder][mask], params)
+
+
+def get_overview_aggregates(
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Posts e interacciones por plataforma (COUNT/SUM en SQL) con los filtros del dashboard."""
+    conn = get_read_connection(replica=True)
+    cursor = conn.cursor()
+    
+    try:
+        placeholder = "%s" if USE_POSTGRES else "?"
+        mask, params = _posts_dashboard_filters(platform, profile_id, 0, date_from, date_to)
+        cursor.execute(_POSTS_OVERVIEW_SQL[placeholder][mask], params)
+        result = []
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                result.append({"platform": row["platform"], "posts": row["posts"], "interactions": row["interactions"]})
+            else:
+                result.append({"platform": row[0], "posts": row[1], "interactions": row[2]})
+        return result
+    finally:
+        conn.close()
+
+
+def _fetch_count(query: str, params: List[Any]) -> int:
+    """Ejecuta un SELECT COUNT(*) AS total y devuelve el escalar."""
+    conn = get_read_connection(replica=True)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        if not row:
+            return 0
+        return int(row["total"] if isinstance(row, dict) else row[0])
     finally:
         conn.close()
 
@@ -912,7 +2250,7 @@ def get_post_by_url(url: str, profile_id: Optional[int] = None) -> Optional[Dict
     """Busca un post por su URL (para asociar comentarios importados de Apify)."""
     if not url or not url.strip():
         return None
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     try:
         if USE_POSTGRES:
@@ -933,8 +2271,6 @@ def get_post_by_url(url: str, profile_id: Optional[int] = None) -> Optional[Dict
         row = cursor.fetchone()
         if not row:
             return None
-        if USE_POSTGRES:
-            return dict(row)
         if isinstance(row, dict):
             return row
         return dict(zip([c[0] for c in cursor.description], row))
@@ -942,16 +2278,157 @@ def get_post_by_url(url: str, profile_id: Optional[int] = None) -> Optional[Dict
         conn.close()
 
 
-def get_comments_for_dashboard(
+def get_commented_post_ids(profile_id: int) -> Set[int]:
+    """
+    IDs internos (posts.id) de los posts del perfil que ya tienen comentarios guardados.
+    Al re-analizar un perfil, el scraper no vuelve a lanzar el actor de comentarios para estos
+    (el UPSERT de posts conserva el id, así que sirven para los ids que devuelve insert_posts_bulk).
+    """
+    rows = _execute_read(
+        """SELECT p.id FROM posts p
+           WHERE p.profile_id = ?
+             AND EXISTS (SELECT 1 FROM comments c WHERE c.post_id = p.id)""",
+        (profile_id,)
+    )
+    return {row["id"] for row in rows}
+
+
+_SENTIMENT_FILTER_MAP = {
+    'positive': 'POSITIVE',
+    'negative': 'NEGATIVE',
+    'neutral': 'NEUTRAL'
+}
+
+
+def _comments_dashboard_filters(
     post_id: Optional[int] = None,
     sentiment_label: Optional[str] = None,
     min_likes: int = 0,
     platform: Optional[str] = None,
     profile_id: Optional[int] = None,
     sentiment: Optional[str] = None
-) -> List[Dict[str, Any]]:
-    """Get comments with filters for dashboard display."""
-    conn = get_connection()
+) -> Tuple[int, List[Any]]:
+    """(máscara, parámetros) de los filtros de comentarios del dashboard (listar y contar)."""
+    # Support both sentiment_label (old) and sentiment (new) parameters
+    if not sentiment_label and sentiment:
+        # Map frontend sentiment to database format
+        sentiment_label = _SENTIMENT_FILTER_MAP.get(sentiment.lower())
+    return _filter_mask((post_id, sentiment_label, min_likes, platform, profile_id))
+
+
+_COMMENTS_COUNT_SQL = _statement_variants(_COMMENTS_DASHBOARD_WHERE, """
+        SELECT COUNT(*) AS total
+        FROM comments c
+        JOIN posts p ON c.post_id = p.id
+    """)
+
+
+# Campos seleccionables en get_comments_for_dashboard(columns=...) -> expresión SQL
+_COMMENT_DASHBOARD_COLUMNS = {
+    "id": "c.id",
+    "post_id": "c.post_id",
+    "comment_id": "c.comment_id",
+    "text": "c.text",
+    "author": "c.author",
+    "likes": "c.likes",
+    "sentiment_label": "c.sentiment_label",
+    "sentiment_score": "c.sentiment_score",
+    "sentiment_method": "c.sentiment_method",
+    "posted_at": "c.posted_at",
+    "scraped_at": "c.scraped_at",
+    "platform": "p.platform",
+    "post_external_id": "p.post_id",
+    "profile_id": "p.profile_id",
+}
+
+
+def _comments_dashboard_query(
+    placeholder: str,
+    post_id: Optional[int] = None,
+    sentiment_label: Optional[str] = None,
+    min_likes: int = 0,
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    sentiment: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> Tuple[str, List[Any]]:
+    """SELECT de comentarios del dashboard (listado y streaming)."""
+    mask, params = _comments_dashboard_filters(
+        post_id, sentiment_label, min_likes, platform, profile_id, sentiment
+    )
+    query = _comments_dashboard_sql(
+        placeholder, mask, tuple(columns) if columns else None, limit is not None
+    )
+    if limit is not None:
+        params.extend([limit, offset])
+    return query, params
+
+
+@lru_cache(maxsize=256)
+def _comments_dashboard_sql(placeholder: str, mask: int, columns: Optional[Tuple[str, ...]], paged: bool) -> str:
+    """Sentencia de comentarios del dashboard, memoizada por forma (máscara de filtros, columnas, paginada)."""
+    if columns:
+        unknown = [c for c in columns if c not in _COMMENT_DASHBOARD_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown comment columns: {unknown}")
+        select = ", ".join(f"{_COMMENT_DASHBOARD_COLUMNS[c]} AS {c}" for c in columns)
+    else:
+        select = "c.*, p.platform, p.post_id as post_external_id, p.profile_id"
+    query = """
+        SELECT """ + select + """
+        FROM comments c
+        JOIN posts p ON c.post_id = p.id
+    """ + _COMMENTS_DASHBOARD_WHERE[placeholder][mask] + " ORDER BY c.likes DESC, c.posted_at DESC"
+    if paged:
+        query += f" LIMIT {placeholder} OFFSET {placeholder}"
+    return query
+
+
+def iter_comments_for_dashboard(
+    post_id: Optional[int] = None,
+    sentiment_label: Optional[str] = None,
+    min_likes: int = 0,
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    sentiment: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    chunk_size: int = 1000
+) -> Iterator[Dict[str, Any]]:
+    """Como get_comments_for_dashboard pero en streaming (memoria constante; para exportaciones)."""
+    query, params = _comments_dashboard_query(
+        "%s" if USE_POSTGRES else "?", post_id, sentiment_label, min_likes, platform, profile_id,
+        sentiment, columns
+    )
+    return _iter_dict_rows(query, params, chunk_size)
+
+
+def get_comments_for_dashboard(
+    post_id: Optional[int] = None,
+    sentiment_label: Optional[str] = None,
+    min_likes: int = 0,
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    sentiment: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    conn=None,
+    as_columns: bool = False,
+    columns: Optional[List[str]] = None,
+    as_rows: bool = False
+) -> Union[List[Dict[str, Any]], List[Any], Tuple[List[str], List[tuple]]]:
+    """
+    Get comments with filters for dashboard display. limit/offset paginan en SQL.
+    Si se pasa conn, se usa esa conexión y no se cierra (ver get_dashboard_bundle).
+    as_columns=True devuelve (columnas, filas como tuplas) para construir un DataFrame sin dicts.
+    as_rows=True devuelve las filas del driver sin copiarlas a dicts (sqlite3.Row en SQLite: acceso
+    por nombre pero sin .get ni escritura); para quien solo las serializa (API JSON).
+    columns limita el SELECT a esos campos (ver _COMMENT_DASHBOARD_COLUMNS); None = todos.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection(replica=True)
     cursor = conn.cursor()
     
     try:
@@ -961,56 +2438,56 @@ def get_comments_for_dashboard(
         else:
             placeholder = "?"
         
-        query = """
-            SELECT c.*, p.platform, p.post_id as post_external_id, p.profile_id
-            FROM comments c
-            JOIN posts p ON c.post_id = p.id
-            WHERE 1=1
-        """
-        params = []
-        
-        if post_id:
-            query += f" AND c.post_id = {placeholder}"
-            params.append(post_id)
-        
-        # Support both sentiment_label (old) and sentiment (new) parameters
-        if sentiment_label:
-            query += f" AND c.sentiment_label = {placeholder}"
-            params.append(sentiment_label)
-        elif sentiment:
-            # Map frontend sentiment to database format
-            sentiment_map = {
-                'positive': 'POSITIVE',
-                'negative': 'NEGATIVE',
-                'neutral': 'NEUTRAL'
-            }
-            db_sentiment = sentiment_map.get(sentiment.lower())
-            if db_sentiment:
-                query += f" AND c.sentiment_label = {placeholder}"
-                params.append(db_sentiment)
-        
-        if min_likes:
-            query += f" AND c.likes >= {placeholder}"
-            params.append(min_likes)
-        
-        if platform:
-            query += f" AND p.platform = {placeholder}"
-            params.append(platform)
-        
-        if profile_id:
-            query += f" AND p.profile_id = {placeholder}"
-            params.append(profile_id)
-        
-        query += " ORDER BY c.likes DESC, c.posted_at DESC"
-        
+        query, params = _comments_dashboard_query(
+            placeholder, post_id, sentiment_label, min_likes, platform, profile_id, sentiment,
+            columns, limit, offset
+        )
         cursor.execute(query, params)
         
-        if USE_POSTGRES:
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
-        else:
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+        if as_columns:
+            return _fetch_columnar(cursor)
+        if as_rows:
+            return cursor.fetchall()
+        return _rows_to_dicts(cursor)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def count_comments_for_dashboard(
+    post_id: Optional[int] = None,
+    sentiment_label: Optional[str] = None,
+    min_likes: int = 0,
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    sentiment: Optional[str] = None
+) -> int:
+    """Count comments matching the dashboard filters (total para la paginación)."""
+    placeholder = "%s" if USE_POSTGRES else "?"
+    mask, params = _comments_dashboard_filters(
+        post_id, sentiment_label, min_likes, platform, profile_id, sentiment
+    )
+    return _fetch_count(_COMMENTS_COUNT_SQL[placeholder][mask], params)
+
+
+def get_dashboard_bundle(
+    profile_id: Optional[int] = None,
+    platform: Optional[str] = None,
+    sentiment_label: Optional[str] = None,
+    min_likes: int = 0
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Posts y comentarios de un perfil/plataforma con una sola conexión (una apertura en vez de dos)."""
+    conn = get_read_connection(replica=True)
+    try:
+        posts = get_posts_for_dashboard(platform=platform, profile_id=profile_id, conn=conn)
+        comments = get_comments_for_dashboard(
+            sentiment_label=sentiment_label,
+            min_likes=min_likes,
+            platform=platform,
+            profile_id=profile_id,
+            conn=conn
+        )
+        return posts, comments
     finally:
         conn.close()
 
@@ -1021,7 +2498,7 @@ def get_comments_without_sentiment(
     limit: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """Obtiene comentarios que aún no tienen análisis de sentimiento (sentiment_label IS NULL)."""
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     try:
         if USE_POSTGRES:
@@ -1047,12 +2524,7 @@ def get_comments_without_sentiment(
             query += f" LIMIT {placeholder}"
             params.append(limit)
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        if USE_POSTGRES:
-            return [dict(r) for r in rows]
-        if rows and isinstance(rows[0], dict):
-            return [dict(r) for r in rows]
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in rows]
+        return _rows_to_dicts(cursor)
     finally:
         conn.close()
 
@@ -1082,9 +2554,44 @@ def update_comment_sentiment(
         conn.close()
 
 
+def update_comments_sentiment_bulk(rows: List[Tuple[int, str, float, str]]) -> int:
+    """
+    Como update_comment_sentiment para muchas filas (id, label, score, method) en una sola
+    conexión y un solo COMMIT (un fsync en vez de uno por comentario). Devuelve cuántas filas se enviaron.
+    """
+    if not rows:
+        return 0
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        if USE_POSTGRES:
+            # Un UPDATE ... FROM (VALUES ...) por página en vez de un UPDATE por fila
+            execute_values(
+                cursor,
+                """
+                UPDATE comments AS c SET sentiment_label = v.label, sentiment_score = v.score,
+                    sentiment_method = v.method
+                FROM (VALUES %s) AS v(id, label, score, method)
+                WHERE c.id = v.id
+                """,
+                rows,
+                template="(%s::integer, %s, %s::double precision, %s)",
+                page_size=COMMENT_BULK_PAGE_SIZE
+            )
+        else:
+            cursor.executemany("""
+                UPDATE comments SET sentiment_label = ?, sentiment_score = ?, sentiment_method = ?
+                WHERE id = ?
+            """, [(label, score, method, comment_id) for comment_id, label, score, method in rows])
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
+
 def get_sentiment_stats(profile_id: Optional[int] = None, platform: Optional[str] = None) -> Dict[str, Any]:
     """Get sentiment statistics for comments."""
-    conn = get_connection()
+    conn = get_read_connection(replica=True)
     cursor = conn.cursor()
     
     try:
@@ -1093,14 +2600,15 @@ def get_sentiment_stats(profile_id: Optional[int] = None, platform: Optional[str
         else:
             placeholder = "?"
         
+        # Conteos y porcentajes en una sola consulta sobre el resumen por post (no sobre comments)
         query = """
             SELECT 
-                c.sentiment_label,
-                COUNT(*) as count,
-                AVG(c.sentiment_score) as avg_score
-            FROM comments c
-            JOIN posts p ON c.post_id = p.id
-            WHERE c.sentiment_label IS NOT NULL
+                s.sentiment_label,
+                SUM(s.count) as count,
+                100.0 * SUM(s.count) / SUM(SUM(s.count)) OVER () as pct
+            FROM sentiment_summary s
+            JOIN posts p ON s.post_id = p.id
+            WHERE s.count > 0
         """
         params = []
         
@@ -1112,24 +2620,18 @@ def get_sentiment_stats(profile_id: Optional[int] = None, platform: Optional[str
             query += f" AND p.platform = {placeholder}"
             params.append(platform)
         
-        query += " GROUP BY c.sentiment_label"
+        query += " GROUP BY s.sentiment_label"
         
         cursor.execute(query, params)
-        rows = cursor.fetchall()
+        _, rows = _fetch_columnar(cursor)
         
+        # Las tres etiquetas siempre presentes (el frontend y el PDF las leen directamente)
         stats = {"POSITIVE": 0, "NEGATIVE": 0, "NEUTRAL": 0}
-        total = 0
-        
-        for row in rows:
-            label = row["sentiment_label"] if isinstance(row, dict) else row[0]
-            count = row["count"] if isinstance(row, dict) else row[1]
+        percentages = {"POSITIVE": 0, "NEGATIVE": 0, "NEUTRAL": 0}
+        for label, count, pct in rows:
             stats[label] = count
-            total += count
-        
-        # Calculate percentages
-        percentages = {}
-        for label, count in stats.items():
-            percentages[label] = (count / total * 100) if total > 0 else 0
+            percentages[label] = float(pct)
+        total = sum(stats.values())
         
         return {
             "counts": stats,
@@ -1140,13 +2642,74 @@ def get_sentiment_stats(profile_id: Optional[int] = None, platform: Optional[str
         conn.close()
 
 
+def get_sentiment_stats_by_platform(
+    profile_id: Optional[int] = None,
+    platform: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Sentiment statistics per platform in a single GROUP BY query.
+    Returns {platform: {"counts", "percentages", "total"}} (mismo formato que get_sentiment_stats).
+    """
+    conn = get_read_connection(replica=True)
+    cursor = conn.cursor()
+    
+    try:
+        placeholder = "%s" if USE_POSTGRES else "?"
+        query = """
+            SELECT 
+                p.platform,
+                s.sentiment_label,
+                SUM(s.count) as count
+            FROM sentiment_summary s
+            JOIN posts p ON s.post_id = p.id
+            WHERE s.count > 0
+        """
+        params = []
+        
+        if profile_id:
+            query += f" AND p.profile_id = {placeholder}"
+            params.append(profile_id)
+        
+        if platform:
+            query += f" AND p.platform = {placeholder}"
+            params.append(platform)
+        
+        query += " GROUP BY p.platform, s.sentiment_label"
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        
+        by_platform: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            platform_name = row["platform"] if isinstance(row, dict) else row[0]
+            label = row["sentiment_label"] if isinstance(row, dict) else row[1]
+            count = row["count"] if isinstance(row, dict) else row[2]
+            entry = by_platform.setdefault(platform_name, {
+                "counts": {"POSITIVE": 0, "NEGATIVE": 0, "NEUTRAL": 0},
+                "total": 0
+            })
+            entry["counts"][label] = count
+            entry["total"] += count
+        
+        for entry in by_platform.values():
+            total = entry["total"]
+            entry["percentages"] = {
+                label: (count / total * 100) if total > 0 else 0
+                for label, count in entry["counts"].items()
+            }
+        
+        return by_platform
+    finally:
+        conn.close()
+
+
 def get_most_repeated_comments(
     profile_id: Optional[int] = None,
     platform: Optional[str] = None,
     limit: int = 10
 ) -> List[Dict[str, Any]]:
     """Get the most repeated comments (by text similarity)."""
-    conn = get_connection()
+    conn = get_read_connection(replica=True)
     cursor = conn.cursor()
     
     try:
@@ -1273,7 +2836,7 @@ def export_comments_to_csv(
     date_to: Optional[datetime] = None
 ) -> str:
     """Export comments to CSV format."""
-    comments = get_comments_for_dashboard(
+    comments = iter_comments_for_dashboard(
         profile_id=profile_id,
         platform=platform,
         sentiment_label=sentiment_label
@@ -1281,18 +2844,15 @@ def export_comments_to_csv(
     
     # Filter by date if provided
     if date_from or date_to:
-        filtered_comments = []
-        for comment in comments:
-            posted_at = comment.get('posted_at')
+        def _in_range(comment: Dict[str, Any]) -> bool:
+            posted_at = parse_timestamp(comment.get('posted_at'))
             if posted_at:
-                if isinstance(posted_at, str):
-                    posted_at = datetime.fromisoformat(posted_at.replace('Z', '+00:00'))
                 if date_from and posted_at < date_from:
-                    continue
+                    return False
                 if date_to and posted_at > date_to:
-                    continue
-            filtered_comments.append(comment)
-        comments = filtered_comments
+                    return False
+            return True
+        comments = filter(_in_range, comments)
     
     # Create CSV
     output = io.StringIO()
@@ -1331,7 +2891,7 @@ def export_posts_to_csv(
     date_to: Optional[datetime] = None
 ) -> str:
     """Export posts to CSV format."""
-    posts = get_posts_for_dashboard(
+    posts = iter_posts_for_dashboard(
         profile_id=profile_id,
         platform=platform,
         date_from=date_from,
@@ -1377,7 +2937,7 @@ def export_interactions_to_csv(
     date_to: Optional[datetime] = None
 ) -> str:
     """Export interaction statistics to CSV format (aggregated by day)."""
-    posts = get_posts_for_dashboard(
+    posts = iter_posts_for_dashboard(
         profile_id=profile_id,
         platform=platform,
         date_from=date_from,
@@ -1398,10 +2958,8 @@ def export_interactions_to_csv(
     })
     
     for post in posts:
-        posted_at = post.get('posted_at')
+        posted_at = parse_timestamp(post.get('posted_at'))
         if posted_at:
-            if isinstance(posted_at, str):
-                posted_at = datetime.fromisoformat(posted_at.replace('Z', '+00:00'))
             date_key = posted_at.date().isoformat()
             
             daily_stats[date_key]['date'] = date_key
@@ -0,0 +1,146 @@
+"""
+Variante async de las operaciones de BD más usadas, sobre asyncpg (solo PostgreSQL).
+- Un pool de conexiones por proceso (create_pool al arrancar, close_pool al parar).
+- asyncpg prepara cada sentencia en el servidor y la guarda en la caché LRU de la conexión
+  (statement_cache_size), así que las consultas repetidas no se vuelven a parsear ni planificar.
+Si asyncpg no está instalado o no hay DATABASE_URL, USE_ASYNCPG es False y se usa db_utils.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+from db_utils import (
+    COMMENT_INSERT_COLUMNS,
+    DATABASE_URL,
+    USE_POSTGRES,
+    _COMMENT_UPSERT_SET,
+    _post_upsert_sql,
+    _posts_dashboard_query,
+)
+
+import logging
+logger = logging.getLogger(__name__)
+
+USE_ASYNCPG = ASYNCPG_AVAILABLE and USE_POSTGRES
+
+_pool = None
+
+# %s (estilo psycopg2) -> $1, $2, ... (estilo asyncpg), fuera de literales '...'
+_PG_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|%s")
+
+
+@lru_cache(maxsize=128)
+def _to_dollar_params(query: str) -> str:
+    counter = iter(range(1, 10_000))
+    return _PG_PLACEHOLDER_RE.sub(
+        lambda m: f"${next(counter)}" if m.group() == "%s" else m.group(), query
+    )
+
+
+async def create_pool(min_size: int = 4, max_size: int = 20):
+    """Crea el pool de asyncpg (idempotente). Devuelve None si asyncpg no está en uso."""
+    global _pool
+    if not USE_ASYNCPG:
+        return None
+    if _pool is None:
+        _pool = await asyncpg.create_pool(DATABASE_URL, min_size=min_size, max_size=max_size)
+        logger.info("✅ asyncpg pool ready (min=%s, max=%s)", min_size, max_size)
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+
+
+def get_pool():
+    """Pool activo o None si no se ha creado (los llamadores caen entonces a db_utils)."""
+    return _pool
+
+
+_UPSERT_COMMENT_SQL = (
+    f"INSERT INTO comments ({', '.join(COMMENT_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join(f'${i}' for i in range(1, len(COMMENT_INSERT_COLUMNS) + 1))}) "
+    f"ON CONFLICT (post_id, comment_id) DO UPDATE SET {_COMMENT_UPSERT_SET}"
+)
+
+
+async def insert_post(
+    profile_id: int,
+    platform: str,
+    post_id: str,
+    url: Optional[str] = None,
+    text: Optional[str] = None,
+    likes: int = 0,
+    comments_count: int = 0,
+    shares: int = 0,
+    views: int = 0,
+    posted_at: Optional[datetime] = None
+) -> int:
+    """
+    Async insert_post (mismo UPSERT que db_utils.insert_post). Returns the post database ID.
+    interactions_total es columna generada (init_database migra el esquema al arrancar).
+    """
+    async with _pool.acquire() as conn:
+        return await conn.fetchval(
+            _post_upsert_sql(True, "$", True),
+            profile_id, platform, post_id, url, text, likes, comments_count,
+            shares, views, posted_at
+        )
+
+
+async def insert_comments_bulk(rows: List[Tuple]) -> int:
+    """Async insert_comments_bulk: filas en el orden de COMMENT_INSERT_COLUMNS, una transacción."""
+    if not rows:
+        return 0
+    async with _pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.executemany(_UPSERT_COMMENT_SQL, rows)
+    return len(rows)
+
+
+async def insert_comment(
+    post_id: int,
+    comment_id: str,
+    text: Optional[str] = None,
+    author: Optional[str] = None,
+    likes: int = 0,
+    sentiment_label: Optional[str] = None,
+    sentiment_score: Optional[float] = None,
+    sentiment_method: Optional[str] = None,
+    posted_at: Optional[datetime] = None
+) -> None:
+    """Async insert de un comentario (UPSERT por (post_id, comment_id))."""
+    async with _pool.acquire() as conn:
+        await conn.execute(
+            _UPSERT_COMMENT_SQL,
+            post_id, comment_id, text, author, likes, sentiment_label,
+            sentiment_score, sentiment_method, posted_at
+        )
+
+
+async def get_posts_for_dashboard(
+    platform: Optional[str] = None,
+    profile_id: Optional[int] = None,
+    min_interactions: int = 0,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Async get_posts_for_dashboard: mismos filtros y orden que la versión síncrona."""
+    query, params = _posts_dashboard_query(
+        "%s", platform, profile_id, min_interactions, date_from, date_to, limit, offset
+    )
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(_to_dollar_params(query), *params)
+    return [dict(row) for row in rows]
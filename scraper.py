@@ -4,11 +4,37 @@ Handles scraping posts and comments from Instagram, TikTok, and Facebook.
 """
 import hashlib
 import logging
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any, Set, Tuple
+from datetime import date, datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from apify_client import ApifyClient
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, retry_if_exception, stop_after_attempt
+
+# Import opcional: orjson parsea los datasets de comentarios (varios MB) varias veces más rápido que json
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    _ORJSON_AVAILABLE = False
+
+# Import opcional: ijson lee el dataset de comentarios ítem a ítem desde el socket, sin el cuerpo entero en memoria
+try:
+    import ijson
+    _IJSON_AVAILABLE = True
+except ImportError:
+    ijson = None
+    _IJSON_AVAILABLE = False
 
 from config import (
     get_apify_token, get_apify_token_for_profile, get_actor_id, get_default_limit_posts,
@@ -16,14 +42,359 @@ from config import (
     get_date_from, get_date_to, get_last_days
 )
 from db_utils import (
-    get_all_profiles, update_profile_last_analyzed, insert_post, insert_comment,
-    get_post_profile_and_platform,
+    get_all_profiles, update_profile_last_analyzed, insert_post, insert_posts_bulk, insert_comment,
+    get_post_profile_and_platform, get_profile_by_id, get_post_by_url, get_commented_post_ids,
+    CommentBatchWriter,
 )
-from utils import normalize_username_or_url, clean_text
-from analyzer import get_analyzer
+from utils import normalize_username_or_url, clean_text, parse_timestamp
+from analyzer import SentimentAnalyzer, get_analyzer
 
 logger = logging.getLogger(__name__)
 
+# Perfiles analizados a la vez en analyze_profiles. Cada uno pasa casi todo el tiempo esperando a
+# su actor de Apify (.call() bloquea hasta que termina la corrida); 1 = secuencial.
+APIFY_MAX_CONCURRENT_RUNS = int(os.getenv("APIFY_MAX_CONCURRENT_RUNS", "4"))
+# Runs de comentarios por URL a la vez dentro de un perfil (uno por post); 1 = secuencial.
+# En total puede haber hasta APIFY_MAX_CONCURRENT_RUNS * APIFY_COMMENT_CONCURRENCY runs en curso.
+APIFY_COMMENT_CONCURRENCY = int(os.getenv("APIFY_COMMENT_CONCURRENCY", "4"))
+# Con al menos estos comentarios embebidos no se lanza el run de comentarios por URL del post
+# (salvo Facebook); 1 = cualquier comentario embebido basta.
+MIN_COMMENTS_BEFORE_REFETCH = int(os.getenv("MIN_COMMENTS_BEFORE_REFETCH", "5"))
+
+# Espera de las corridas: start() + run.get() con backoff de 2 s a 30 s hasta un estado final
+APIFY_POLL_MIN_SECS = 2.0
+APIFY_POLL_MAX_SECS = 30.0
+_APIFY_TERMINAL_STATUSES = frozenset({"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"})
+
+
+# Campos con la fecha de publicación por plataforma, en orden de preferencia: decide el primero
+# presente en el ítem (Unix timestamp o texto ISO, p.ej. "2024-02-13T20:49:57.000Z")
+_POST_DATE_FIELDS = {
+    "tiktok": ("createTime", "createTimeISO", "timestamp"),
+    "instagram": ("timestamp",),
+    "facebook": ("timestamp", "createdAt"),
+}
+
+
+def _posted_at(item: Dict[str, Any], fields: Tuple[str, ...]) -> Optional[datetime]:
+    """Fecha y hora del primer campo de fields presente en el ítem; None si no hay o no se entiende."""
+    for key in fields:
+        if key in item:
+            return parse_timestamp(item[key])
+    return None
+
+
+def _post_date(item: Dict[str, Any], fields: Tuple[str, ...]) -> Optional[date]:
+    """Fecha de publicación del ítem según fields (ver _POST_DATE_FIELDS); None si no hay o no se entiende."""
+    posted_at = _posted_at(item, fields)
+    return posted_at.date() if posted_at else None
+
+
+# Alias de cada campo en los ítems de Apify, en orden de preferencia (gana el primero con valor).
+# TikTok tiene su propio mapa; el resto de plataformas usa "default".
+_POST_FIELD_ALIASES = {
+    "tiktok": {
+        "id": ("id", "awemeId", "videoId", "videoWebUrl"),
+        "url": ("videoWebUrl", "webVideoUrl", "url"),
+        "text": ("text", "desc", "description"),
+        "likes": ("diggCount", "likesCount", "likes"),
+        "comments": ("commentCount", "commentsCount", "comments"),
+        "shares": ("shareCount", "sharesCount", "shares"),
+        "views": ("playCount", "viewsCount", "views", "viewCount"),
+        "posted_at": ("createTime", "createTimeISO", "timestamp"),
+    },
+    "default": {
+        "id": ("id", "postId", "shortCode"),
+        "url": ("url", "postUrl", "webVideoUrl"),
+        "text": ("text", "caption", "description"),
+        "likes": ("likesCount", "likes", "diggCount", "reactionsCount"),
+        "comments": ("commentsCount", "comments", "commentCount"),
+        "shares": ("sharesCount", "shares", "shareCount"),
+        "views": ("viewsCount", "views", "playCount", "viewCount"),
+        "posted_at": ("timestamp", "createdAt"),
+    },
+}
+
+_COMMENT_FIELD_ALIASES = {
+    "id": ("id", "commentId", "cid"),
+    "text": ("text", "comment", "content"),
+    "author": ("ownerUsername", "author", "username", "uniqueId"),
+    "likes": ("likesCount", "likes", "diggCount"),
+    "posted_at": ("timestamp", "createTime", "createTimeISO", "createdAt"),
+}
+
+_EMBEDDED_COMMENT_FIELDS = ("comments", "commentsData", "topComments")
+# Dónde buscar la lista de comentarios de un post ya extraído ("comments" al final: suele ser un conteo)
+_POST_COMMENT_LIST_FIELDS = ("_embedded_comments", "commentsData", "topComments", "commentsList", "comments")
+
+
+def _post_comment_list(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Primera lista no vacía de comentarios del post según _POST_COMMENT_LIST_FIELDS ([] si no hay)."""
+    return next(
+        (value for value in map(item.get, _POST_COMMENT_LIST_FIELDS) if isinstance(value, list) and value),
+        []
+    )
+
+
+# Total de comentarios que declara el post (solo si es un número: "comments" también puede ser la lista)
+_REPORTED_COMMENT_COUNT_FIELDS = ("commentsCount", "commentCount", "comments")
+
+
+def _reported_comment_count(item: Dict[str, Any]) -> Optional[int]:
+    for key in _REPORTED_COMMENT_COUNT_FIELDS:
+        value = item.get(key)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    return None
+
+
+# Campos de nivel superior que se leen de los ítems de posts / comentarios: se piden al dataset
+# con fields= para no descargar ni parsear el resto (en TikTok, authorMeta, musicMeta, videoMeta...)
+_POST_ITEM_FIELDS = tuple(sorted(
+    {key for aliases in _POST_FIELD_ALIASES.values() for keys in aliases.values() for key in keys}
+    | {key for keys in _POST_DATE_FIELDS.values() for key in keys}
+    | set(_EMBEDDED_COMMENT_FIELDS) | set(_REPORTED_COMMENT_COUNT_FIELDS)
+    | {"commentsList", "postUrl", "link", "commentsDatasetUrl", "commentsDatasetURL", "commentsUrl"}
+))
+_COMMENT_ITEM_FIELDS = tuple(sorted(
+    {key for keys in _COMMENT_FIELD_ALIASES.values() for key in keys} | {"authorMeta"}
+))
+
+
+def _comment_fields(
+    item: Dict[str, Any],
+    post_db_id: int,
+    is_tiktok: bool
+) -> Tuple[str, Optional[str], Optional[str], int, Optional[datetime]]:
+    """
+    Extrae (comment_id, text, author, likes, posted_at) de un ítem de comentario de Apify.
+    Función pura (sin BD ni estado del scraper).
+    """
+    # Extract text first (needed for fallback comment_id)
+    text = clean_text(_first(item, _COMMENT_FIELD_ALIASES["text"]))
+    author = (
+        _first(item, _COMMENT_FIELD_ALIASES["author"]) or
+        item.get("authorMeta", {}).get("name")  # TikTok nested format
+    )
+    # TikTok: siempre usar hash(post + texto + autor) como comment_id para evitar duplicados
+    # (el actor a veces devuelve el mismo comentario varias veces con ids distintos en la misma publicación)
+    raw_id = None if is_tiktok else _first(item, _COMMENT_FIELD_ALIASES["id"])
+    if raw_id is not None and str(raw_id).strip():
+        comment_id = str(raw_id).strip()
+    else:
+        payload = f"{post_db_id}_{text or ''}_{author or ''}"
+        comment_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    likes = int(_first(item, _COMMENT_FIELD_ALIASES["likes"], 0))
+    posted_at = _posted_at(item, _COMMENT_FIELD_ALIASES["posted_at"])
+    return comment_id, text, author, likes, posted_at
+
+
+def _keys_preview(item: Any, n: int = 10) -> Any:
+    """Primeras n claves de un ítem para logs (sin copiar todas las claves)."""
+    return list(islice(item.keys(), n)) if isinstance(item, dict) else "not a dict"
+
+
+def _post_field_aliases(platform: str) -> Dict[str, Tuple[str, ...]]:
+    return _POST_FIELD_ALIASES.get(platform.lower(), _POST_FIELD_ALIASES["default"])
+
+
+def _first(item: Dict[str, Any], keys: Tuple[str, ...], default: Any = None) -> Any:
+    """Primer valor no vacío de keys en item (como item.get(a) or item.get(b) or ... or default)."""
+    for key in keys:
+        value = item.get(key)
+        if value:
+            return value
+    return default
+
+
+class _TokenBucket:
+    """Limitador de peticiones compartido entre hilos: rate por segundo, ráfagas de hasta burst."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Se reserva el token aunque haya que esperarlo: los hilos siguientes esperan detrás
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+# Peticiones de control a Apify (lanzar corrida, consultar estado) por segundo en todo el proceso;
+# con varios perfiles en paralelo evita ráfagas que acaban en 429. 0 = sin límite.
+APIFY_MAX_RPS = float(os.getenv("APIFY_MAX_RPS", "5"))
+_apify_rate_limiter = _TokenBucket(APIFY_MAX_RPS, burst=10)
+APIFY_RETRY_MAX_SECS = 60.0
+
+
+def _apify_retryable(error: BaseException) -> bool:
+    """Reintentar solo cortes de red, 429 y 5xx; el resto de 4xx (token, input) fallan al momento."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+
+def _retry_after_secs(error: BaseException) -> float:
+    """Segundos de la cabecera Retry-After de la respuesta de error (0 si no la hay o es una fecha)."""
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    try:
+        return max(float(value), 0.0) if value is not None else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _apify_wait(retry_state) -> float:
+    """Backoff exponencial (2, 4, 8... s) o Retry-After si es mayor, con jitter para no sincronizar hilos."""
+    backoff = min(2.0 * 2 ** (retry_state.attempt_number - 1), APIFY_RETRY_MAX_SECS)
+    retry_after = min(_retry_after_secs(retry_state.outcome.exception()), APIFY_RETRY_MAX_SECS)
+    return max(backoff, retry_after) + random.uniform(0, 1)
+
+
+@lru_cache(maxsize=16)
+def _apify_client(token: str) -> ApifyClient:
+    """
+    Un ApifyClient por token para todo el proceso: su cliente HTTP mantiene las conexiones
+    keep-alive con api.apify.com, así que el handshake TLS se paga una vez y no en cada corrida,
+    consulta de estado o página de dataset (ni en cada ApifyScraper o hilo de analyze_profiles).
+    """
+    return ApifyClient(token)
+
+
+# Descargas directas: backoff exponencial (0, 2 s, 4 s, 8 s...) más jitter, con tope en segundos
+HTTP_RETRY_MAX_SECS = 30.0
+
+
+class _JitterRetry(Retry):
+    """Retry de urllib3 con jitter aleatorio (hasta 1 s) y tope HTTP_RETRY_MAX_SECS en el backoff."""
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return min(backoff + random.random(), HTTP_RETRY_MAX_SECS) if backoff else 0
+
+
+@lru_cache(maxsize=1)
+def _http_session() -> requests.Session:
+    """
+    Sesión HTTP compartida para las descargas directas (datasets de comentarios de TikTok):
+    pool de conexiones keep-alive y reintentos con backoff y jitter ante errores de conexión,
+    429 y 5xx; si la respuesta trae Retry-After, se espera lo que indica.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=50,
+        max_retries=_JitterRetry(
+            total=5,
+            backoff_factor=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+            raise_on_status=False  # agotados los reintentos, se devuelve la última respuesta
+        )
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _response_json(response: requests.Response) -> Any:
+    """Cuerpo JSON de la respuesta, con orjson cuando está instalado (mismo resultado que response.json())."""
+    if _ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _response_json_items(response: requests.Response) -> List[Dict[str, Any]]:
+    """
+    Ítems (dicts) de una respuesta que es una lista JSON. Con ijson (y stream=True en la petición) se
+    parsea en streaming: el pico de memoria es la lista resultante, no cuerpo crudo + lista.
+    """
+    if _IJSON_AVAILABLE:
+        response.raw.decode_content = True
+        return [item for item in ijson.items(response.raw, "item", use_float=True) if isinstance(item, dict)]
+    items = _response_json(response)
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+# Comentario guardado sin sentimiento (sentiment_label NULL = pendiente de analizar)
+_NO_SENTIMENT = {"label": None, "score": None, "method": None}
+
+
+# Auto-skip: no se vuelve a analizar un perfil analizado hace menos de estos días
+AUTO_SKIP_DAYS = 7
+
+
+@dataclass(frozen=True)
+class FilterConfig:
+    """
+    Filtro de fechas de la configuración (común a todas las plataformas), leído una vez por
+    análisis con FilterConfig.load() y pasado a scrape_posts / _filter_posts_by_date.
+    Las fechas específicas (desde/hasta, YYYY-MM-DD) tienen prioridad sobre los últimos N días.
+    """
+    last_days: int = 0
+    date_from_str: Optional[str] = None
+    date_to_str: Optional[str] = None
+
+    @classmethod
+    def load(cls) -> "FilterConfig":
+        return cls(get_last_days() or 0, get_date_from() or None, get_date_to() or None)
+
+    @property
+    def use_specific_dates(self) -> bool:
+        return bool(self.date_from_str or self.date_to_str)
+
+    @property
+    def active(self) -> bool:
+        return self.use_specific_dates or self.last_days > 0
+
+    def date_range(self) -> Tuple[Optional[date], Optional[date]]:
+        """(desde, hasta) inclusivos; últimos N días = de hoy-N a ayer (excl. hoy). Fechas mal escritas -> None."""
+        if self.use_specific_dates:
+            return _parse_ymd(self.date_from_str), _parse_ymd(self.date_to_str)
+        if self.last_days > 0:
+            today = datetime.now().date()
+            return today - timedelta(days=self.last_days), today - timedelta(days=1)
+        return None, None
+
+
+@dataclass(slots=True)
+class AnalyzeStats:
+    """Contadores de un analyze_profile; se devuelven como dict (asdict) a los llamadores."""
+    posts_scraped: int = 0
+    comments_scraped: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def _parse_ymd(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return None
+
+
+def _days_since_analyzed(last_analyzed: Any) -> Optional[int]:
+    """Días desde last_analyzed (SQLite devuelve texto ISO; Postgres, datetime); None si no hay o no se entiende."""
+    last_analyzed = parse_timestamp(last_analyzed)
+    if last_analyzed is None:
+        return None
+    try:
+        return (datetime.now() - last_analyzed).days
+    except TypeError:
+        return None
+
 
 class ApifyScraper:
     """Scraper for social media platforms using Apify actors."""
@@ -31,12 +402,24 @@ class ApifyScraper:
     def __init__(self):
         self.token = get_apify_token()
         self.client = None
+        self._analyzer = None
+        self.http = _http_session()
         if self.token:
             try:
-                self.client = ApifyClient(self.token)
+                self.client = _apify_client(self.token)
             except Exception as e:
                 logger.error(f"Error initializing Apify client: {e}")
     
+    @property
+    def analyzer(self) -> SentimentAnalyzer:
+        """
+        Analizador de sentimiento, resuelto una vez por scraper (en el primer uso, no al construir:
+        cargar el modelo es caro). reload_analyzer() recarga la misma instancia, así que no caduca.
+        """
+        if self._analyzer is None:
+            self._analyzer = get_analyzer()
+        return self._analyzer
+    
     def _ensure_client(self) -> bool:
         """Ensure Apify client is initialized."""
         if not self.token:
@@ -44,7 +427,7 @@ class ApifyScraper:
         
         if not self.client:
             try:
-                self.client = ApifyClient(self.token)
+                self.client = _apify_client(self.token)
             except Exception as e:
                 raise ValueError(f"Invalid Apify token: {e}. Please check your token in Configuration.")
         
@@ -81,24 +464,41 @@ class ApifyScraper:
     def _client_for_token(self, token: Optional[str] = None):
         """Devuelve un cliente Apify para el token dado, o self.client si no se pasa token."""
         if token and token.strip():
-            return ApifyClient(token.strip())
+            return _apify_client(token.strip())
         self._ensure_client()
         return self.client
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((ConnectionError, TimeoutError))
-    )
+    @retry(stop=stop_after_attempt(3), wait=_apify_wait, retry=retry_if_exception(_apify_retryable), reraise=True)
+    def _start_actor(self, client: Any, actor_id: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Lanza la corrida sin esperar a que termine."""
+        _apify_rate_limiter.acquire()
+        return client.actor(actor_id).start(run_input=input_data)
+
+    @retry(stop=stop_after_attempt(3), wait=_apify_wait, retry=retry_if_exception(_apify_retryable), reraise=True)
+    def _get_run(self, client: Any, run_id: str) -> Optional[Dict[str, Any]]:
+        _apify_rate_limiter.acquire()
+        return client.run(run_id).get()
+
+    def _wait_for_run(self, client: Any, run: Dict[str, Any]) -> Dict[str, Any]:
+        """Consulta la corrida con backoff (2 s -> 30 s) hasta que llega a un estado final."""
+        delay = APIFY_POLL_MIN_SECS
+        while run.get("status") not in _APIFY_TERMINAL_STATUSES:
+            time.sleep(delay)
+            delay = min(delay * 2, APIFY_POLL_MAX_SECS)
+            run = self._get_run(client, run["id"]) or run
+        return run
+
     def _run_actor(self, actor_id: str, input_data: Dict[str, Any], token: Optional[str] = None) -> Dict[str, Any]:
-        """Run an Apify actor with retry logic.
+        """Run an Apify actor and wait for it to finish.
         Si se pasa token, se usa ese token (ej. por perfil); si no, el del scraper.
+        start() y cada consulta del estado se reintentan por separado: un corte de conexión
+        mientras se espera no lanza (ni cobra) una corrida nueva, como pasaba al reintentar .call().
         Raises ValueError with message that may include APIFY_QUOTA or APIFY_AUTH for the API to show a clear message.
         """
         client = self._client_for_token(token)
         try:
-            run = client.actor(actor_id).call(run_input=input_data)
-            return run
+            run = self._start_actor(client, actor_id, input_data)
+            return self._wait_for_run(client, run)
         except Exception as e:
             err_msg = str(e).lower()
             logger.error(f"Error running actor {actor_id}: {e}")
@@ -110,22 +510,37 @@ class ApifyScraper:
                 raise ValueError(f"APIFY_AUTH: Error con el token de Apify: {e}. Revisa Configuración → API & Tokens.")
             raise
     
-    def _get_actor_dataset(self, run: Dict[str, Any], client: Optional[Any] = None) -> List[Dict[str, Any]]:
-        """Get dataset items from an Apify actor run. Si se pasó client (por token), usarlo."""
+    def _iter_actor_dataset(
+        self,
+        run: Dict[str, Any],
+        client: Optional[Any] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Ítems del dataset de una corrida a medida que llegan las páginas de la API (sin lista intermedia).
+        Si se pasó client (por token), usarlo. Con fields, la API solo devuelve esos campos de nivel
+        superior (menos JSON que descargar y parsear). Un error a mitad se registra y corta la iteración.
+        """
         if not run or "defaultDatasetId" not in run:
-            return []
+            return
         c = client or self.client
         if not c:
             self._ensure_client()
             c = self.client
         dataset_id = run["defaultDatasetId"]
-        items = []
         try:
-            for item in c.dataset(dataset_id).iterate_items():
-                items.append(item)
+            yield from c.dataset(dataset_id).iterate_items(fields=list(fields) if fields else None)
         except Exception as e:
             logger.error(f"Error fetching dataset items: {e}")
-        return items
+
+    def _get_actor_dataset(
+        self,
+        run: Dict[str, Any],
+        client: Optional[Any] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get dataset items from an Apify actor run. Si se pasó client (por token), usarlo."""
+        return list(self._iter_actor_dataset(run, client, fields))
 
     def get_dataset_from_run_id(self, run_id: str) -> List[Dict[str, Any]]:
         """
@@ -151,7 +566,6 @@ class ApifyScraper:
         Importa posts (y comentarios embebidos) desde una corrida guardada en Apify.
         No ejecuta el actor ni gasta tokens; solo descarga el dataset y lo guarda en nuestra BD.
         """
-        from db_utils import get_profile_by_id
         profile = get_profile_by_id(profile_id)
         if not profile:
             raise ValueError(f"Perfil {profile_id} no encontrado")
@@ -161,24 +575,23 @@ class ApifyScraper:
         if not items:
             return {"posts_imported": 0, "comments_imported": 0, "errors": ["Dataset vacío o run no encontrado"]}
         stats = {"posts_imported": 0, "comments_imported": 0, "errors": []}
-        for idx, post_item in enumerate(items):
+        post_db_ids = self.process_post_items(items, platform, profile_id)
+        # Comentarios embebidos de todos los posts: un solo analyze_batch y una sola transacción
+        comment_batches = []
+        for idx, (post_item, post_db_id) in enumerate(zip(items, post_db_ids)):
             try:
-                post_db_id = self.process_post_item(post_item, platform, profile_id)
                 if not post_db_id:
                     continue
                 stats["posts_imported"] += 1
-                comments_list = []
-                for field in ["_embedded_comments", "commentsData", "topComments", "commentsList", "comments"]:
-                    if field in post_item and isinstance(post_item.get(field), list):
-                        comments_list = post_item[field]
-                        break
+                comments_list = _post_comment_list(post_item)
                 if comments_list:
-                    for comment_item in comments_list:
-                        self.process_comment_item(comment_item, post_db_id)
+                    comment_batches.append((comments_list, post_db_id))
                     stats["comments_imported"] += len(comments_list)
             except Exception as e:
                 logger.warning(f"Error procesando item {idx+1}: {e}")
                 stats["errors"].append(str(e))
+        if comment_batches:
+            self.process_comment_batches(comment_batches, platform)
         update_profile_last_analyzed(profile_id)
         logger.info(f"Importación desde run {run_id}: {stats['posts_imported']} posts, {stats['comments_imported']} comentarios")
         return stats
@@ -193,7 +606,6 @@ class ApifyScraper:
         Importa comentarios desde una corrida de Facebook Comments Scraper (u otro actor de comentarios).
         Obtiene la URL del post desde el input del run, busca el post en nuestra BD y asocia los comentarios.
         """
-        from db_utils import get_post_by_url
         if not self._ensure_client():
             return {"comments_imported": 0, "errors": ["Cliente Apify no disponible"]}
         try:
@@ -225,141 +637,68 @@ class ApifyScraper:
         if not items:
             return {"comments_imported": 0, "post_url": post_url[:60], "errors": []}
         stats = {"comments_imported": 0, "errors": []}
-        for item in items:
-            try:
-                self.process_comment_item(item, post_db_id)
-                stats["comments_imported"] += 1
-            except Exception as e:
-                logger.warning(f"Error procesando comentario: {e}")
-                stats["errors"].append(str(e))
+        try:
+            self.process_comment_items(items, post_db_id)
+            stats["comments_imported"] = len(items)
+        except Exception as e:
+            logger.warning(f"Error procesando comentarios: {e}")
+            stats["errors"].append(str(e))
         logger.info(f"Importados {stats['comments_imported']} comentarios desde run {run_id} para post {post_url[:50]}...")
         return stats
 
-    def _filter_posts_by_date(self, items: List[Dict[str, Any]], platform: str) -> List[Dict[str, Any]]:
+    def _filter_posts_by_date(
+        self,
+        items: Iterable[Dict[str, Any]],
+        platform: str,
+        fcfg: Optional[FilterConfig] = None
+    ) -> List[Dict[str, Any]]:
         """
         Filter posts by date manually for TikTok and Instagram.
         This is done after getting results from the actor because:
         - TikTok actor's date filter is too aggressive and discards too many videos
         - Instagram actor doesn't support date filters
+        items puede ser un iterador (p.ej. _iter_actor_dataset): solo se guardan los posts del rango.
         """
-        from config import get_last_days, get_date_from, get_date_to
-        
-        last_days = get_last_days()
-        date_from_str = get_date_from()
-        date_to_str = get_date_to()
+        if fcfg is None:
+            fcfg = FilterConfig.load()
         
         # If no filters configured, return all items
-        if (not last_days or last_days == 0) and not date_from_str and not date_to_str:
+        if not fcfg.active:
             logger.info(f"No date filters configured for {platform}, returning all posts")
-            return items
+            return list(items)
         
         # Prioridad: si el usuario eligió fechas específicas (desde/hasta), solo esas cuentan; si no, últimos N días.
-        today = datetime.now().date()
-        date_from = None
-        date_to = None
-        use_specific_dates = bool(date_from_str or date_to_str)
-        
-        if use_specific_dates:
-            if date_from_str:
-                try:
-                    date_from = datetime.strptime(date_from_str, "%Y-%m-%d").date()
-                except Exception:
-                    pass
-            if date_to_str:
-                try:
-                    date_to = datetime.strptime(date_to_str, "%Y-%m-%d").date()
-                except Exception:
-                    pass
-            if date_from or date_to:
-                logger.info(f"Filtering {platform} posts: fechas específicas from {date_from} to {date_to}")
-        elif last_days and last_days > 0:
-            date_from = today - timedelta(days=last_days)
-            date_to = today - timedelta(days=1)
-            logger.info(f"Filtering {platform} posts: last {last_days} days (from {date_from} to {date_to}, excl. today)")
-        
+        date_from, date_to = fcfg.date_range()
         if not date_from and not date_to:
-            return items
+            return list(items)
+        if fcfg.use_specific_dates:
+            logger.info(f"Filtering {platform} posts: fechas específicas from {date_from} to {date_to}")
+        else:
+            logger.info(f"Filtering {platform} posts: last {fcfg.last_days} days (from {date_from} to {date_to}, excl. today)")
         
-        # Filter items by date
+        # Límites como ordinales (enteros) y extractor de fecha elegido una vez, fuera del bucle
+        lo = date_from.toordinal() if date_from else 0
+        hi = date_to.toordinal() if date_to else date.max.toordinal()
+        date_fields = _POST_DATE_FIELDS.get(platform.lower(), ())
         filtered_items = []
+        seen = 0
         for item in items:
-            post_date = None
-            
-            # Try to extract post date from various fields (platform-specific)
-            if platform.lower() == "tiktok":
-                # TikTok uses createTime (Unix timestamp), createTimeISO, or timestamp
-                if "createTime" in item:
-                    try:
-                        post_date = datetime.fromtimestamp(item["createTime"]).date()
-                    except:
-                        pass
-                elif "createTimeISO" in item:
-                    try:
-                        post_date = datetime.fromisoformat(str(item["createTimeISO"]).replace("Z", "+00:00")).date()
-                    except:
-                        pass
-                elif "timestamp" in item:
-                    try:
-                        # Could be Unix timestamp or ISO string
-                        if isinstance(item["timestamp"], (int, float)):
-                            post_date = datetime.fromtimestamp(item["timestamp"]).date()
-                        else:
-                            post_date = datetime.fromisoformat(str(item["timestamp"]).replace("Z", "+00:00")).date()
-                    except:
-                        pass
-            elif platform.lower() == "instagram":
-                # Instagram uses timestamp in ISO format: "2024-02-13T20:49:57.000Z"
-                if "timestamp" in item:
-                    try:
-                        timestamp_str = str(item["timestamp"])
-                        # Handle ISO format with Z
-                        if "Z" in timestamp_str or "+" in timestamp_str:
-                            post_date = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00")).date()
-                        else:
-                            post_date = datetime.fromisoformat(timestamp_str).date()
-                    except Exception as e:
-                        logger.debug(f"Could not parse Instagram timestamp: {item.get('timestamp')}, error: {e}")
-                        pass
-            elif platform.lower() == "facebook":
-                # Facebook uses timestamp (Unix timestamp or ISO string) or createdAt (ISO string)
-                if "timestamp" in item:
-                    try:
-                        timestamp_value = item["timestamp"]
-                        if isinstance(timestamp_value, (int, float)):
-                            # Unix timestamp
-                            post_date = datetime.fromtimestamp(timestamp_value).date()
-                        elif isinstance(timestamp_value, str):
-                            # ISO format string
-                            post_date = datetime.fromisoformat(timestamp_value.replace("Z", "+00:00")).date()
-                    except Exception as e:
-                        logger.debug(f"Could not parse Facebook timestamp: {item.get('timestamp')}, error: {e}")
-                        pass
-                elif "createdAt" in item:
-                    try:
-                        # Facebook createdAt is usually ISO format
-                        post_date = datetime.fromisoformat(str(item["createdAt"]).replace("Z", "+00:00")).date()
-                    except Exception as e:
-                        logger.debug(f"Could not parse Facebook createdAt: {item.get('createdAt')}, error: {e}")
-                        pass
+            seen += 1
+            post_date = _post_date(item, date_fields)
             
             # If we couldn't extract date, include the post (better to include than exclude)
-            if not post_date:
+            if post_date is None:
                 logger.warning(f"Could not extract date from {platform} post, including it: {item.get('id', item.get('shortCode', 'unknown'))}")
                 filtered_items.append(item)
                 continue
             
             # Check if post is within date range
-            if date_from and post_date < date_from:
-                logger.debug(f"Excluding {platform} post from {post_date} (before {date_from})")
-                continue
-            if date_to and post_date > date_to:
-                logger.debug(f"Excluding {platform} post from {post_date} (after {date_to})")
-                continue
-            
-            filtered_items.append(item)
-            logger.debug(f"Including {platform} post from {post_date}")
+            if lo <= post_date.toordinal() <= hi:
+                filtered_items.append(item)
+            else:
+                logger.debug("Excluding %s post from %s (range %s - %s)", platform, post_date, date_from, date_to)
         
-        logger.info(f"Date filter for {platform}: {len(items)} -> {len(filtered_items)} posts")
+        logger.info(f"Date filter for {platform}: {seen} -> {len(filtered_items)} posts")
         return filtered_items
     
     def scrape_posts(
@@ -367,14 +706,18 @@ class ApifyScraper:
         platform: str,
         username: str,
         limit: Optional[int] = None,
-        profile_id: Optional[int] = None
+        profile_id: Optional[int] = None,
+        profile: Optional[Dict[str, Any]] = None,
+        fcfg: Optional[FilterConfig] = None
     ) -> List[Dict[str, Any]]:
         """
         Scrape posts for a given platform and username.
         Si profile_id está definido, usa la API key asociada a ese perfil (Facebook 1/2, Instagram, TikTok).
+        Con profile (fila ya leída del perfil) no se vuelve a consultar la BD para elegir la API key.
+        fcfg: filtro de fechas (FilterConfig.load() si no se pasa).
         Returns list of post dictionaries.
         """
-        token = get_apify_token_for_profile(profile_id=profile_id) if profile_id else None
+        token = get_apify_token_for_profile(profile_id=profile_id, profile=profile) if profile_id or profile else None
         if not token and not self._ensure_client():
             return []
         if token:
@@ -383,17 +726,18 @@ class ApifyScraper:
         if not actor_id:
             raise ValueError(f"No actor configured for {platform} posts")
         
+        platform_key = platform.lower()
         limit = limit or get_default_limit_posts()
         limit = max(1, min(500, int(limit)))  # Límite configurado (techo general)
         
         # Prioridad a fechas: si hay rango fecha inicio/fin, el actor debe devolver solo posts en ese rango.
         # No forzamos el límite (ej. 100); si en el rango hay 45, queremos 45, no 100.
-        from config import get_last_days, get_date_from, get_date_to
-        last_days = get_last_days()
-        date_from_str = get_date_from()
-        date_to_str = get_date_to()
-        use_specific_dates = bool(date_from_str or date_to_str)
-        has_date_filter = use_specific_dates or (last_days and last_days > 0)
+        if fcfg is None:
+            fcfg = FilterConfig.load()
+        date_from_str, date_to_str = fcfg.date_from_str, fcfg.date_to_str
+        use_specific_dates = fcfg.use_specific_dates
+        has_date_filter = fcfg.active
+        range_from, range_to = fcfg.date_range()
         if has_date_filter:
             # Techo alto para que el actor devuelva todos los que caigan en el rango (el actor filtra por fecha)
             effective_limit = 500
@@ -405,7 +749,7 @@ class ApifyScraper:
         input_data = {}
         
         # Platform-specific input adjustments
-        if platform.lower() == "instagram":
+        if platform_key == "instagram":
             # Instagram scraper expects directUrls (array of URL strings, not objects)
             # Based on actor logs showing "0 direct URL(s)" when using startUrls
             profile_url = f"https://www.instagram.com/{username}/"
@@ -419,14 +763,12 @@ class ApifyScraper:
             if use_specific_dates and date_from_str:
                 input_data["onlyPostsNewerThan"] = date_from_str
                 logger.info(f"Instagram: Applying date filter to actor - onlyPostsNewerThan: {date_from_str}")
-            elif last_days and last_days > 0:
-                today = datetime.now().date()
-                date_from = today - timedelta(days=last_days)
-                input_data["onlyPostsNewerThan"] = date_from.strftime("%Y-%m-%d")
-                logger.info(f"Instagram: Applying date filter to actor - onlyPostsNewerThan: {date_from} (last {last_days} days, excl. today)")
+            elif fcfg.last_days > 0:
+                input_data["onlyPostsNewerThan"] = range_from.strftime("%Y-%m-%d")
+                logger.info(f"Instagram: Applying date filter to actor - onlyPostsNewerThan: {range_from} (last {fcfg.last_days} days, excl. today)")
             
             logger.info(f"Instagram: Using directUrls format with profile URL: {profile_url}, limit: {effective_limit}")
-        elif platform.lower() == "tiktok":
+        elif platform_key == "tiktok":
             # TikTok actor requires profiles array format
             # Enable comment scraping by setting commentsPerPost
             comments_limit = get_default_limit_comments()
@@ -460,7 +802,6 @@ class ApifyScraper:
             
             # Aplicar filtros de fecha al actor (fechas específicas tienen prioridad sobre últimos N días)
             if has_date_filter:
-                today = datetime.now().date()
                 if use_specific_dates:
                     if date_from_str:
                         input_data["oldestPostDateUnified"] = date_from_str
@@ -468,18 +809,17 @@ class ApifyScraper:
                         input_data["newestPostDate"] = date_to_str
                     logger.info(f"TikTok: Applying date filter to actor - from {date_from_str} to {date_to_str}")
                 else:
-                    actor_date_from = (today - timedelta(days=last_days)).strftime("%Y-%m-%d")
-                    actor_date_to = (today - timedelta(days=1)).strftime("%Y-%m-%d")
+                    actor_date_from = range_from.strftime("%Y-%m-%d")
+                    actor_date_to = range_to.strftime("%Y-%m-%d")
                     input_data["oldestPostDateUnified"] = actor_date_from
                     input_data["newestPostDate"] = actor_date_to
                     logger.info(f"TikTok: Applying date filter to actor - from {actor_date_from} to {actor_date_to} (excl. today)")
             
             logger.info(f"TikTok: Using actor clockworks/tiktok-scraper with profile: @{username}, resultsPerPage: {effective_limit}, commentsPerPost: {comments_limit}")
-        elif platform.lower() == "facebook":
+        elif platform_key == "facebook":
             # Facebook actor requires startUrls array with resultsLimit
             # Soporta filtro de fechas: onlyPostsNewerThan (YYYY-MM-DD) y onlyPostsOlderThan (YYYY-MM-DD)
             profile_url = f"https://facebook.com/{username}"
-            today = datetime.now().date()
             input_data = {
                 "startUrls": [{"url": profile_url}],
                 "resultsLimit": effective_limit
@@ -492,10 +832,8 @@ class ApifyScraper:
                         input_data["onlyPostsOlderThan"] = date_to_str
                     logger.info(f"Facebook: filtro de fechas en actor - desde {date_from_str or 'n/a'} hasta {date_to_str or 'n/a'}")
                 else:
-                    date_from = today - timedelta(days=last_days)
-                    date_to = today - timedelta(days=1)
-                    input_data["onlyPostsNewerThan"] = date_from.strftime("%Y-%m-%d")
-                    input_data["onlyPostsOlderThan"] = date_to.strftime("%Y-%m-%d")
+                    input_data["onlyPostsNewerThan"] = range_from.strftime("%Y-%m-%d")
+                    input_data["onlyPostsOlderThan"] = range_to.strftime("%Y-%m-%d")
                     logger.info(f"Facebook: filtro de fechas en actor - desde {input_data['onlyPostsNewerThan']} hasta {input_data['onlyPostsOlderThan']} (excl. hoy)")
         else:
             input_data = {"usernames": [username], "resultsLimit": effective_limit}
@@ -507,17 +845,17 @@ class ApifyScraper:
         try:
             run = self._run_actor(actor_id, input_data, token=token)
             client = self._client_for_token(token)
-            items = self._get_actor_dataset(run, client)
-            count_total = len(items)
-            logger.info(f"Retrieved {count_total} posts from actor")
+            items = self._iter_actor_dataset(run, client, _POST_ITEM_FIELDS)
+            if not has_date_filter:
+                items = list(items)
+                logger.info(f"Retrieved {len(items)} posts from actor")
+                return items
             
-            # Con filtro de fechas: devolver solo los que caen en el rango (ej. 45 en vez de 100)
-            in_range = self._filter_posts_by_date(list(items), platform)
-            if has_date_filter:
-                count_in_range = len(in_range)
-                logger.info(f"En rango de fechas: {count_in_range} de {count_total}. Se usan solo los {count_in_range} del rango.")
-                return in_range
-            return items
+            # Con filtro de fechas: se filtra mientras se leen las páginas del dataset y solo se
+            # guardan los que caen en el rango (ej. 45 en vez de 100); el total lo registra el filtro
+            in_range = self._filter_posts_by_date(items, platform, fcfg)
+            logger.info(f"En rango de fechas: {len(in_range)} posts. Se usan solo los del rango.")
+            return in_range
         except Exception as e:
             logger.error(f"Error scraping posts: {e}")
             raise
@@ -527,16 +865,18 @@ class ApifyScraper:
         platform: str,
         post_url: str,
         limit: Optional[int] = None,
-        profile_id: Optional[int] = None
+        profile_id: Optional[int] = None,
+        profile: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Scrape comments for a given post URL.
-        Si profile_id está definido, usa la API key del perfil.
+        Si profile_id está definido, usa la API key del perfil (profile evita releer su fila).
         Returns list of comment dictionaries.
         """
-        token = get_apify_token_for_profile(profile_id=profile_id) if profile_id else None
+        token = get_apify_token_for_profile(profile_id=profile_id, profile=profile) if profile_id or profile else None
         if not token and not self._ensure_client():
             return []
+        platform_key = platform.lower()
         limit = limit or get_default_limit_comments()
         limit = max(1, min(1000, int(limit)))  # Respetar siempre el límite configurado (1-1000)
         
@@ -544,7 +884,7 @@ class ApifyScraper:
         input_data = {}
         
         # Platform-specific adjustments
-        if platform.lower() == "instagram":
+        if platform_key == "instagram":
             # Use the same Instagram posts actor to scrape comments
             # The actor can scrape comments when given a post URL
             actor_id = get_actor_id(platform, "posts")  # Use posts actor, not comments actor
@@ -556,13 +896,13 @@ class ApifyScraper:
                 "resultsType": "comments",  # Scrape comments from post
                 "resultsLimit": limit
             }
-        elif platform.lower() == "tiktok":
+        elif platform_key == "tiktok":
             actor_id = get_actor_id(platform, "comments")
             if not actor_id:
                 logger.warning(f"No actor configured for {platform} comments")
                 return []
             input_data = {"urls": [post_url], "maxComments": limit}
-        elif platform.lower() == "facebook":
+        elif platform_key == "facebook":
             actor_id = get_actor_id(platform, "comments")
             if not actor_id:
                 logger.warning(f"No actor configured for {platform} comments")
@@ -587,13 +927,37 @@ class ApifyScraper:
         try:
             run = self._run_actor(actor_id, input_data, token=token)
             client = self._client_for_token(token)
-            items = self._get_actor_dataset(run, client)
+            items = self._get_actor_dataset(run, client, _COMMENT_ITEM_FIELDS)
             logger.info(f"Retrieved {len(items)} comments")
             return items
         except Exception as e:
             logger.warning(f"Error scraping comments (non-critical): {e}")
             return []  # Comments are optional, don't fail the whole process
     
+    def _extract_post_fields(self, item: Dict[str, Any], aliases: Dict[str, Tuple[str, ...]]) -> Tuple:
+        """
+        Campos de un post de Apify en el orden de POST_INSERT_COLUMNS (sin profile_id/platform):
+        (post_id, url, text, likes, comments_count, shares, views, posted_at).
+        aliases es el mapa de la plataforma (_post_field_aliases), resuelto una vez por lote.
+        Los comentarios embebidos se dejan en item["_embedded_comments"].
+        """
+        post_id = _first(item, aliases["id"]) or str(item.get("url", ""))
+        url = _first(item, aliases["url"])
+        text = clean_text(_first(item, aliases["text"]))
+        likes = int(_first(item, aliases["likes"], 0))
+        comments_count = int(_first(item, aliases["comments"], 0))
+        shares = int(_first(item, aliases["shares"], 0))
+        views = int(_first(item, aliases["views"], 0))
+        # Unix timestamp (TikTok/Facebook) o texto ISO (Instagram); decide el primer campo presente
+        posted_at = _posted_at(item, aliases["posted_at"])
+        
+        # Extract comments if they're embedded in the post data (for all platforms)
+        embedded_comments = _first(item, _EMBEDDED_COMMENT_FIELDS, [])
+        # Store embedded comments for later processing (if any)
+        if embedded_comments and isinstance(embedded_comments, list):
+            item["_embedded_comments"] = embedded_comments
+        return post_id, url, text, likes, comments_count, shares, views, posted_at
+    
     def process_post_item(
         self,
         item: Dict[str, Any],
@@ -605,237 +969,321 @@ class ApifyScraper:
         Returns the post database ID.
         """
         try:
-            # Extract post data (structure varies by platform)
-            # TikTok uses different field names
-            if platform.lower() == "tiktok":
-                post_id = (
-                    item.get("id") or 
-                    item.get("awemeId") or  # TikTok specific
-                    item.get("videoId") or  # TikTok specific
-                    str(item.get("videoWebUrl", "")) or
-                    str(item.get("url", ""))
-                )
-                url = item.get("videoWebUrl") or item.get("webVideoUrl") or item.get("url")
-                text = clean_text(item.get("text") or item.get("desc") or item.get("description"))
-                
-                # TikTok engagement metrics
-                likes = int(item.get("diggCount") or item.get("likesCount") or item.get("likes") or 0)
-                comments_count = int(item.get("commentCount") or item.get("commentsCount") or item.get("comments") or 0)
-                shares = int(item.get("shareCount") or item.get("sharesCount") or item.get("shares") or 0)
-                views = int(item.get("playCount") or item.get("viewsCount") or item.get("views") or item.get("viewCount") or 0)
-                
-                # TikTok timestamp parsing
-                posted_at = None
-                if "createTime" in item:
-                    try:
-                        # TikTok uses Unix timestamp in createTime
-                        posted_at = datetime.fromtimestamp(item["createTime"])
-                    except:
-                        pass
-                elif "createTimeISO" in item:
-                    try:
-                        posted_at = datetime.fromisoformat(str(item["createTimeISO"]).replace("Z", "+00:00"))
-                    except:
-                        pass
-                elif "timestamp" in item:
-                    try:
-                        posted_at = datetime.fromtimestamp(item["timestamp"])
-                    except:
-                        pass
-            else:
-                # Instagram, Facebook, etc.
-                post_id = item.get("id") or item.get("postId") or item.get("shortCode") or str(item.get("url", ""))
-                url = item.get("url") or item.get("postUrl") or item.get("webVideoUrl")
-                text = clean_text(item.get("text") or item.get("caption") or item.get("description"))
-                
-                # Extract engagement metrics
-                likes = int(item.get("likesCount") or item.get("likes") or item.get("diggCount") or item.get("reactionsCount") or 0)
-                comments_count = int(item.get("commentsCount") or item.get("comments") or item.get("commentCount") or 0)
-                shares = int(item.get("sharesCount") or item.get("shares") or item.get("shareCount") or 0)
-                views = int(item.get("viewsCount") or item.get("views") or item.get("playCount") or item.get("viewCount") or 0)
-                
-                # Parse posted_at timestamp
-                posted_at = None
-                if "timestamp" in item:
-                    try:
-                        timestamp_value = item["timestamp"]
-                        # Instagram uses ISO format strings, TikTok/Facebook may use Unix timestamps
-                        if isinstance(timestamp_value, str):
-                            # ISO format string (Instagram)
-                            posted_at = datetime.fromisoformat(timestamp_value.replace("Z", "+00:00"))
-                        elif isinstance(timestamp_value, (int, float)):
-                            # Unix timestamp (TikTok/Facebook)
-                            posted_at = datetime.fromtimestamp(timestamp_value)
-                    except Exception as e:
-                        logger.debug(f"Could not parse timestamp: {e}")
-                        pass
-                elif "createdAt" in item:
-                    try:
-                        posted_at = datetime.fromisoformat(str(item["createdAt"]).replace("Z", "+00:00"))
-                    except:
-                        pass
-            
-            # Extract comments if they're embedded in the post data (for all platforms)
-            embedded_comments = item.get("comments") or item.get("commentsData") or item.get("topComments") or []
-            
-            post_db_id = insert_post(
-                profile_id=profile_id,
-                platform=platform,
-                post_id=post_id,
-                url=url,
-                text=text,
-                likes=likes,
-                comments_count=comments_count,
-                shares=shares,
-                views=views,
-                posted_at=posted_at
-            )
-            
-            # Store embedded comments for later processing (if any)
-            if embedded_comments and isinstance(embedded_comments, list):
-                item["_embedded_comments"] = embedded_comments
-            
-            logger.debug(f"Processed {platform} post: {post_id[:50]}... (likes: {likes}, comments: {comments_count})")
+            fields = self._extract_post_fields(item, _post_field_aliases(platform))
+            post_db_id = insert_post(profile_id, platform, *fields)
+            logger.debug(f"Processed {platform} post: {fields[0][:50]}... (likes: {fields[3]}, comments: {fields[4]})")
             return post_db_id
         except Exception as e:
             logger.error(f"Error processing {platform} post item: {e}")
             logger.error(f"Item keys: {list(item.keys()) if isinstance(item, dict) else 'not a dict'}")
             return None
     
+    def process_post_items(
+        self,
+        items: List[Dict[str, Any]],
+        platform: str,
+        profile_id: int
+    ) -> List[Optional[int]]:
+        """
+        Procesa todos los posts de un scraping con insert_posts_bulk (una transacción).
+        Devuelve los IDs en el orden de items (None en los que no se pudieron procesar).
+        """
+        aliases = _post_field_aliases(platform)
+        rows: List[Optional[Tuple]] = []
+        for item in items:
+            try:
+                rows.append((profile_id, platform) + self._extract_post_fields(item, aliases))
+            except Exception as e:
+                logger.error(f"Error processing {platform} post item: {e}")
+                logger.error(f"Item keys: {list(item.keys()) if isinstance(item, dict) else 'not a dict'}")
+                rows.append(None)
+        valid = [row for row in rows if row is not None]
+        try:
+            ids = iter(insert_posts_bulk(valid))
+        except Exception as e:
+            # Si falla el lote, post a post para no perder los válidos
+            logger.warning(f"Bulk post insert failed ({e}); falling back to row-by-row")
+            return [
+                self.process_post_item(item, platform, profile_id) if row is not None else None
+                for item, row in zip(items, rows)
+            ]
+        return [next(ids) if row is not None else None for row in rows]
+    
+    def _is_tiktok_post(self, post_db_id: int) -> bool:
+        post_info = get_post_profile_and_platform(post_db_id)
+        return bool(post_info and post_info[1] == "tiktok")
+
     def process_comment_item(
         self,
         item: Dict[str, Any],
         post_db_id: int
     ) -> None:
-        """Process a single comment item and insert into database with sentiment."""
-        try:
-            # Extract text first (needed for fallback comment_id)
-            text = clean_text(
-                item.get("text") or 
-                item.get("comment") or 
-                item.get("content")
-            )
-            author = (
-                item.get("ownerUsername") or
-                item.get("author") or
-                item.get("username") or
-                item.get("uniqueId") or  # TikTok uses "uniqueId"
-                item.get("authorMeta", {}).get("name")  # TikTok nested format
-            )
-            # TikTok: siempre usar hash(post + texto + autor) como comment_id para evitar duplicados
-            # (el actor a veces devuelve el mismo comentario varias veces con ids distintos en la misma publicación)
-            post_info = get_post_profile_and_platform(post_db_id)
-            is_tiktok = post_info and post_info[1] == "tiktok"
-            if is_tiktok:
-                payload = f"{post_db_id}_{text or ''}_{author or ''}"
-                comment_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
-            else:
-                raw_id = item.get("id") or item.get("commentId") or item.get("cid")
-                if raw_id is not None and str(raw_id).strip():
-                    comment_id = str(raw_id).strip()
-                else:
-                    payload = f"{post_db_id}_{text or ''}_{author or ''}"
-                    comment_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
-            
-            # Extract likes (field names vary by platform)
-            likes = int(
-                item.get("likesCount") or 
-                item.get("likes") or 
-                item.get("diggCount") or  # TikTok uses "diggCount"
-                0
-            )
-            
-            # Parse posted_at timestamp (multiple formats)
-            posted_at = None
-            if "timestamp" in item:
+        """Process a single comment item (same batched path as process_comment_items)."""
+        self.process_comment_batches([([item], post_db_id)])
+    
+    def process_comment_items(
+        self,
+        items: List[Dict[str, Any]],
+        post_db_id: int,
+        platform: Optional[str] = None
+    ) -> None:
+        """Procesa los comentarios de un post en lote (ver process_comment_batches)."""
+        self.process_comment_batches([(items, post_db_id)], platform)
+    
+    def process_comment_batches(
+        self,
+        batches: List[Tuple[List[Dict[str, Any]], int]],
+        platform: Optional[str] = None
+    ) -> None:
+        """
+        Procesa comentarios de uno o varios posts [(items, post_db_id), ...] en lote: una sola
+        llamada a analyze_batch y escritura con CommentBatchWriter (una conexión y un solo COMMIT).
+        platform: plataforma de todos los posts si el llamador la conoce (evita una consulta por post).
+        """
+        all_tiktok = platform.lower() == "tiktok" if platform else None
+        extracted = []
+        for items, post_db_id in batches:
+            is_tiktok = all_tiktok if all_tiktok is not None else self._is_tiktok_post(post_db_id)
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
                 try:
-                    posted_at = datetime.fromtimestamp(item["timestamp"])
-                except:
-                    pass
-            elif "createTime" in item:
+                    extracted.append((post_db_id, _comment_fields(item, post_db_id, is_tiktok)))
+                except Exception as e:
+                    logger.error(f"Error processing comment item: {e}")
+        if not extracted:
+            return
+        
+        texts = [fields[1] or "" for _, fields in extracted]
+        try:
+            sentiments = self.analyzer.analyze_batch(texts)
+        except Exception as e:
+            # El lote abarca todo el perfil: no descartar los comentarios, analizarlos uno a uno
+            logger.error(f"Error analyzing comment batch ({e}); analyzing {len(texts)} comments one by one")
+            sentiments = self._analyze_texts_one_by_one(texts)
+        
+        rows = [
+            (post_db_id, comment_id, text, author, likes,
+             sentiment["label"], sentiment["score"], sentiment["method"], posted_at)
+            for (post_db_id, (comment_id, text, author, likes, posted_at)), sentiment
+            in zip(extracted, sentiments)
+        ]
+        try:
+            with CommentBatchWriter() as writer:
+                for row in rows:
+                    writer.add_row(row)
+        except Exception as e:
+            # Si falla el lote, fila a fila para no perder los comentarios válidos
+            logger.warning(f"Bulk comment insert failed ({e}); falling back to row-by-row")
+            for row in rows:
                 try:
-                    # TikTok uses createTime as Unix timestamp
-                    posted_at = datetime.fromtimestamp(item["createTime"])
-                except:
-                    pass
-            elif "createTimeISO" in item:
+                    insert_comment(*row)
+                except Exception as row_error:
+                    logger.error(f"Error processing comment item: {row_error}")
+    
+    def _analyze_texts_one_by_one(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Sentimiento texto a texto (si falla analyze_batch). Los que también fallan se guardan sin
+        sentimiento (NULL): los recoge después el análisis de comentarios pendientes.
+        """
+        sentiments = []
+        failed = 0
+        for text in texts:
+            try:
+                sentiments.append(self.analyzer.analyze(text))
+            except Exception:
+                failed += 1
+                sentiments.append(_NO_SENTIMENT)
+        if failed:
+            logger.error(f"Sentiment failed for {failed}/{len(texts)} comments; stored without sentiment")
+        return sentiments
+    
+    def _tiktok_dataset_comments(
+        self,
+        post_item: Dict[str, Any],
+        post_db_id: int,
+        stats: AnalyzeStats,
+        comment_batches: List[Tuple[List[Dict[str, Any]], int]],
+        dataset_cache: Dict[str, List[Dict[str, Any]]],
+        dataset_urls_used: Set[str]
+    ) -> int:
+        """
+        Comentarios de un post de TikTok sin embebidos, desde su dataset aparte (commentsDatasetUrl).
+        IMPORTANTE: El actor suele devolver la MISMA URL para todos los posts (dataset global del run).
+        Si la usáramos en cada post, asignaríamos los mismos comentarios a todos los videos (duplicados).
+        Solución: cachear por URL (dataset_cache), filtrar comentarios por video (awemeId/videoId) y solo
+        procesar los de este post. Añade el lote a comment_batches y devuelve cuántos comentarios asignó.
+        """
+        num_comments_found = 0
+        comments_dataset_url = post_item.get("commentsDatasetUrl") or post_item.get("commentsDatasetURL") or post_item.get("commentsUrl")
+        if comments_dataset_url:
+            try:
+                # Obtener id del video de este post (para filtrar comentarios)
+                post_video_id = str(
+                    post_item.get("id") or
+                    post_item.get("awemeId") or
+                    post_item.get("videoId") or
+                    ""
+                ).strip()
+                # Usar cache: la misma URL devuelve todos los comentarios del run
+                if comments_dataset_url not in dataset_cache:
+                    logger.info("Fetching TikTok comments from dataset URL (once per run)")
+                    dataset_cache[comments_dataset_url] = self._fetch_comment_dataset(comments_dataset_url)
+                all_from_url = dataset_cache.get(comments_dataset_url) or []
+                # Filtrar: solo comentarios de este video (el dataset puede mezclar todos los videos)
+                tiktok_comments = []
+                for c in all_from_url:
+                    if not isinstance(c, dict):
+                        continue
+                    c_video_id = str(
+                        c.get("awemeId") or c.get("videoId") or c.get("postId") or ""
+                    ).strip()
+                    if not c_video_id:
+                        c_url = (c.get("url") or c.get("videoUrl") or c.get("webVideoUrl") or "")
+                        if post_video_id and post_video_id in str(c_url):
+                            c_video_id = post_video_id
+                    if c_video_id and post_video_id and c_video_id == post_video_id:
+                        tiktok_comments.append(c)
+                    elif not post_video_id:
+                        tiktok_comments.append(c)
+                if tiktok_comments:
+                    num_comments_found = len(tiktok_comments)
+                    logger.info("Retrieved %d comments for this video (from dataset, filtered by video id)", num_comments_found)
+                    comment_batches.append((tiktok_comments, post_db_id))
+                    stats.comments_scraped += num_comments_found
+                    dataset_urls_used.add(comments_dataset_url)
+                elif all_from_url and not post_video_id and comments_dataset_url not in dataset_urls_used:
+                    num_comments_found = len(all_from_url)
+                    logger.info("Retrieved %d comments from TikTok dataset (no video id in post to filter; using only for this post to avoid duplicates)", num_comments_found)
+                    comment_batches.append((all_from_url, post_db_id))
+                    stats.comments_scraped += len([c for c in all_from_url if isinstance(c, dict)])
+                    dataset_urls_used.add(comments_dataset_url)
+                elif all_from_url and comments_dataset_url not in dataset_urls_used:
+                    # Fallback: el dataset no trae awemeId/videoId en comentarios, no podemos filtrar por video.
+                    # Asignamos todos al primer post que ve esta URL para no perder comentarios ni duplicar en todos.
+                    num_comments_found = len(all_from_url)
+                    logger.info("Retrieved %d comments from TikTok dataset (no video id in comments; assigning to first post only to avoid duplicates)", num_comments_found)
+                    comment_batches.append((all_from_url, post_db_id))
+                    stats.comments_scraped += len([c for c in all_from_url if isinstance(c, dict)])
+                    dataset_urls_used.add(comments_dataset_url)
+                else:
+                    if all_from_url and post_video_id and comments_dataset_url not in dataset_urls_used:
+                        logger.debug("Dataset has %d comments but none match video id %s; will use fallback on first post", len(all_from_url), post_video_id)
+                    elif comments_dataset_url in dataset_urls_used:
+                        logger.debug("Same dataset URL already used for another post; skipping to avoid duplicate comments")
+            except Exception as e:
+                logger.warning("Error fetching TikTok comments from dataset: %s", e)
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("No commentsDatasetUrl found in post item. Available keys: %s", _keys_preview(post_item, 15))
+        return num_comments_found
+    
+    # Plataformas cuyos posts pueden traer los comentarios en un dataset aparte (ver analyze_profile)
+    _DATASET_COMMENT_HANDLERS = {"tiktok": _tiktok_dataset_comments}
+    
+    def _fetch_comment_dataset(self, url: str) -> List[Dict[str, Any]]:
+        """Descarga un dataset de comentarios de TikTok (commentsDatasetUrl); [] si la respuesta no es 200."""
+        with self.http.get(url, timeout=30, stream=True) as response:
+            if response.status_code != 200:
+                logger.warning("Failed to fetch TikTok comments: HTTP %s", response.status_code)
+                return []
+            return _response_json_items(response)
+    
+    def _fetch_comment_datasets(self, urls: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Descarga a la vez (hasta APIFY_COMMENT_CONCURRENCY) los datasets de comentarios que enlazan
+        los posts de TikTok (commentsDatasetUrl). Devuelve url -> lista de ítems ([] si falla).
+        """
+        datasets = {}
+        workers = max(1, min(APIFY_COMMENT_CONCURRENCY, len(urls)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="apify-datasets") as executor:
+            futures = {executor.submit(self._fetch_comment_dataset, url): url for url in urls}
+            for future in as_completed(futures):
                 try:
-                    posted_at = datetime.fromisoformat(str(item["createTimeISO"]).replace("Z", "+00:00"))
-                except:
-                    pass
-            elif "createdAt" in item:
+                    datasets[futures[future]] = future.result()
+                except Exception as e:
+                    logger.warning(f"Error fetching TikTok comments from dataset: {e}")
+                    datasets[futures[future]] = []
+        return datasets
+    
+    def _scrape_comment_urls(
+        self,
+        platform: str,
+        comment_urls: List[Tuple[str, int]],
+        profile_id: int,
+        profile: Optional[Dict[str, Any]],
+        stats: AnalyzeStats
+    ) -> List[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Comentarios por URL de varios posts [(post_url, post_db_id), ...]: un run de Apify por post,
+        hasta APIFY_COMMENT_CONCURRENCY a la vez (los hilos solo esperan a Apify).
+        Devuelve los lotes [(comments, post_db_id), ...] para process_comment_batches; no escribe.
+        """
+        batches = []
+        def fetch(post_url: str) -> List[Dict[str, Any]]:
+            return self.scrape_comments(platform, post_url, profile_id=profile_id, profile=profile)
+        
+        workers = max(1, min(APIFY_COMMENT_CONCURRENCY, len(comment_urls)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="apify-comments") as executor:
+            futures = {executor.submit(fetch, post_url): post_db_id for post_url, post_db_id in comment_urls}
+            for future in as_completed(futures):
                 try:
-                    posted_at = datetime.fromisoformat(str(item["createdAt"]).replace("Z", "+00:00"))
-                except:
-                    pass
-            
-            # Analyze sentiment
-            analyzer = get_analyzer()
-            sentiment_result = analyzer.analyze(text) if text else {
-                "label": "NEUTRAL",
-                "score": 0.5,
-                "method": "empty"
-            }
-            
-            insert_comment(
-                post_id=post_db_id,
-                comment_id=comment_id,
-                text=text,
-                author=author,
-                likes=likes,
-                sentiment_label=sentiment_result["label"],
-                sentiment_score=sentiment_result["score"],
-                sentiment_method=sentiment_result["method"],
-                posted_at=posted_at
-            )
-        except Exception as e:
-            logger.error(f"Error processing comment item: {e}")
+                    comments = future.result()
+                    if comments and len(comments) > 0:
+                        logger.info(f"Scraped {len(comments)} additional comments from URL")
+                        stats.comments_scraped += len(comments)
+                        batches.append((comments, futures[future]))
+                except Exception as e:
+                    error_msg = str(e)
+                    # Only log as warning if it's not a critical error
+                    if "not found" not in error_msg.lower() and "actor" not in error_msg.lower():
+                        logger.warning(f"Error scraping comments: {error_msg}")
+                        stats.errors.append(error_msg)
+                    else:
+                        logger.debug(f"Comments actor not available or not found: {error_msg}")
+        return batches
     
     def analyze_profile(
         self,
         profile_id: int,
         platform: str,
         username: str,
-        force: bool = False
+        force: bool = False,
+        profile: Optional[Dict[str, Any]] = None,
+        should_skip: Optional[bool] = None,
+        fcfg: Optional[FilterConfig] = None
     ) -> Dict[str, Any]:
         """
         Analyze a complete profile: scrape posts and comments.
+        profile es la fila del perfil si el llamador ya la tiene (analyze_profiles la lee para todos
+        de una vez); si no, se lee una sola vez aquí y sirve para el auto-skip y las API keys.
+        should_skip: decisión de auto-skip ya tomada por el llamador (analyze_profiles la toma para
+        todos los perfiles de una vez); None = decidir aquí.
+        fcfg: filtro de fechas de la corrida; si no se pasa, se lee de la config una vez aquí.
         Returns summary statistics.
         """
+        if profile is None:
+            profile = get_profile_by_id(profile_id)
+        if fcfg is None:
+            fcfg = FilterConfig.load()
+        
         # Check if should skip (analyzed recently)
         # BUT: Skip auto-skip if date filters are configured (respect date filters strictly)
         # Date filters apply to ALL platforms now
-        from config import get_last_days, get_date_from, get_date_to
-        last_days = get_last_days()
-        date_from = get_date_from()
-        date_to = get_date_to()
-        has_date_filters = (last_days and last_days > 0) or date_from or date_to
-        
-        if not force and get_auto_skip_recent() and not has_date_filters:
-            # Only apply auto-skip if no date filters are configured
-            from db_utils import get_connection
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT last_analyzed FROM profiles WHERE id = ?",
-                (profile_id,)
-            )
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row and row[0]:
-                try:
-                    last_analyzed = datetime.fromisoformat(row[0])
-                    days_since = (datetime.now() - last_analyzed).days
-                    if days_since < 7:
-                        logger.info(f"Skipping {username} (analyzed {last_analyzed}, {days_since} days ago)")
-                        return {"skipped": True, "reason": "analyzed_recently"}
-                    else:
-                        logger.info(f"Will analyze {username} (last analyzed {days_since} days ago, > 7 days)")
-                except:
-                    pass
-        elif has_date_filters:
-            logger.info(f"Date filters configured for {platform}, ignoring auto-skip and analyzing according to date filters")
+        if should_skip is None:
+            has_date_filters = fcfg.active
+            should_skip = False
+            if not force and get_auto_skip_recent() and not has_date_filters:
+                # Only apply auto-skip if no date filters are configured
+                days_since = _days_since_analyzed(profile.get("last_analyzed") if profile else None)
+                if days_since is not None:
+                    should_skip = days_since < AUTO_SKIP_DAYS
+                    if not should_skip:
+                        logger.info(f"Will analyze {username} (last analyzed {days_since} days ago, > {AUTO_SKIP_DAYS} days)")
+            elif has_date_filters:
+                logger.info(f"Date filters configured for {platform}, ignoring auto-skip and analyzing according to date filters")
+        if should_skip:
+            logger.info(f"Skipping {username} (analyzed {profile.get('last_analyzed')}, less than {AUTO_SKIP_DAYS} days ago)")
+            return {"skipped": True, "reason": "analyzed_recently"}
         
         logger.info(f"Starting analysis for {platform} profile: {username}")
         # Log límites en uso (para verificar que se respeta la config)
@@ -843,16 +1291,12 @@ class ApifyScraper:
         limit_comments_cfg = get_default_limit_comments()
         logger.info(f"Límites en uso: max posts={limit_posts_cfg}, max comentarios por post={limit_comments_cfg}")
         
-        stats = {
-            "posts_scraped": 0,
-            "comments_scraped": 0,
-            "errors": []
-        }
+        stats = AnalyzeStats()
         
         try:
             # Scrape posts (usa la API key del perfil si está configurada)
-            posts = self.scrape_posts(platform, username, profile_id=profile_id)
-            stats["posts_scraped"] = len(posts)
+            posts = self.scrape_posts(platform, username, profile_id=profile_id, profile=profile, fcfg=fcfg)
+            stats.posts_scraped = len(posts)
             logger.info(f"Retrieved {len(posts)} posts from {platform}, processing...")
             
             # TikTok: el actor a veces devuelve la MISMA URL de dataset para todos los posts (dataset global del run).
@@ -861,192 +1305,175 @@ class ApifyScraper:
             tiktok_dataset_url_used = set()
             tiktok_dataset_cache = {}  # url -> list of comment items (para filtrar por video si aplica)
             
+            platform_key = platform.lower()
+            dataset_handler = self._DATASET_COMMENT_HANDLERS.get(platform_key)
+            
+            # Posts que ya tenían comentarios de un análisis anterior: no se relanza el actor de
+            # comentarios por URL (un run de Apify por post); con force sí
+            commented_post_ids = set() if force else get_commented_post_ids(profile_id)
+            comment_runs_avoided = 0  # runs por URL evitados (embebidos completos o ya guardados)
+            comment_urls = []  # (post_url, post_db_id) cuyos comentarios hay que pedir al actor
+            
             # Process each post
             posts_processed = 0
-            for idx, post_item in enumerate(posts):
-                logger.debug(f"Processing {platform} post {idx+1}/{len(posts)}")
-                post_db_id = self.process_post_item(post_item, platform, profile_id)
+            post_db_ids = self.process_post_items(posts, platform, profile_id)
+            if platform_key == "tiktok":
+                # Datasets de comentarios distintos de los posts sin comentarios embebidos: se descargan
+                # todos a la vez antes del bucle de posts (normalmente es uno solo para todo el run)
+                dataset_urls = {
+                    item.get("commentsDatasetUrl") or item.get("commentsDatasetURL") or item.get("commentsUrl")
+                    for item in posts
+                    if isinstance(item, dict) and not _post_comment_list(item)
+                }
+                dataset_urls.discard(None)
+                if dataset_urls:
+                    logger.info(f"Fetching {len(dataset_urls)} TikTok comment dataset(s) (once per run)")
+                    tiktok_dataset_cache.update(self._fetch_comment_datasets(sorted(dataset_urls)))
+            # Comentarios del perfil (embebidos, del dataset de TikTok y de los runs por URL): se acumulan
+            # y se escriben al final con un solo analyze_batch y una sola transacción, ya sin esperas
+            # de red pendientes (CommentBatchWriter vuelca cada flush_size filas para acotar memoria).
+            comment_batches = []
+            for idx, (post_item, post_db_id) in enumerate(zip(posts, post_db_ids)):
+                logger.debug("Processing %s post %d/%d", platform, idx + 1, len(posts))
                 if post_db_id:
                     posts_processed += 1
                 else:
-                    logger.warning(f"Failed to process {platform} post {idx+1}: {list(post_item.keys())[:5] if isinstance(post_item, dict) else 'not a dict'}")
+                    logger.warning("Failed to process %s post %d: %s", platform, idx + 1, _keys_preview(post_item, 5))
                 
                 if post_db_id:
                     # Try to get comments from post item first (some actors include comments in post data)
                     # Note: "comments" field might be an integer (count) or a list (actual comments)
-                    comments_from_post = None
-                    comments_list = []
-                    
-                    # Log post item keys for debugging
-                    logger.debug(f"TikTok post item keys: {list(post_item.keys())[:10]}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Post item keys: %s", _keys_preview(post_item))
+                    comments_list = _post_comment_list(post_item)
+                    num_comments_found = len(comments_list)
                     
-                    # Check for embedded comments in various fields
-                    for field in ["_embedded_comments", "commentsData", "topComments", "commentsList"]:
-                        if field in post_item:
-                            if isinstance(post_item[field], list):
-                                comments_list = post_item[field]
-                                comments_from_post = comments_list
-                                logger.info(f"Found {len(comments_list)} comments in field '{field}'")
-                                break
-                            else:
-                                logger.debug(f"Field '{field}' exists but is not a list: {type(post_item[field])}")
-                    
-                    # Also check "comments" field, but be careful - it might be a count
-                    if not comments_list and "comments" in post_item:
-                        if isinstance(post_item["comments"], list):
-                            comments_list = post_item["comments"]
-                            comments_from_post = comments_list
-                            logger.info(f"Found {len(comments_list)} comments in 'comments' field")
-                        else:
-                            logger.debug(f"'comments' field is not a list (type: {type(post_item['comments'])}, value: {post_item['comments']})")
-                    
-                    if comments_list and len(comments_list) > 0:
+                    if num_comments_found:
                         # Process comments that came with the post
-                        logger.info(f"Processing {len(comments_list)} embedded comments from post data")
-                        for comment_item in comments_list:
-                            self.process_comment_item(comment_item, post_db_id)
-                        stats["comments_scraped"] += len(comments_list)
+                        logger.info("Processing %d embedded comments from post data", num_comments_found)
+                        comment_batches.append((comments_list, post_db_id))
+                        stats.comments_scraped += num_comments_found
                     
-                    # For TikTok: Check if comments are in a separate dataset URL.
-                    # IMPORTANTE: El actor suele devolver la MISMA URL para todos los posts (dataset global del run).
-                    # Si la usáramos en cada post, asignaríamos los mismos comentarios a todos los videos (duplicados).
-                    # Solución: cachear por URL, filtrar comentarios por video (awemeId/videoId) y solo procesar los de este post.
-                    if platform.lower() == "tiktok" and not comments_list:
-                        comments_dataset_url = post_item.get("commentsDatasetUrl") or post_item.get("commentsDatasetURL") or post_item.get("commentsUrl")
-                        if comments_dataset_url:
-                            try:
-                                # Obtener id del video de este post (para filtrar comentarios)
-                                post_video_id = str(
-                                    post_item.get("id") or
-                                    post_item.get("awemeId") or
-                                    post_item.get("videoId") or
-                                    ""
-                                ).strip()
-                                # Usar cache: la misma URL devuelve todos los comentarios del run
-                                if comments_dataset_url not in tiktok_dataset_cache:
-                                    logger.info(f"Fetching TikTok comments from dataset URL (once per run)")
-                                    response = requests.get(comments_dataset_url, timeout=30)
-                                    if response.status_code == 200:
-                                        all_comments = response.json()
-                                        tiktok_dataset_cache[comments_dataset_url] = all_comments if isinstance(all_comments, list) else []
-                                    else:
-                                        logger.warning(f"Failed to fetch TikTok comments: HTTP {response.status_code}")
-                                        tiktok_dataset_cache[comments_dataset_url] = []
-                                all_from_url = tiktok_dataset_cache.get(comments_dataset_url) or []
-                                # Filtrar: solo comentarios de este video (el dataset puede mezclar todos los videos)
-                                tiktok_comments = []
-                                for c in all_from_url:
-                                    if not isinstance(c, dict):
-                                        continue
-                                    c_video_id = str(
-                                        c.get("awemeId") or c.get("videoId") or c.get("postId") or ""
-                                    ).strip()
-                                    if not c_video_id:
-                                        c_url = (c.get("url") or c.get("videoUrl") or c.get("webVideoUrl") or "")
-                                        if post_video_id and post_video_id in str(c_url):
-                                            c_video_id = post_video_id
-                                    if c_video_id and post_video_id and c_video_id == post_video_id:
-                                        tiktok_comments.append(c)
-                                    elif not post_video_id:
-                                        tiktok_comments.append(c)
-                                if tiktok_comments:
-                                    logger.info(f"Retrieved {len(tiktok_comments)} comments for this video (from dataset, filtered by video id)")
-                                    for comment_item in tiktok_comments:
-                                        self.process_comment_item(comment_item, post_db_id)
-                                    stats["comments_scraped"] += len(tiktok_comments)
-                                    comments_list = tiktok_comments
-                                    tiktok_dataset_url_used.add(comments_dataset_url)
-                                elif all_from_url and not post_video_id and comments_dataset_url not in tiktok_dataset_url_used:
-                                    logger.info(f"Retrieved {len(all_from_url)} comments from TikTok dataset (no video id in post to filter; using only for this post to avoid duplicates)")
-                                    for comment_item in all_from_url:
-                                        if isinstance(comment_item, dict):
-                                            self.process_comment_item(comment_item, post_db_id)
-                                    stats["comments_scraped"] += len([c for c in all_from_url if isinstance(c, dict)])
-                                    comments_list = all_from_url
-                                    tiktok_dataset_url_used.add(comments_dataset_url)
-                                elif all_from_url and comments_dataset_url not in tiktok_dataset_url_used:
-                                    # Fallback: el dataset no trae awemeId/videoId en comentarios, no podemos filtrar por video.
-                                    # Asignamos todos al primer post que ve esta URL para no perder comentarios ni duplicar en todos.
-                                    logger.info(f"Retrieved {len(all_from_url)} comments from TikTok dataset (no video id in comments; assigning to first post only to avoid duplicates)")
-                                    for comment_item in all_from_url:
-                                        if isinstance(comment_item, dict):
-                                            self.process_comment_item(comment_item, post_db_id)
-                                    stats["comments_scraped"] += len([c for c in all_from_url if isinstance(c, dict)])
-                                    comments_list = all_from_url
-                                    tiktok_dataset_url_used.add(comments_dataset_url)
-                                else:
-                                    if all_from_url and post_video_id and comments_dataset_url not in tiktok_dataset_url_used:
-                                        logger.debug(f"Dataset has {len(all_from_url)} comments but none match video id {post_video_id}; will use fallback on first post")
-                                    elif comments_dataset_url in tiktok_dataset_url_used:
-                                        logger.debug(f"Same dataset URL already used for another post; skipping to avoid duplicate comments")
-                            except Exception as e:
-                                logger.warning(f"Error fetching TikTok comments from dataset: {e}")
-                        else:
-                            logger.debug(f"No commentsDatasetUrl found in post item. Available keys: {list(post_item.keys())[:15]}")
+                    # Comentarios en un dataset aparte (TikTok) cuando no vienen embebidos
+                    if dataset_handler is not None and not num_comments_found:
+                        num_comments_found = dataset_handler(
+                            self, post_item, post_db_id, stats, comment_batches,
+                            tiktok_dataset_cache, tiktok_dataset_url_used
+                        )
                     
                     # Pedir comentarios por URL solo cuando no vienen embebidos (o en Facebook).
                     # En Facebook cada post = 1 run Apify; limitar a los primeros 20 posts para ahorrar cuota.
-                    num_comments_found = len(comments_list) if comments_list else 0
                     post_url = post_item.get("url") or post_item.get("postUrl") or post_item.get("link")
-                    should_fetch = (num_comments_found < 5) or (platform.lower() == "facebook")
-                    if platform.lower() == "facebook" and idx >= 20:
+                    should_fetch = (num_comments_found < MIN_COMMENTS_BEFORE_REFETCH) or (platform_key == "facebook")
+                    if platform_key == "facebook" and idx >= 20:
+                        should_fetch = False
+                        logger.debug("Facebook: omitiendo comentarios por URL para post %d (solo primeros 20)", idx + 1)
+                    # Los embebidos ya lo cubren todo si llegan al total que declara el post (0 incluido)
+                    # o al límite configurado: otro run por URL no traería nada nuevo
+                    reported = _reported_comment_count(post_item)
+                    wanted = limit_comments_cfg if reported is None else min(reported, limit_comments_cfg)
+                    if post_url and should_fetch and num_comments_found >= wanted:
+                        should_fetch = False
+                        comment_runs_avoided += 1
+                        logger.debug("Post %d: %d comentarios embebidos de %s; no se lanza el actor de comentarios", idx + 1, num_comments_found, reported)
+                    if post_url and should_fetch and post_db_id in commented_post_ids:
                         should_fetch = False
-                        logger.debug(f"Facebook: omitiendo comentarios por URL para post {idx+1} (solo primeros 20)")
+                        comment_runs_avoided += 1
+                        logger.debug("Post %d ya tiene comentarios guardados; no se relanza el actor de comentarios", idx + 1)
                     if post_url and should_fetch:
-                        try:
-                            comments = self.scrape_comments(platform, post_url, profile_id=profile_id)
-                            if comments and len(comments) > 0:
-                                logger.info(f"Scraped {len(comments)} additional comments from URL")
-                                stats["comments_scraped"] += len(comments)
-                                # Process each comment
-                                for comment_item in comments:
-                                    self.process_comment_item(comment_item, post_db_id)
-                        except Exception as e:
-                            error_msg = str(e)
-                            # Only log as warning if it's not a critical error
-                            if "not found" not in error_msg.lower() and "actor" not in error_msg.lower():
-                                logger.warning(f"Error scraping comments: {error_msg}")
-                                stats["errors"].append(error_msg)
-                            else:
-                                logger.debug(f"Comments actor not available or not found: {error_msg}")
+                        comment_urls.append((post_url, post_db_id))
+            
+            if comment_urls:
+                comment_batches += self._scrape_comment_urls(platform, comment_urls, profile_id, profile, stats)
+            if comment_batches:
+                self.process_comment_batches(comment_batches, platform_key)
+            if comment_runs_avoided:
+                logger.info(f"Runs del actor de comentarios evitados: {comment_runs_avoided} (embebidos completos o ya guardados)")
             
             # Update last_analyzed timestamp
             update_profile_last_analyzed(profile_id)
             
             logger.info(f"Analysis complete for {platform} profile {username}: {stats}")
-            logger.info(f"Posts processed successfully: {posts_processed}/{stats['posts_scraped']}")
-            return stats
+            logger.info(f"Posts processed successfully: {posts_processed}/{stats.posts_scraped}")
+            return asdict(stats)
             
         except Exception as e:
             error_msg = f"Error analyzing profile {username}: {e}"
             logger.error(error_msg)
-            stats["errors"].append(error_msg)
-            return stats
+            stats.errors.append(error_msg)
+            return asdict(stats)
 
 
-def analyze_profiles(profile_ids: Optional[List[int]] = None, force: bool = False) -> Dict[str, Any]:
+def analyze_profiles(
+    profile_ids: Optional[List[int]] = None,
+    force: bool = False,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
     """
     Analyze multiple profiles.
     If profile_ids is None, analyzes all profiles.
+    on_progress(done, total) se llama tras cada perfil (p.ej. para una barra de progreso).
+    Hasta APIFY_MAX_CONCURRENT_RUNS perfiles a la vez, cada uno en su hilo con su propio
+    ApifyScraper; on_progress se llama siempre desde el hilo que invoca analyze_profiles.
+    El auto-skip se decide para todos los perfiles de una vez (con last_analyzed de get_all_profiles)
+    y los que sí se analizan van de más antiguo a más reciente (nunca analizados primero).
     """
-    scraper = ApifyScraper()
     profiles = get_all_profiles()
     
     if profile_ids:
         profiles = [p for p in profiles if p["id"] in profile_ids]
+    total = len(profiles)
     
-    results = {}
+    fcfg = FilterConfig.load()
+    days_since = {p["id"]: _days_since_analyzed(p.get("last_analyzed")) for p in profiles}
+    finished = {}
+    if not force and get_auto_skip_recent() and not fcfg.active:
+        for profile in profiles:
+            days = days_since[profile["id"]]
+            if days is not None and days < AUTO_SKIP_DAYS:
+                logger.info(f"Skipping {profile['username_or_url']} (analyzed {days} days ago)")
+                finished[profile["id"]] = {"skipped": True, "reason": "analyzed_recently"}
+    pending = sorted(
+        (p for p in profiles if p["id"] not in finished),
+        key=lambda p: (days_since[p["id"]] is not None, -(days_since[p["id"]] or 0))
+    )
+    done = len(finished)
+    if on_progress and done:
+        on_progress(done, total)
     
-    for profile in profiles:
+    def analyze_one(scraper: ApifyScraper, profile: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            result = scraper.analyze_profile(
+            return scraper.analyze_profile(
                 profile_id=profile["id"],
                 platform=profile["platform"],
                 username=profile["username_or_url"],
-                force=force
+                force=force,
+                profile=profile,
+                should_skip=False,
+                fcfg=fcfg
             )
-            results[profile["id"]] = result
         except Exception as e:
-            results[profile["id"]] = {"error": str(e)}
+            return {"error": str(e)}
     
-    return results
+    workers = min(APIFY_MAX_CONCURRENT_RUNS, len(pending))
+    if workers <= 1:
+        scraper = ApifyScraper() if pending else None
+        for profile in pending:
+            finished[profile["id"]] = analyze_one(scraper, profile)
+            done += 1
+            if on_progress:
+                on_progress(done, total)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="apify") as executor:
+            futures = {
+                executor.submit(analyze_one, ApifyScraper(), profile): profile["id"]
+                for profile in pending
+            }
+            for future in as_completed(futures):
+                finished[futures[future]] = future.result()
+                done += 1
+                if on_progress:
+                    on_progress(done, total)
+    clean_text.cache_clear()
+    # Mismo orden que la lista de perfiles (como en el recorrido secuencial)
+    return {profile["id"]: finished[profile["id"]] for profile in profiles}
@@ -0,0 +1,32 @@
+"""Shared fixtures: every test gets its own SQLite database and freshly imported modules."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Modules that read DB_PATH or cache config at import time
+_APP_MODULES = ("analyzer", "api", "config", "db_utils", "scraper")
+
+
+def _drop_app_modules():
+    for name in _APP_MODULES:
+        sys.modules.pop(name, None)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Empty database path; the app modules are imported fresh against it."""
+    path = tmp_path / "test.db"
+    monkeypatch.setenv("DB_PATH", str(path))
+    _drop_app_modules()
+    yield path
+    _drop_app_modules()
+
+
+@pytest.fixture
+def config(db_path):
+    import config
+    config.ensure_database_initialized()
+    return config
@@ -0,0 +1,141 @@
+"""SentimentAnalyzer batching around a fake model (torch/transformers are optional)."""
+import threading
+import time
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+import pytest
+
+
+class _Tensor(list):
+    def to(self, device):
+        return self
+
+    def tolist(self):
+        return list(self)
+
+
+class _Batch(dict):
+    def to(self, device):
+        return self
+
+
+class _Probs:
+    def __init__(self, n):
+        self.n = n
+
+    def float(self):
+        return self
+
+    def softmax(self, dim):
+        return self
+
+    def max(self, dim):
+        return _Tensor([0.8] * self.n), _Tensor([1] * self.n)
+
+
+class _FakeTokenizer:
+    """Like the Rust fast tokenizer: concurrent calls fail with "Already borrowed"."""
+
+    def __init__(self):
+        self.busy = False
+        self.calls = 0
+
+    def __call__(self, texts, **kwargs):
+        if self.busy:
+            raise RuntimeError("Already borrowed")
+        self.busy = True
+        try:
+            time.sleep(0.002)
+            self.calls += 1
+            return _Batch(input_ids=_Tensor(texts))
+        finally:
+            self.busy = False
+
+
+class _FakeModel:
+    config = SimpleNamespace(id2label={0: "NEGATIVE", 1: "POSITIVE"})
+
+    def __call__(self, input_ids):
+        return SimpleNamespace(logits=_Probs(len(input_ids)))
+
+
+@pytest.fixture
+def analyzer(config, monkeypatch):
+    import analyzer as analyzer_module
+    monkeypatch.setattr(analyzer_module, "torch", SimpleNamespace(inference_mode=nullcontext), raising=False)
+    instance = analyzer_module.SentimentAnalyzer()
+    instance.pipeline = SimpleNamespace(tokenizer=_FakeTokenizer(), model=_FakeModel(), device="cpu")
+    instance._model_loaded = True
+    return instance
+
+
+def test_analyze_batch_is_thread_safe(analyzer):
+    errors = []
+
+    def worker(n):
+        for batch in range(20):
+            texts = [f"texto neutro numero {n} {batch} {i}" for i in range(8)]
+            results = analyzer.analyze_batch(texts, batch_size=4)
+            errors.extend(r for r in results if r["method"] != "model")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_model_results_are_memoized_across_batches(analyzer):
+    tokenizer = analyzer.pipeline.tokenizer
+    first = analyzer.analyze_batch(["texto neutro uno", "texto neutro dos", "texto neutro uno"])
+    assert tokenizer.calls == 1
+    assert [r["method"] for r in first] == ["model"] * 3
+
+    # Repeated texts in a later batch (and via analyze) never reach the model again
+    again = analyzer.analyze_batch(["texto neutro dos", "texto neutro uno"])
+    assert analyzer.analyze("texto neutro uno")["method"] == "model"
+    assert tokenizer.calls == 1
+    assert again == [first[1], first[0]]
+
+    # Only the new text is inferred
+    analyzer.analyze_batch(["texto neutro uno", "texto neutro tres"])
+    assert tokenizer.calls == 2
+
+
+def test_memo_key_is_truncated_text(analyzer):
+    tokenizer = analyzer.pipeline.tokenizer
+    prefix = "texto neutro " * 60
+    analyzer.analyze_batch([prefix + "final uno"])
+    analyzer.analyze_batch([prefix + "final dos"])
+    assert tokenizer.calls == 1
+
+
+def test_compile_warmup_uses_batched_path(analyzer, config, monkeypatch):
+    import analyzer as analyzer_module
+    compiled = {}
+
+    def fake_compile(model, **kwargs):
+        compiled.update(kwargs)
+        return model
+
+    monkeypatch.setattr(
+        analyzer_module, "torch",
+        SimpleNamespace(inference_mode=nullcontext, compile=fake_compile), raising=False
+    )
+    config.set_sentiment_compile_model(True)
+    config.set_sentiment_batch_size(4)
+    batch_sizes = []
+    tokenizer = analyzer.pipeline.tokenizer
+    original_call = type(tokenizer).__call__
+    monkeypatch.setattr(
+        type(tokenizer), "__call__",
+        lambda self, texts, **kw: batch_sizes.append(len(texts)) or original_call(self, texts, **kw)
+    )
+
+    analyzer._compile_model()
+
+    assert compiled.get("dynamic") is True
+    # Several full batches (one per length bucket) plus a partial one, like a real run
+    assert batch_sizes.count(4) >= 4 and 1 in batch_sizes
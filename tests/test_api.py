@@ -0,0 +1,26 @@
+"""Response caching of the read endpoints."""
+import pytest
+
+
+@pytest.fixture
+def client(config):
+    from fastapi.testclient import TestClient
+    import api
+    with TestClient(api.app) as test_client:
+        yield test_client
+
+
+def test_cached_responses_always_revalidate(client):
+    first = client.get("/api/profiles")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    not_modified = client.get("/api/profiles", headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+
+    created = client.post("/api/profiles", json={"platform": "instagram", "username_or_url": "someone"})
+    assert created.status_code == 200
+    # The write invalidated the cache: the old ETag no longer matches and the new profile is listed
+    after = client.get("/api/profiles", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200
+    assert [p["username_or_url"] for p in after.json()] == ["someone"]
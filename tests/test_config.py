@@ -0,0 +1,73 @@
+"""Config flags stored as text must round-trip as real booleans."""
+import pytest
+
+
+@pytest.mark.parametrize("flag", ["sentiment_onnx_runtime", "sentiment_compile_model", "int8_quantization", "auto_skip_recent"])
+def test_bool_flags_round_trip(config, flag):
+    getter = getattr(config, f"get_{flag}")
+    setter = getattr(config, f"set_{flag}")
+    assert getter() is config.DEFAULT_CONFIG[flag]
+    setter(False)
+    assert getter() is False
+    setter(True)
+    assert getter() is True
+    setter(False)
+    assert getter() is False
+
+
+def test_booleans_are_stored_with_bool_type(config):
+    import db_utils
+    config.set_auto_skip_recent(False)
+    assert db_utils.get_config("auto_skip_recent") is False
+    assert db_utils.get_all_config_rows()["auto_skip_recent"] is False
+
+
+def test_legacy_text_booleans_are_migrated(config):
+    import db_utils
+    conn = db_utils.get_connection()
+    try:
+        conn.execute("UPDATE config SET value = 'False', value_type = 'str' WHERE key = 'auto_skip_recent'")
+        conn.commit()
+    finally:
+        conn.close()
+    assert db_utils.get_config("auto_skip_recent") == "False"
+
+    db_utils.init_database()
+
+    assert db_utils.get_config("auto_skip_recent") is False
+    config.reload_config_cache()
+    assert config.get_auto_skip_recent() is False
+
+
+def test_cache_ignores_writes_outside_config(config, monkeypatch):
+    import db_utils
+    monkeypatch.setattr(config, "CONFIG_VERSION_CHECK_SECS", 0)
+    config.reload_config_cache()
+    reloads = []
+    original_reload = config.reload_config_cache
+    monkeypatch.setattr(config, "reload_config_cache", lambda *a: (reloads.append(a), original_reload(*a)))
+
+    db_utils.add_profile("instagram", "someone")
+    config.get_auto_skip_recent()
+    assert reloads == []
+
+    # Otro proceso cambia la config directamente en la BD
+    conn = db_utils.get_connection()
+    try:
+        conn.execute("UPDATE config SET value = 'False', value_type = 'bool' WHERE key = 'auto_skip_recent'")
+        conn.commit()
+    finally:
+        conn.close()
+    assert config.get_auto_skip_recent() is False
+    assert len(reloads) == 1
+
+
+def test_version_check_waits_for_tick(config, monkeypatch):
+    import db_utils
+    monkeypatch.setattr(config, "CONFIG_VERSION_CHECK_SECS", 3600)
+    config.reload_config_cache()
+    calls = []
+    monkeypatch.setattr(config, "sqlite_config_version", lambda: calls.append(1) or db_utils.sqlite_config_version())
+    for _ in range(5):
+        config.get_auto_skip_recent()
+    assert calls == []
@@ -0,0 +1,287 @@
+"""db_utils against a real SQLite database: comment upserts, summary triggers, migrations and deletes."""
+from datetime import datetime, timezone
+
+import pytest
+
+
+@pytest.fixture
+def db(config):
+    import db_utils
+    return db_utils
+
+
+@pytest.fixture
+def post_id(db):
+    profile_id = db.add_profile("instagram", "someone")
+    return db.insert_post(profile_id, "instagram", "p1", url="https://www.instagram.com/p/p1/")
+
+
+def _comments(db, post_id):
+    conn = db.get_read_connection()
+    try:
+        rows = conn.execute(
+            "SELECT id, comment_id, text, likes, sentiment_label, posted_at FROM comments "
+            "WHERE post_id = ? ORDER BY comment_id",
+            (post_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row[1]: tuple(row) for row in rows}
+
+
+POSTED_AT = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def test_batch_writer_upserts_and_keeps_last_duplicate(db, post_id):
+    db.insert_comment(post_id, "c1", text="old", likes=1)
+    old_id = _comments(db, post_id)["c1"][0]
+
+    with db.CommentBatchWriter(post_id, flush_size=2) as writer:
+        writer.add("c1", text="new", likes=5, sentiment_label="POSITIVE", sentiment_score=0.9)
+        writer.add("c2", text="first", posted_at=POSTED_AT)
+        writer.add("c3", text="other")
+        writer.add("c2", text="second", posted_at=POSTED_AT)
+    assert writer.written == 4
+
+    rows = _comments(db, post_id)
+    assert rows["c1"] == (old_id, "c1", "new", 5, "POSITIVE", None)
+    assert rows["c2"][2:] == ("second", 0, None, "2024-05-01 12:30:15")
+    assert set(rows) == {"c1", "c2", "c3"}
+
+
+def test_batch_writer_rolls_back_on_error(db, post_id):
+    with pytest.raises(RuntimeError):
+        with db.CommentBatchWriter(post_id, flush_size=1) as writer:
+            writer.add("c1", text="flushed before the error")
+            raise RuntimeError("scrape aborted")
+    assert _comments(db, post_id) == {}
+
+
+def test_json_upsert_matches_executemany(db, post_id, monkeypatch):
+    rows = [
+        (post_id, "c1", "hola ñ", "a", 3, "NEGATIVE", 0.7, "model", POSTED_AT),
+        (post_id, "c2", None, None, 0, None, None, None, None),
+    ]
+    db.insert_comments_bulk(rows)
+    expected = _comments(db, post_id)
+
+    # El camino de Turso (un solo INSERT ... SELECT FROM json_each) sobre la misma BD SQLite
+    conn = db.get_connection()
+    try:
+        monkeypatch.setattr(db, "USE_TURSO", True)
+        db._write_comment_rows(conn.cursor(), [row[:2] + ("edited",) + row[3:] for row in rows])
+        conn.commit()
+    finally:
+        conn.close()
+
+    rows_after = _comments(db, post_id)
+    assert {key: row[:2] + row[3:] for key, row in rows_after.items()} == {
+        key: row[:2] + row[3:] for key, row in expected.items()
+    }
+    assert {row[2] for row in rows_after.values()} == {"edited"}
+
+
+
+def _summary(db):
+    conn = db.get_read_connection()
+    try:
+        summary = conn.execute(
+            "SELECT post_id, sentiment_label, count, ROUND(sum_score, 6) FROM sentiment_summary WHERE count > 0"
+        ).fetchall()
+        expected = conn.execute(
+            "SELECT post_id, sentiment_label, COUNT(*), ROUND(COALESCE(SUM(sentiment_score), 0), 6) "
+            "FROM comments WHERE sentiment_label IS NOT NULL GROUP BY post_id, sentiment_label"
+        ).fetchall()
+    finally:
+        conn.close()
+    return sorted(map(tuple, summary)), sorted(map(tuple, expected))
+
+
+def test_sentiment_summary_follows_comment_changes(db, post_id):
+    other_post = db.insert_post(
+        db.add_profile("tiktok", "other"), "tiktok", "p2", url="https://www.tiktok.com/@other/video/2"
+    )
+
+    def assert_consistent():
+        summary, expected = _summary(db)
+        assert summary == expected
+
+    db.insert_comments_bulk([
+        (post_id, "c1", "a", None, 0, "POSITIVE", 0.9, "model", None),
+        (post_id, "c2", "b", None, 0, "NEGATIVE", 0.8, "model", None),
+        (post_id, "c3", "c", None, 0, None, None, None, None),
+        (other_post, "c4", "d", None, 0, "POSITIVE", 0.6, "model", None),
+    ])
+    assert_consistent()
+    assert db.get_sentiment_stats()["counts"] == {"POSITIVE": 2, "NEGATIVE": 1, "NEUTRAL": 0}
+
+    # Upsert que cambia la etiqueta, de NULL a etiqueta y de etiqueta a NULL
+    db.insert_comment(post_id, "c1", text="a", sentiment_label="NEGATIVE", sentiment_score=0.4)
+    db.insert_comment(post_id, "c2", text="b")
+    assert_consistent()
+
+    comment_ids = {row[1]: row[0] for row in _comments(db, post_id).values()}
+    db.update_comment_sentiment(comment_ids["c3"], "NEUTRAL", 0.5, "model")
+    db.update_comments_sentiment_bulk([(comment_ids["c1"], "POSITIVE", 0.7, "model")])
+    assert_consistent()
+
+    # Mover un comentario de post
+    conn = db.get_connection()
+    try:
+        conn.execute("UPDATE comments SET post_id = ? WHERE id = ?", (other_post, comment_ids["c3"]))
+        conn.execute("DELETE FROM comments WHERE id = ?", (comment_ids["c1"],))
+        conn.commit()
+    finally:
+        conn.close()
+    assert_consistent()
+    assert db.get_sentiment_stats()["counts"] == {"POSITIVE": 1, "NEGATIVE": 0, "NEUTRAL": 1}
+
+    # Borrado en cascada desde el perfil
+    profile_id = db.get_post_profile_and_platform(other_post)[0]
+    assert db.delete_profile(profile_id)
+    assert_consistent()
+    assert db.get_sentiment_stats()["total"] == 0
+
+
+# SQLite schema created by the first release's init_database (before any migration existed)
+BASELINE_SCHEMA = """
+CREATE TABLE config (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE profiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    platform TEXT NOT NULL,
+    username_or_url TEXT NOT NULL,
+    display_name TEXT,
+    last_analyzed DATETIME,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(platform, username_or_url)
+);
+CREATE TABLE posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    profile_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    url TEXT,
+    text TEXT,
+    likes INTEGER DEFAULT 0,
+    comments_count INTEGER DEFAULT 0,
+    shares INTEGER DEFAULT 0,
+    views INTEGER DEFAULT 0,
+    interactions_total INTEGER DEFAULT 0,
+    posted_at DATETIME,
+    scraped_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (profile_id) REFERENCES profiles(id),
+    UNIQUE(platform, post_id)
+);
+CREATE TABLE comments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id INTEGER NOT NULL,
+    comment_id TEXT NOT NULL,
+    text TEXT,
+    author TEXT,
+    likes INTEGER DEFAULT 0,
+    sentiment_label TEXT,
+    sentiment_score REAL,
+    sentiment_method TEXT,
+    posted_at DATETIME,
+    scraped_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (post_id) REFERENCES posts(id),
+    UNIQUE(post_id, comment_id)
+);
+CREATE INDEX idx_posts_profile ON posts(profile_id);
+CREATE INDEX idx_posts_platform ON posts(platform);
+CREATE INDEX idx_comments_post ON comments(post_id);
+CREATE INDEX idx_comments_sentiment ON comments(sentiment_label);
+ALTER TABLE profiles ADD COLUMN apify_token_key TEXT;
+
+-- Data as the first release wrote it: str() config values, default sqlite3 datetime adapter
+INSERT INTO config (key, value) VALUES
+    ('auto_skip_recent', 'False'), ('apify_token', 'abc'), ('max_comments', '25'), ('platforms', '["tiktok"]');
+INSERT INTO profiles (id, platform, username_or_url) VALUES (1, 'tiktok', 'someone');
+INSERT INTO posts (id, profile_id, platform, post_id, likes, comments_count, shares, views, interactions_total, posted_at)
+    VALUES (1, 1, 'tiktok', 'v1', 5, 2, 1, 100, 0, '2024-05-01 14:30:15.123456+02:00'),
+           (2, 1, 'tiktok', 'v2', 1, 0, 0, 0, 1, '2024-05-02T08:00:00');
+INSERT INTO comments (post_id, comment_id, text, sentiment_label, sentiment_score, posted_at) VALUES
+    (1, 'c1', 'bien', 'POSITIVE', 0.9, '2024-05-01T12:30:15.5+00:00'),
+    (1, 'c2', 'mal', 'NEGATIVE', 0.8, NULL),
+    (2, 'c3', 'sin analizar', NULL, NULL, '2024-05-02 09:00:00');
+"""
+
+
+def _rows(conn, sql):
+    return [tuple(row) for row in conn.execute(sql)]
+
+
+def test_init_database_migrates_baseline_schema(db_path):
+    import sqlite3
+    baseline = sqlite3.connect(db_path)
+    baseline.executescript(BASELINE_SCHEMA)
+    baseline.close()
+
+    import db_utils
+    db_utils.init_database()
+    db_utils.init_database()  # idempotente
+
+    conn = db_utils.get_connection()
+    try:
+        for table in ("posts", "comments"):
+            assert {fk[6] for fk in conn.execute(f"PRAGMA foreign_key_list({table})")} == {"CASCADE"}
+        if db_utils.SQLITE_GENERATED_COLUMNS:
+            hidden = {row[1]: row[6] for row in conn.execute("PRAGMA table_xinfo(posts)")}
+            assert hidden["interactions_total"] in (2, 3)
+        assert _rows(conn, "SELECT id, interactions_total, posted_at FROM posts ORDER BY id") == [
+            (1, 108, "2024-05-01 12:30:15"),
+            (2, 1, "2024-05-02 08:00:00"),
+        ]
+        assert _rows(conn, "SELECT comment_id, posted_at FROM comments ORDER BY comment_id") == [
+            ("c1", "2024-05-01 12:30:15"),
+            ("c2", None),
+            ("c3", "2024-05-02 09:00:00"),
+        ]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+        (config_sql,) = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'config'").fetchone()
+        assert "WITHOUT ROWID" in config_sql
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {name for name, _ in db_utils._INDEX_DDL} <= indexes
+        assert not indexes & set(db_utils._OBSOLETE_INDEXES)
+    finally:
+        conn.close()
+
+    assert db_utils.get_all_config_rows() == {
+        "auto_skip_recent": False, "apify_token": "abc", "max_comments": 25, "platforms": ["tiktok"],
+    }
+    summary, expected = _summary(db_utils)
+    assert summary == expected == [(1, "NEGATIVE", 1, 0.8), (1, "POSITIVE", 1, 0.9)]
+
+    assert db_utils.delete_profile(1)
+    conn = db_utils.get_connection()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_delete_profile_cascades_to_posts_comments_and_summary(db, post_id):
+    keep_post = db.insert_post(
+        db.add_profile("tiktok", "other"), "tiktok", "p2", url="https://www.tiktok.com/@other/video/2"
+    )
+    db.insert_comments_bulk([
+        (post_id, "c1", "a", None, 0, "POSITIVE", 0.9, "model", None),
+        (keep_post, "c2", "b", None, 0, "NEGATIVE", 0.8, "model", None),
+    ])
+    profile_id = db.get_post_profile_and_platform(post_id)[0]
+
+    assert db.delete_profile(profile_id)
+    assert not db.delete_profile(profile_id)
+
+    conn = db.get_connection()
+    try:
+        assert _rows(conn, "SELECT id FROM posts") == [(keep_post,)]
+        assert _rows(conn, "SELECT comment_id FROM comments") == [("c2",)]
+        assert _rows(conn, "SELECT post_id, sentiment_label, count FROM sentiment_summary") == [
+            (keep_post, "NEGATIVE", 1)
+        ]
+    finally:
+        conn.close()
@@ -0,0 +1,148 @@
+"""Comment processing and analyze_profiles scheduling in the scraper (no Apify calls are made)."""
+import pytest
+
+
+class _FailingBatchAnalyzer:
+    """analyze_batch always fails; analyze fails only for texts containing "boom"."""
+
+    def analyze_batch(self, texts):
+        raise RuntimeError("batch inference failed")
+
+    def analyze(self, text):
+        if "boom" in text:
+            raise RuntimeError("single inference failed")
+        return {"label": "POSITIVE", "score": 0.9, "method": "model"}
+
+
+@pytest.fixture
+def scraper(config):
+    import scraper as scraper_module
+    return scraper_module
+
+
+@pytest.fixture
+def post_id(config):
+    import db_utils
+    profile_id = db_utils.add_profile("instagram", "someone")
+    return db_utils.insert_post(profile_id, "instagram", "p1", url="https://www.instagram.com/p/p1/")
+
+
+def _stored_comments(post_id):
+    import db_utils
+    conn = db_utils.get_read_connection()
+    try:
+        rows = conn.execute(
+            "SELECT comment_id, sentiment_label, sentiment_method FROM comments WHERE post_id = ? ORDER BY comment_id",
+            (post_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [tuple(row) for row in rows]
+
+
+def test_batch_sentiment_failure_keeps_comments(scraper, post_id):
+    apify = scraper.ApifyScraper()
+    apify._analyzer = _FailingBatchAnalyzer()
+    items = [
+        {"id": "c1", "text": "great post", "ownerUsername": "a"},
+        {"id": "c2", "text": "boom", "ownerUsername": "b"},
+        {"id": "c3", "text": "nice", "ownerUsername": "c"},
+    ]
+
+    apify.process_comment_items(items, post_id, "instagram")
+
+    assert _stored_comments(post_id) == [
+        ("c1", "POSITIVE", "model"),
+        ("c2", None, None),
+        ("c3", "POSITIVE", "model"),
+    ]
+
+
+class _BrokenWriter:
+    """CommentBatchWriter whose bulk write always fails."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def add_row(self, row):
+        raise RuntimeError("bulk write failed")
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_bulk_write_failure_falls_back_to_row_by_row(scraper, post_id, monkeypatch):
+    monkeypatch.setattr(scraper, "CommentBatchWriter", _BrokenWriter)
+    apify = scraper.ApifyScraper()
+    apify._analyzer = _FailingBatchAnalyzer()
+    items = [
+        {"id": "c1", "text": "great post", "ownerUsername": "a"},
+        {"id": "c2", "text": "nice", "ownerUsername": "b"},
+    ]
+
+    apify.process_comment_items(items, post_id, "instagram")
+
+    assert _stored_comments(post_id) == [("c1", "POSITIVE", "model"), ("c2", "POSITIVE", "model")]
+
+
+@pytest.fixture
+def profiles(config):
+    """Four profiles: analyzed 2, 30 and 10 days ago, and one never analyzed."""
+    from datetime import datetime, timedelta
+    import db_utils
+    # Sin filtros de fecha (auto-skip solo se aplica sin ellos); None se guarda como texto "None"
+    config.set_last_days(0)
+    config.set_date_from("")
+    config.set_date_to("")
+    config.set_auto_skip_recent(True)
+    days_ago = {"recent": 2, "never": None, "stale": 30, "older": 10}
+    ids = {name: db_utils.add_profile("instagram", name) for name in days_ago}
+    conn = db_utils.get_connection()
+    try:
+        conn.executemany(
+            "UPDATE profiles SET last_analyzed = ? WHERE id = ?",
+            [(datetime.now() - timedelta(days=days), ids[name]) for name, days in days_ago.items() if days],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return ids
+
+
+def _record_analyzed(scraper, monkeypatch):
+    analyzed = []
+
+    def analyze_profile(self, profile_id, platform, username, force=False, profile=None, should_skip=None, fcfg=None):
+        analyzed.append(username)
+        return {"skipped": False, "should_skip": should_skip}
+
+    monkeypatch.setattr(scraper, "APIFY_MAX_CONCURRENT_RUNS", 1)
+    monkeypatch.setattr(scraper.ApifyScraper, "analyze_profile", analyze_profile)
+    return analyzed
+
+
+def test_auto_skip_is_decided_up_front_and_stalest_run_first(scraper, profiles, monkeypatch):
+    import db_utils
+    analyzed = _record_analyzed(scraper, monkeypatch)
+    progress = []
+
+    results = scraper.analyze_profiles(on_progress=lambda done, total: progress.append((done, total)))
+
+    assert analyzed == ["never", "stale", "older"]
+    assert list(results) == [p["id"] for p in db_utils.get_all_profiles()]
+    assert results[profiles["recent"]] == {"skipped": True, "reason": "analyzed_recently"}
+    assert all(results[profiles[name]]["should_skip"] is False for name in analyzed)
+    assert progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+
+@pytest.mark.parametrize("force, last_days", [(True, 0), (False, 7)])
+def test_force_or_date_filters_disable_auto_skip(scraper, profiles, config, monkeypatch, force, last_days):
+    config.set_last_days(last_days)
+    analyzed = _record_analyzed(scraper, monkeypatch)
+
+    scraper.analyze_profiles(force=force)
+
+    assert sorted(analyzed) == ["never", "older", "recent", "stale"]
@@ -0,0 +1,83 @@
+"""normalize_username_or_url must keep the behaviour of the urlparse implementation it replaced."""
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+import pytest
+
+from utils import normalize_username_or_url
+
+
+def _urlparse_reference(input_str: str) -> Tuple[str, Optional[str]]:
+    """The implementation before the single-regex rewrite, kept verbatim as the reference."""
+    input_str = input_str.strip()
+    if input_str.startswith("@"):
+        input_str = input_str[1:]
+    if input_str.startswith(("http://", "https://")):
+        try:
+            parsed = urlparse(input_str)
+            domain = parsed.netloc.lower()
+            path_parts = [p for p in parsed.path.split("/") if p]
+            if "instagram.com" in domain:
+                if path_parts:
+                    return path_parts[0], "instagram"
+            elif "tiktok.com" in domain:
+                if path_parts and path_parts[0] == "@":
+                    username = path_parts[1] if len(path_parts) > 1 else None
+                elif path_parts:
+                    username = path_parts[0].lstrip("@")
+                else:
+                    username = None
+                if username:
+                    return username, "tiktok"
+            elif "facebook.com" in domain:
+                if path_parts:
+                    return path_parts[0], "facebook"
+        except Exception:
+            pass
+    return input_str, None
+
+
+@pytest.mark.parametrize("value", [
+    # TikTok: /@user, /user, /@/user, only "@", extra segments and query strings
+    "https://www.tiktok.com/@user",
+    "https://www.tiktok.com/@/user",
+    "https://www.tiktok.com/@//user",
+    "https://www.tiktok.com/user",
+    "https://www.tiktok.com/@@user",
+    "https://www.tiktok.com/@",
+    "https://www.tiktok.com/@/",
+    "https://www.tiktok.com/@user/video/123?lang=es",
+    # Subdomains, ports, userinfo, case
+    "https://m.tiktok.com/@user",
+    "https://vm.tiktok.com/ZMabc/",
+    "https://m.facebook.com/page/posts/1",
+    "https://web.facebook.com/profile.php?id=1",
+    "https://instagram.com:443/user",
+    "https://u@instagram.com/user",
+    "https://www.INSTAGRAM.com/User",
+    "HTTPS://www.instagram.com/user",
+    # Host matched as a substring, checked instagram -> tiktok -> facebook
+    "https://notinstagram.com/user",
+    "https://instagram.com.evil.com/user",
+    "https://tiktok.com.instagram.com/@user",
+    "https://example.com/instagram.com/user",
+    # No path, empty segments, query and fragment
+    "https://www.tiktok.com",
+    "https://www.tiktok.com/",
+    "https://instagram.com",
+    "https://www.instagram.com/?hl=es",
+    "https://www.instagram.com//user/",
+    "https://www.instagram.com/user?hl=es",
+    "https://www.instagram.com/user#posts",
+    "https://www.facebook.com/@page",
+    "http://facebook.com/page",
+    "https://",
+    # Plain usernames
+    "user",
+    "@user",
+    "  @user  ",
+    "instagram.com/user",
+    "@https://www.instagram.com/user",
+])
+def test_matches_urlparse_version(value):
+    assert normalize_username_or_url(value) == _urlparse_reference(value)
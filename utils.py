@@ -2,67 +2,60 @@
 Utility functions for URL normalization, calculations, and common operations.
 """
 import re
-from typing import Optional, Tuple
-from urllib.parse import urlparse, parse_qs
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Optional, Tuple
 
+# Optional: ciso8601 parses ISO 8601 timestamps several times faster than datetime.fromisoformat
+try:
+    import ciso8601
+    CISO8601_AVAILABLE = True
+except ImportError:
+    CISO8601_AVAILABLE = False
 
+_WHITESPACE_RE = re.compile(r'\s+')
+# Profile URL: host (netloc) and the first two non-empty path segments, in one match (same split as urlparse)
+_PROFILE_URL_RE = re.compile(r'https?://([^/?#]*)(?:/+([^/?#]+)(?:/+([^/?#]+))?)?')
+# Checked in this order against the lowercased host, as substrings (like the urlparse version did)
+_PROFILE_DOMAINS = (("instagram.com", "instagram"), ("tiktok.com", "tiktok"), ("facebook.com", "facebook"))
+_NUMBER_SCALES = ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K"))
+
+
+@lru_cache(maxsize=4096)
 def normalize_username_or_url(input_str: str) -> Tuple[str, Optional[str]]:
     """
     Normalize username or URL input.
     Returns (normalized_username, platform) tuple.
     Platform can be 'instagram', 'tiktok', 'facebook', or None if unclear.
     """
-    input_str = input_str.strip()
-    
-    # Remove @ symbol if present
-    if input_str.startswith("@"):
-        input_str = input_str[1:]
+    # Trim whitespace and a leading @ symbol if present
+    input_str = input_str.strip().removeprefix("@")
     
     # Check if it's a URL
-    if input_str.startswith(("http://", "https://")):
-        try:
-            parsed = urlparse(input_str)
-            domain = parsed.netloc.lower()
-            
-            # Extract username from URL
-            path_parts = [p for p in parsed.path.split("/") if p]
-            
-            if "instagram.com" in domain:
-                if path_parts:
-                    username = path_parts[0]
-                    return username, "instagram"
-            elif "tiktok.com" in domain:
-                if path_parts and path_parts[0] == "@":
-                    username = path_parts[1] if len(path_parts) > 1 else None
-                elif path_parts:
-                    username = path_parts[0].lstrip("@")
-                else:
-                    username = None
-                if username:
-                    return username, "tiktok"
-            elif "facebook.com" in domain:
-                if path_parts:
-                    username = path_parts[0]
-                    return username, "facebook"
-        except Exception:
-            pass
+    match = _PROFILE_URL_RE.match(input_str)
+    if match:
+        domain, first, second = match.groups()
+        domain = domain.lower()
+        platform = next((name for host, name in _PROFILE_DOMAINS if host in domain), None)
+        if platform == "tiktok":
+            # TikTok: /@user, /user or /@/user
+            username = second if first == "@" else first.lstrip("@") if first else None
+            if username:
+                return username, "tiktok"
+        elif platform and first:
+            return first, platform
     
     # If it's just a username, try to detect platform from common patterns
     # For now, return as-is and let the user select platform
     return input_str, None
 
 
-def calculate_interactions_total(likes: int = 0, comments: int = 0, shares: int = 0, views: int = 0) -> int:
-    """Calculate total interactions from individual metrics."""
-    return likes + comments + shares + (views if views else 0)
-
-
+@lru_cache(maxsize=1024)
 def format_number(num: int) -> str:
-    """Format large numbers with K, M suffixes."""
-    if num >= 1_000_000:
-        return f"{num / 1_000_000:.1f}M"
-    elif num >= 1_000:
-        return f"{num / 1_000:.1f}K"
+    """Format large numbers with K, M, B suffixes."""
+    for scale, suffix in _NUMBER_SCALES:
+        if num >= scale:
+            return f"{num / scale:.1f}{suffix}"
     return str(num)
 
 
@@ -74,6 +67,32 @@ def parse_datetime_str(dt_str: Optional[str]) -> Optional[str]:
     return dt_str
 
 
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """
+    Parse a timestamp from Apify items or DB rows: Unix seconds (int/float, local time like
+    datetime.fromtimestamp) or an ISO 8601 string ("Z" suffix allowed). datetime passes through.
+    Returns None for empty or unparseable values instead of raising.
+    """
+    if not value or isinstance(value, bool):
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value)
+        text = str(value)
+        if CISO8601_AVAILABLE:
+            try:
+                return ciso8601.parse_datetime(text)
+            except ValueError:
+                pass  # formats ciso8601 rejects but fromisoformat accepts
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        return datetime.fromisoformat(text)
+    except (ValueError, TypeError, OverflowError, OSError):
+        return None
+
+
 def validate_apify_token(token: str) -> bool:
     """Basic validation of Apify token format."""
     if not token or len(token) < 10:
@@ -82,10 +101,15 @@ def validate_apify_token(token: str) -> bool:
     return True
 
 
+@lru_cache(maxsize=8192)
 def clean_text(text: Optional[str]) -> Optional[str]:
-    """Clean and normalize text content."""
+    """
+    Clean and normalize text content.
+    Cached because feeds repeat many texts (bot comments, hashtags); analyze_profiles
+    calls clean_text.cache_clear() after each job so texts are not kept between runs.
+    """
     if not text:
         return None
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text.strip())
+    text = _WHITESPACE_RE.sub(' ', text.strip())
     return text if text else None